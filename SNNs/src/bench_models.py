@@ -0,0 +1,215 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import traceback
+import zipfile
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils import data
+from models import *
+from datasets import transform
+from extract_inputs import extract_inputs_1, extract_inputs_2
+from ssc_dataset import SSCZipDataset
+
+# ru_maxrss is in bytes on macOS and in KiB elsewhere
+RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+def random_srnn(input_dim, hidden, output_dim):
+    sizes = [input_dim] + hidden
+    return SRNN2([ALIFLayer(sizes[i], sizes[i + 1]) for i in range(len(hidden))] +
+                 [OutputLayer(sizes[-1], output_dim)])
+
+
+def random_spikes(nr_samples, seq_dim, input_dim, rate=0.05, nr_classes=10):
+    x = (torch.rand(nr_samples, seq_dim, input_dim) < rate).float()
+    y = torch.randint(0, nr_classes, (nr_samples,)).float()
+    return x, y
+
+
+# zip of <index>_<label>.npy spike arrays, as read by SSCZipDataset
+def synthetic_ssc(path, nr_samples, seq_dim, input_dim, rate=0.05, nr_classes=35):
+    rng = np.random.default_rng(0)
+    with zipfile.ZipFile(path, "w") as archive:
+        for i in range(nr_samples):
+            x = (rng.random((seq_dim, input_dim)) < rate).astype(np.uint8)
+            buffer = io.BytesIO()
+            np.save(buffer, x)
+            archive.writestr(f"{i}_{rng.integers(nr_classes)}.npy", buffer.getvalue())
+
+
+def _run(fn, repeats):
+    fn()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+# make() builds the fixtures of a case and returns the function to time. On
+# POSIX the case runs in a forked child, so that the growth of its peak RSS
+# after make() covers torch's allocations as well. The fixtures are built in
+# the child too as torch's thread pools do not survive a fork.
+def measure(make, repeats):
+    if not hasattr(os, "fork"):
+        times = _run(make(), repeats)
+        peak = None
+    else:
+        import resource
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # the child must never return into the rest of the benchmark
+            status = 1
+            try:
+                os.close(read_fd)
+                try:
+                    fn = make()
+                    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                    times = _run(fn, repeats)
+                    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base
+                    result = {"times": times, "peak": peak * RSS_UNIT}
+                    status = 0
+                except BaseException:
+                    result = {"error": traceback.format_exc()}
+                with os.fdopen(write_fd, "w") as f:
+                    json.dump(result, f)
+            finally:
+                os._exit(status)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as f:
+            output = f.read()
+        os.waitpid(pid, 0)
+        if not output:
+            raise RuntimeError("benchmark child exited without a result")
+        result = json.loads(output)
+        if "error" in result:
+            raise RuntimeError(f"benchmark child failed:\n{result['error']}")
+        times = result["times"]
+        peak = result["peak"]
+    return {
+        "mean": statistics.mean(times),
+        "min": min(times),
+        "peak": peak
+    }
+
+
+def bench_srnn(rows, hiddens, batch_sizes, seq_dim, input_dim, output_dim, repeats):
+    for hidden in hiddens:
+        for batch_size in batch_sizes:
+            params = f"hidden={'-'.join(map(str, hidden))},batch={batch_size},seq={seq_dim}"
+
+            def make_eval():
+                model = random_srnn(input_dim, hidden, output_dim)
+                x, _ = random_spikes(batch_size, seq_dim, input_dim, nr_classes=output_dim)
+
+                def forward_eval():
+                    with torch.no_grad():
+                        model(x)
+                return forward_eval
+
+            def make_train():
+                model = random_srnn(input_dim, hidden, output_dim)
+                x, y = random_spikes(batch_size, seq_dim, input_dim, nr_classes=output_dim)
+                criterion = nn.CrossEntropyLoss()
+
+                def forward_train():
+                    model.zero_grad()
+                    outputs, _, _ = model(x)
+                    criterion(outputs, y.long()).backward()
+                return forward_train
+
+            rows.append(("SRNN2.forward eval", params, measure(make_eval, repeats)))
+            rows.append(("SRNN2.forward train", params, measure(make_train, repeats)))
+            print(f"Done {params}", file=sys.stderr)
+
+
+def bench_extract(rows, nr_samples, seq_dim, input_dim, repeats, tmp):
+    params = f"samples={nr_samples},seq={seq_dim},input={input_dim}"
+
+    def loader():
+        x, y = random_spikes(nr_samples, seq_dim, input_dim)
+        return data.DataLoader(data.TensorDataset(x, y), batch_size=1)
+
+    # both print their progress, keep stdout for the results
+    def make_1():
+        inputs = loader()
+
+        def extract_1():
+            with contextlib.redirect_stdout(sys.stderr):
+                extract_inputs_1(inputs, seq_dim, f"{tmp}/inputs1")
+        return extract_1
+
+    def make_2():
+        inputs = loader()
+        model = random_srnn(input_dim, [64], 10)
+
+        def extract_2():
+            with contextlib.redirect_stdout(sys.stderr):
+                extract_inputs_2(inputs, model, seq_dim, f"{tmp}/inputs2")
+        return extract_2
+
+    rows.append(("extract_inputs_1", params, measure(make_1, repeats)))
+    rows.append(("extract_inputs_2", params, measure(make_2, repeats)))
+
+
+def bench_ssc(rows, nr_samples, seq_dim, input_dim, repeats, tmp):
+    path = f"{tmp}/ssc.zip"
+    synthetic_ssc(path, nr_samples, seq_dim, input_dim)
+
+    def make():
+        dataset = SSCZipDataset(path)
+
+        def get_all():
+            for i in range(len(dataset)):
+                dataset[i]
+        return get_all
+    rows.append(("SSCZipDataset.__getitem__", f"samples={nr_samples},seq={seq_dim},input={input_dim}",
+                 measure(make, repeats)))
+
+
+def bench_transform(rows, nr_images, strides, repeats):
+    rng = np.random.default_rng(0)
+    x = rng.integers(0, 256, (nr_images, 28, 28), dtype=np.uint8)
+    y = rng.integers(0, 10, nr_images)
+    for stride in strides:
+        rows.append(("transform", f"images={nr_images},stride={stride}", measure(
+            lambda: lambda: transform(x, y, 28 * 28, 8, stride), repeats)))
+
+
+if __name__ == "__main__":
+    # bench_models.py [repeats] [scale], or bench_models.py smoke to run every
+    # case once on small fixtures
+    smoke = len(sys.argv) > 1 and sys.argv[1] == "smoke"
+    if smoke:
+        repeats, scale, seq_dim = 1, 0.05, 20
+    else:
+        repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+        scale = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+        seq_dim = 250
+
+    torch.manual_seed(0)
+    tmp = tempfile.mkdtemp(prefix="bench-")
+    rows = []
+    try:
+        bench_srnn(rows, [[64], [256, 256], [400, 400]], [1, 32, 128],
+                   max(1, int(100 * scale)), 700, 20, repeats)
+        bench_extract(rows, max(1, int(20 * scale)), seq_dim, 700, repeats, tmp)
+        bench_ssc(rows, max(1, int(200 * scale)), seq_dim, 700, repeats, tmp)
+        bench_transform(rows, max(1, int(2000 * scale)), [2, 4], repeats)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print("case,params,mean_ms,min_ms,peak_MB")
+    for case, params, r in rows:
+        peak = f"{r['peak']/2**20:.2f}" if r["peak"] is not None else ""
+        print(f"{case},\"{params}\",{r['mean']*1E3:.3f},{r['min']*1E3:.3f},{peak}")
@@ -0,0 +1,83 @@
+import numpy as np
+import torch
+from torch.utils import data
+from ssc_dataset import SSCZipDataset
+
+
+def transform(x, y, size, input_size, stride):
+    nr_steps = size // stride
+    inputs = []
+    x = x.reshape(-1, size)
+    for i in range(nr_steps):
+        start_idx = i*stride
+        if start_idx < (size - input_size):
+            input = x[:, start_idx:start_idx +
+                      input_size].reshape(-1, 1, input_size)
+        else:
+            input = x[:, -input_size:].reshape(-1, 1, input_size)
+        inputs.append(torch.from_numpy(input))
+    return torch.cat(inputs, dim=1).float() / 255.0, torch.tensor(y).long()
+
+
+def load_shd():
+    SHD = np.load("data/SHD_10ms.npz")
+    train_dataset = data.TensorDataset(
+        torch.Tensor(SHD["train_x"]), torch.Tensor(SHD["train_y"]))
+    test_dataset = data.TensorDataset(
+        torch.Tensor(SHD["test_x"]), torch.Tensor(SHD["test_y"]))
+    return train_dataset, test_dataset, 700, 20, 100
+
+
+def load_smnist(stride=4, nr_train=10000):
+    import keras
+
+    input_dim = 8
+    size = 28 * 28
+    (train_X, train_Y), (test_X, test_Y) = keras.datasets.mnist.load_data()
+    train_X = train_X[:nr_train]
+    train_Y = train_Y[:nr_train]
+    train_X, train_Y = transform(train_X, train_Y, size, input_dim, stride)
+    test_X, test_Y = transform(test_X, test_Y, size, input_dim, stride)
+    train_dataset = data.TensorDataset(train_X, train_Y)
+    test_dataset = data.TensorDataset(test_X, test_Y)
+    return train_dataset, test_dataset, input_dim, 10, size // stride
+
+
+def load_psmnist(stride=2):
+    input_dim = 8
+    size = 28 * 28
+    psmnist = np.load("data/psmnist.npz")
+    train_X, train_Y = transform(
+        psmnist["train_x"], psmnist["train_y"], size, input_dim, stride)
+    test_X, test_Y = transform(
+        psmnist["test_x"], psmnist["test_y"], size, input_dim, stride)
+    train_dataset = data.TensorDataset(train_X, train_Y)
+    test_dataset = data.TensorDataset(test_X, test_Y)
+    return train_dataset, test_dataset, input_dim, 10, size // stride
+
+
+def load_ssc():
+    train_dataset = SSCZipDataset("data/ssc-train.zip")
+    test_dataset = SSCZipDataset("data/ssc-valid.zip")
+    return train_dataset, test_dataset, 700, 35, 250
+
+
+loaders = {
+    "shd": load_shd,
+    "smnist": load_smnist,
+    "psmnist": load_psmnist,
+    "ssc": load_ssc
+}
+
+
+# returns (train_loader, test_loader, input_dim, output_dim, seq_dim)
+def load_dataset(name, batch_size=128, **kwargs):
+    if name not in loaders:
+        raise ValueError(f"Unknown dataset: {name}")
+    train_dataset, test_dataset, input_dim, output_dim, seq_dim = loaders[name](
+        **kwargs)
+    train_loader = data.DataLoader(
+        train_dataset, batch_size=batch_size, shuffle=True)
+    test_loader = data.DataLoader(
+        test_dataset, batch_size=batch_size, shuffle=False)
+    return train_loader, test_loader, input_dim, output_dim, seq_dim
@@ -0,0 +1,97 @@
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn.functional as F
+from torch.utils import data
+from models import *
+from datasets import load_dataset
+from extract_inputs import extract_inputs_1, extract_inputs_2
+
+
+# sum_output of SRNN2 after every timestep: [batch, seq, classes]
+def accumulated_output(model, x):
+    _, _, mem_trace = model(x)
+    return torch.cumsum(F.softmax(mem_trace[-1], dim=2), dim=1)
+
+
+# Inference stops at the first timestep where the accumulated output of the
+# best class leads the second best by threshold, or at the last timestep.
+# Gives the number of timesteps used and the prediction at that point.
+def exit_steps(acc, threshold):
+    batch_size, seq_num, _ = acc.shape
+    top = acc.topk(2, dim=2).values
+    passed = (top[:, :, 0] - top[:, :, 1]) >= threshold
+    first = passed.float().argmax(dim=1)
+    steps = torch.where(passed.any(dim=1), first + 1,
+                        torch.full_like(first, seq_num))
+    predicted = acc[torch.arange(batch_size), steps - 1].argmax(dim=1)
+    return steps, predicted
+
+
+# accuracy and average timesteps of every threshold, from a single full run
+def early_exit_curve(model, dataloader, device, input_dim, seq_dim, thresholds):
+    correct = np.zeros(len(thresholds))
+    steps = [[] for _ in thresholds]
+    total = 0
+    with torch.no_grad():
+        for images, labels in dataloader:
+            images = images.view(-1, seq_dim, input_dim).to(device)
+            labels = labels.view(-1).long().to(device)
+            acc = accumulated_output(model, images)
+            for i, threshold in enumerate(thresholds):
+                nr_steps, predicted = exit_steps(acc, threshold)
+                correct[i] += (predicted == labels).sum().item()
+                steps[i].append(nr_steps.cpu().numpy())
+            total += labels.size(0)
+    steps = [np.concatenate(s) for s in steps]
+    curve = pd.DataFrame({
+        "threshold": thresholds,
+        "accuracy": 100. * correct / total,
+        "avg_steps": [s.mean() for s in steps],
+        "step_fraction": [s.mean() / seq_dim for s in steps]
+    })
+    return curve, steps
+
+
+if __name__ == "__main__":
+    model_path = sys.argv[1]
+    dataset = sys.argv[2]
+    thresholds = [float(t) for t in sys.argv[3].split(",")]
+    exit_threshold = float(sys.argv[4]) if len(sys.argv) > 5 else None
+    if exit_threshold is not None and exit_threshold not in thresholds:
+        thresholds.append(exit_threshold)
+
+    device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+    model = torch.load(model_path, map_location=device)
+    _, test_loader, input_dim, _, seq_dim = load_dataset(dataset)
+    curve, steps = early_exit_curve(
+        model, test_loader, device, input_dim, seq_dim, thresholds)
+    print(curve.to_csv(index=False), end="")
+
+    # early_exit.py ... <threshold> <dest_dir> [1|2]: truncated traces of
+    # that threshold, from the inputs (1) or the first layer's spikes (2)
+    if exit_threshold is not None:
+        dest_dir = sys.argv[5]
+        mode = sys.argv[6] if len(sys.argv) > 6 else "1"
+        nr_steps = steps[thresholds.index(exit_threshold)]
+        loader = data.DataLoader(test_loader.dataset, batch_size=1, shuffle=False)
+        model = model.to("cpu")
+        if mode == "1":
+            extract_inputs_1(loader, seq_dim, dest_dir, nr_steps)
+            input_size = input_dim
+        elif mode == "2":
+            # the SRNN2 trace of the first layer: [batch, ts, size]
+            with torch.no_grad():
+                extract_inputs_2(loader, model, seq_dim, dest_dir, nr_steps)
+            input_size = model.layers[0].size
+        else:
+            raise ValueError(f"Unknown mode: {mode}")
+        json.dump({
+            "InputSize": input_size,
+            "NrSamples": len(nr_steps),
+            "Timesteps": seq_dim,
+            "EarlyExit": True
+        }, open(os.path.join(dest_dir, "info.json"), "w"), indent=4)
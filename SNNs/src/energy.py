@@ -0,0 +1,68 @@
+import math
+import os
+import sys
+import torch
+from models import *
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Simulator", "Scripts"))
+from model_costs import Costs
+
+
+# Expected dynamic energy of an SRNN2 on the hardware of a model.json, in J,
+# following what a core does for every received spike packet: read the layer,
+# then for every target neuron read the synapse and the neuron, add and write
+# the neuron back. A spike goes to the next layer and, for ALIF layers, back to
+# its own layer, with one packet for every core the destination is split over.
+# The output layer runs on the controller, which Metrics does not cost, so a
+# spike to it only costs its packet over the NoC. The syncs of every timestep
+# do not depend on the activity. Static energy is not included, it depends on
+# the latency of the mapped network.
+class EnergyModel():
+    def __init__(self, model, model_path, hops=1.0):
+        c = Costs(model_path)
+        self.costs = c
+        max_neurons = c.m["MaxNeurons"]
+        add = c.alu_costs["Addf32"]["Dynamic"]
+        sop = c.syn_mem_read + c.neuron_mem_read + c.neuron_mem_write
+        noc = c.router_dyn_packet + hops * c.link_dyn_packet
+        packet = noc + c.layer_mem_read
+
+        def fan_out(dests):
+            energy = 0.0
+            for dest in dests:
+                if isinstance(dest, ALIFLayer):
+                    energy += math.ceil(dest.size / max_neurons) * packet + dest.size * (sop + add)
+                else:
+                    energy += noc
+            return energy
+
+        layers = list(model.layers)
+        self.input_spike = fan_out(layers[:1])
+        self.spike = []
+        for i, layer in enumerate(layers):
+            dests = ([layer] if isinstance(layer, ALIFLayer) else []) + layers[i + 1:i + 2]
+            self.spike.append(fan_out(dests))
+
+        alu = c.alu_costs
+        alif_sync = 3 * alu["Multf32"]["Dynamic"] + 2 * add + 3 * \
+            alu["Subf32"]["Dynamic"] + alu["Cmpf32"]["Dynamic"]
+        self.sync = sum(c.layer_mem_read + layer.size * (c.neuron_mem_read + c.neuron_mem_write + alif_sync)
+                        for layer in layers if isinstance(layer, ALIFLayer))
+
+    # J per sample of a batch: [batch]
+    def estimate(self, x, spike_trace):
+        _, seq_num, _ = x.shape
+        energy = (x != 0).float().sum(dim=(1, 2)) * self.input_spike + seq_num * self.sync
+        for spikes, per_spike in zip(spike_trace, self.spike):
+            energy = energy + spikes.float().sum(dim=(1, 2)) * per_spike
+        return energy
+
+
+# weight * expected energy per inference in uJ, added to the training loss
+class EnergyRegularizer():
+    def __init__(self, energy: EnergyModel, weight):
+        self.energy = energy
+        self.weight = weight
+
+    def __call__(self, x, spike_trace):
+        return self.weight * self.energy.estimate(x, spike_trace).mean() * 1E6
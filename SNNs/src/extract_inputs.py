@@ -1,7 +1,9 @@
 import os
+from models import SRNN2
 
-# extract spikes from the input spike traces
-def extract_inputs_1(loader, seq_dim, path):
+# extract spikes from the input spike traces, sample i is cut off after
+# nr_steps[i] timesteps when given (see early_exit.py)
+def extract_inputs_1(loader, seq_dim, path, nr_steps=None):
     if not os.path.isdir(path):
         os.makedirs(path)
 
@@ -10,16 +12,17 @@ def extract_inputs_1(loader, seq_dim, path):
         if step % 50 == 0:
             print(f"Sample: {step}")
 
-        with open(f"{path}\input_" + str(step) + ".trace", "w") as input_file:
+        with open(f"{path}/input_" + str(step) + ".trace", "w") as input_file:
             out = int(y.numpy()[0])
             input_file.write(str(out) + "\n")
-            for ts in range(0, seq_dim):
+            for ts in range(0, seq_dim if nr_steps is None else min(seq_dim, nr_steps[step])):
                 spikes = x[0, ts, :].nonzero(as_tuple=True)[0].numpy()
                 spike_str = [str(spike) for spike in spikes]
                 input_file.write(str(ts) + "," + ",".join(spike_str) + "\n")
 
-# extract spikes from the spikes from the first layer of the execution
-def extract_inputs_2(loader, model, seq_dim, path):
+# extract spikes from the spikes from the first layer of the execution. SRNN
+# gives the spikes per timestep, SRNN2 per layer as [batch, ts, size]
+def extract_inputs_2(loader, model, seq_dim, path, nr_steps=None):
     if not os.path.isdir(path):
         os.makedirs(path)
 
@@ -33,7 +36,8 @@ def extract_inputs_2(loader, model, seq_dim, path):
             correct = int(y.numpy()[0])
             input_file.write(str(correct) + "\n")
             input_file.write("0,\n")
-            for ts in range(1, seq_dim):
-                spikes_ts = spikes[ts - 1][0].flatten().nonzero().flatten().numpy()
+            for ts in range(1, seq_dim if nr_steps is None else min(seq_dim, nr_steps[step])):
+                first = spikes[0][0, ts - 1] if isinstance(model, SRNN2) else spikes[ts - 1][0]
+                spikes_ts = first.flatten().nonzero().flatten().numpy()
                 spike_str = [str(spike) for spike in spikes_ts]
                 input_file.write(str(ts) + "," + ",".join(spike_str) + "\n")
\ No newline at end of file
@@ -0,0 +1,28 @@
+import itertools
+import sys
+import numpy as np
+import torch
+from models import *
+from datasets import load_dataset
+
+
+# [timesteps, neurons] spikes of every layer for the first sample of x, under
+# the given layer names, for model_spikes.py diff
+def save_spike_trace(model, x, names, path):
+    with torch.no_grad():
+        _, spike_trace, _ = model(x)
+    np.savez_compressed(path, **{name: spikes[0].cpu().numpy()
+                                 for name, spikes in zip(names, spike_trace)})
+
+
+if __name__ == "__main__":
+    model_path = sys.argv[1]
+    dataset = sys.argv[2]
+    sample = int(sys.argv[3])
+    names = sys.argv[4].split(",")
+    dest = sys.argv[5]
+
+    model = torch.load(model_path, map_location="cpu")
+    _, test_loader, input_dim, _, seq_dim = load_dataset(dataset, batch_size=1)
+    x, _ = next(itertools.islice(test_loader, sample, None))
+    save_spike_trace(model, x.view(-1, seq_dim, input_dim), names, dest)
@@ -61,9 +61,9 @@ class ALIFLayer(nn.Module):
         thr = ro * thr + (1 - ro) * prev_spikes
         B = self.thr0 + beta * thr
 
-        # new potential
-        inputs = torch.matmul(prev_spikes, self.rec) + \
-            torch.matmul(spikes, self.input)
+        # new potential, in float32 also when the matmuls run in bfloat16
+        inputs = (torch.matmul(prev_spikes, self.rec) +
+                  torch.matmul(spikes, self.input)).float()
         mem = mem * alpha + (1 - alpha) * inputs - B * prev_spikes * self.dt
 
         # spike
@@ -89,7 +89,7 @@ class OutputLayer(nn.Module):
         nn.init.constant_(self.tau_m, tau_m)
 
     def forward(self, mem, spikes):
-        inputs = torch.matmul(spikes, self.input)
+        inputs = torch.matmul(spikes, self.input).float()
         alpha = torch.exp(-1.0 * self.dt / self.tau_m)
         mem_new = mem * alpha + (1.0 - alpha) * inputs
         return mem_new
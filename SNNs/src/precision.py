@@ -0,0 +1,47 @@
+import copy
+import sys
+import torch
+import torch.nn as nn
+from torch.optim.lr_scheduler import StepLR
+from models import *
+from training import *
+from datasets import load_dataset
+
+
+# Trains the same initial network in float32 and with bfloat16 autocast and
+# compares training throughput and final test accuracy
+def compare_precision(dataset, hidden, num_epochs, device, learning_rate=1e-2):
+    train_loader, test_loader, input_dim, output_dim, seq_dim = load_dataset(dataset)
+    sizes = [input_dim] + hidden
+    torch.manual_seed(0)
+    initial = SRNN2([ALIFLayer(sizes[i], sizes[i + 1]) for i in range(len(hidden))] +
+                    [OutputLayer(sizes[-1], output_dim)])
+
+    results = {}
+    for name, bf16 in [("fp32", False), ("bf16", True)]:
+        torch.manual_seed(0)
+        model = copy.deepcopy(initial).to(device)
+        optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate)
+        scheduler = StepLR(optimizer, step_size=20, gamma=.5)
+        results[name] = train(model, f"{dataset}-{name}", num_epochs, input_dim, seq_dim, train_loader,
+                              test_loader, device, nn.CrossEntropyLoss(), scheduler, optimizer, bf16=bf16)
+    return results
+
+
+if __name__ == "__main__":
+    datasets = sys.argv[1].split(",")
+    num_epochs = int(sys.argv[2])
+    hidden = [int(s) for s in sys.argv[3].split(",")] if len(sys.argv) > 3 else [256, 256]
+
+    device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+    print("device:", device)
+    rows = []
+    for dataset in datasets:
+        results = compare_precision(dataset, hidden, num_epochs, device)
+        (acc32, rate32), (acc16, rate16) = results["fp32"], results["bf16"]
+        rows.append(f"{dataset},{acc32:.2f},{acc16:.2f},{acc16 - acc32:+.2f},"
+                    f"{rate32:.1f},{rate16:.1f},{rate16 / rate32:.2f}")
+
+    print("dataset,fp32_accuracy,bf16_accuracy,accuracy_diff,fp32_samples_s,bf16_samples_s,speedup")
+    for row in rows:
+        print(row)
@@ -0,0 +1,204 @@
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+from torch.optim.lr_scheduler import StepLR
+from models import *
+from training import *
+from datasets import load_dataset
+
+
+def alif_layers(model):
+    return [(i, layer) for i, layer in enumerate(model.layers) if isinstance(layer, ALIFLayer)]
+
+
+# unstructured: zero the smallest weights of every input and recurrent matrix
+def magnitude_masks(model, sparsity):
+    masks = []
+    for _, layer in alif_layers(model):
+        for weights in [layer.input, layer.rec]:
+            w = weights.detach().abs()
+            k = int(sparsity * w.numel())
+            if k == 0:
+                mask = torch.ones_like(w)
+            else:
+                thr = torch.kthvalue(w.flatten().cpu(), k).values.to(w.device)
+                mask = (w > thr).float()
+            masks.append((weights, mask))
+    return masks
+
+
+# structured: remove whole neurons of every ALIF layer, scored on the L2 norm
+# of all weights connected to them
+def structured_masks(model, sparsity):
+    masks = []
+    keep = {}
+    for i, layer in alif_layers(model):
+        next_layer = model.layers[i + 1]
+        with torch.no_grad():
+            score = layer.input.pow(2).sum(dim=0) + layer.rec.pow(2).sum(dim=0) + \
+                layer.rec.pow(2).sum(dim=1) + next_layer.input.pow(2).sum(dim=1)
+        nr_keep = max(1, layer.size - int(sparsity * layer.size))
+        kept = torch.argsort(score, descending=True)[:nr_keep].sort().values
+        keep[i] = kept
+
+        neuron_mask = torch.zeros(layer.size, device=score.device)
+        neuron_mask[kept] = 1.0
+        masks.append((layer.input, neuron_mask.expand_as(layer.input).clone()))
+        masks.append((layer.rec, torch.outer(neuron_mask, neuron_mask)))
+        masks.append((next_layer.input, neuron_mask.unsqueeze(
+            1).expand_as(next_layer.input).clone()))
+    return masks, keep
+
+
+def apply_masks(masks):
+    with torch.no_grad():
+        for weights, mask in masks:
+            weights.mul_(mask)
+
+
+# rebuild the network without the neurons removed by structured pruning
+def compact(model, keep):
+    layers = []
+    in_keep = None
+    for i, layer in enumerate(model.layers):
+        out_keep = keep.get(i, torch.arange(layer.size))
+        input = layer.input.detach()
+        if in_keep is not None:
+            input = input[in_keep, :]
+        input = input[:, out_keep]
+
+        if isinstance(layer, ALIFLayer):
+            new = ALIFLayer(input.shape[0], len(out_keep), dt=layer.dt,
+                            thr0=layer.thr0, name=layer.name)
+            with torch.no_grad():
+                new.rec.copy_(layer.rec.detach()[out_keep][:, out_keep])
+                new.tau_adp.copy_(layer.tau_adp.detach()[out_keep])
+                new.bias.copy_(layer.bias.detach()[out_keep])
+        else:
+            new = OutputLayer(input.shape[0], len(out_keep), dt=layer.dt)
+        with torch.no_grad():
+            new.input.copy_(input)
+            new.tau_m.copy_(layer.tau_m.detach()[out_keep])
+        layers.append(new)
+        in_keep = out_keep
+    return SRNN2(layers).to(model.layers[0].input.device)
+
+
+# average amount of spikes per inference of every neuron, input included
+def firing_rates(model, dataloader, device, input_dim, seq_dim):
+    rates = [torch.zeros(input_dim)] + [torch.zeros(layer.size)
+                                        for layer in model.layers]
+    total = 0
+    with torch.no_grad():
+        for images, _ in dataloader:
+            images = images.view(-1, seq_dim, input_dim).to(device)
+            _, spike_trace, _ = model(images)
+            rates[0] += (images > 0).float().sum(dim=(0, 1)).cpu()
+            for i, spikes in enumerate(spike_trace):
+                rates[i + 1] += spikes.sum(dim=(0, 1)).cpu()
+            total += images.shape[0]
+    return [r.numpy() / total for r in rates]
+
+
+def save_coo(weights, path):
+    w = weights.detach().cpu().numpy()
+    src, dst = np.nonzero(w)
+    pd.DataFrame({"src": src, "dst": dst, "weight": w[src, dst]}).to_csv(
+        path, index=False)
+
+
+# same files as extract_model.py so the simulator can run the pruned network,
+# plus a sparse version of every weight matrix and the measured firing rates
+def save_pruned(model, dest_dir, rates, info):
+    if not os.path.isdir(dest_dir):
+        os.makedirs(dest_dir)
+
+    names = ["i"] + [f"h{i + 1}" for i in range(len(model.layers) - 1)] + ["o"]
+    pd.DataFrame(rates[0]).to_csv(f"{dest_dir}/rates_i.csv")
+    layers = []
+    for i, layer in enumerate(model.layers):
+        input_name, layer_name = names[i], names[i + 1]
+        pd.DataFrame(np.transpose(layer.input.detach().cpu().numpy())).to_csv(
+            f"{dest_dir}/weights_{input_name}_2_{layer_name}.csv")
+        save_coo(layer.input,
+                 f"{dest_dir}/weights_{input_name}_2_{layer_name}.coo.csv")
+        pd.DataFrame(layer.tau_m.detach().cpu().numpy()).to_csv(
+            f"{dest_dir}/tau_m_{layer_name}.csv")
+        pd.DataFrame(rates[i + 1]).to_csv(f"{dest_dir}/rates_{layer_name}.csv")
+
+        if isinstance(layer, ALIFLayer):
+            pd.DataFrame(np.transpose(layer.rec.detach().cpu().numpy())).to_csv(
+                f"{dest_dir}/weights_{layer_name}_2_{layer_name}.csv")
+            save_coo(layer.rec,
+                     f"{dest_dir}/weights_{layer_name}_2_{layer_name}.coo.csv")
+            pd.DataFrame(layer.tau_adp.detach().cpu().numpy()).to_csv(
+                f"{dest_dir}/tau_adp_{layer_name}.csv")
+            pd.DataFrame(layer.bias.detach().cpu().numpy()).to_csv(
+                f"{dest_dir}/bias_{layer_name}.csv")
+
+        layers.append({
+            "Name": layer_name,
+            "Input": input_name,
+            "Type": "ALIF" if isinstance(layer, ALIFLayer) else "output",
+            "InputSize": layer.input_size,
+            "Size": layer.size
+        })
+
+    info["Layers"] = layers
+    json.dump(info, open(f"{dest_dir}/pruning.json", "w"), indent=4)
+
+
+def prune(model_path, mode, sparsity, num_epochs, loaders, device):
+    train_loader, test_loader, input_dim, _, seq_dim = loaders
+    model = torch.load(model_path).to(device)
+    if mode == "magnitude":
+        masks = magnitude_masks(model, sparsity)
+    elif mode == "structured":
+        masks, keep = structured_masks(model, sparsity)
+    else:
+        raise ValueError(f"Unknown pruning mode: {mode}")
+    apply_masks(masks)
+
+    # fine-tune with the pruned weights kept at zero
+    if num_epochs > 0 and sparsity > 0:
+        model_name = os.path.basename(os.path.dirname(model_path))
+        criterion = nn.CrossEntropyLoss()
+        optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
+        scheduler = StepLR(optimizer, step_size=10, gamma=.5)
+        train(model, f"{model_name}-{mode}-{sparsity}", num_epochs, input_dim, seq_dim, train_loader,
+              test_loader, device, criterion, scheduler, optimizer, after_step=lambda _: apply_masks(masks))
+
+    if mode == "structured":
+        model = compact(model, keep)
+    accuracy = test(model, test_loader, device, input_dim, seq_dim)
+    rates = firing_rates(model, test_loader, device, input_dim, seq_dim)
+    return model, accuracy, rates
+
+
+if __name__ == "__main__":
+    model_path = sys.argv[1]
+    dataset = sys.argv[2]
+    mode = sys.argv[3]
+    sparsities = [float(s) for s in sys.argv[4].split(",")]
+    num_epochs = int(sys.argv[5])
+    dest_dir = sys.argv[6]
+
+    torch.manual_seed(0)
+    device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+    print("device:", device)
+    loaders = load_dataset(dataset)
+
+    for sparsity in sparsities:
+        model, accuracy, rates = prune(
+            model_path, mode, sparsity, num_epochs, loaders, device)
+        print(f"Sparsity {sparsity}: accuracy {accuracy}")
+        save_pruned(model, f"{dest_dir}/sparsity-{sparsity}", rates, {
+            "Model": model_path,
+            "Mode": mode,
+            "Sparsity": sparsity,
+            "Accuracy": float(accuracy)
+        })
@@ -0,0 +1,114 @@
+import itertools
+import json
+import os
+import random
+import sys
+import numpy as np
+import pandas as pd
+from datasets import load_dataset
+from train_config import sweep
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Simulator", "Scripts"))
+from model_costs import Costs
+from model_packing import estimate_cores
+
+
+def candidates(space):
+    combos = list(itertools.product(space["Hidden"], space["TauM"], space["TauAdp"]))
+    if "Samples" in space and space["Samples"] < len(combos):
+        combos = random.Random(space.get("Seed", 0)).sample(combos, space["Samples"])
+    return combos
+
+
+def candidate_config(space, hidden, tau_m, tau_adp):
+    layers = [{"Type": "ALIF", "Size": size, "TauM": tau_m, "TauAdp": tau_adp} for size in hidden]
+    return {
+        "Name": f"{space['Name']}-{'x'.join(str(s) for s in hidden)}-m{tau_m}-a{tau_adp}",
+        "Dataset": space["Dataset"],
+        "BatchSize": space.get("BatchSize", 128),
+        "Layers": layers + [{"Type": "Output", "TauM": tau_m}],
+        "Optimizer": {"Type": "Adam", "LearningRate": space.get("LearningRate", 0.01)},
+        "Schedule": {"Type": "StepLR", "StepSize": space.get("StepSize", 20), "Gamma": 0.5},
+        "Epochs": space["Epochs"],
+        "Energy": {"Model": space["Model"], "Hops": space.get("Hops", 1.0)}
+    }
+
+
+# FirstFit1 packing of the hidden layers on the cores of model.json
+def packing(hidden, input_dim, c: Costs):
+    sizes = [input_dim] + list(hidden)
+    layers = [{"Name": f"h{i + 1}", "Type": "ALIF", "InputSize": sizes[i],
+               "Size": sizes[i + 1], "Recurrent": True} for i in range(len(hidden))]
+    nr_cores, mapping = estimate_cores(layers, c.m)
+    feasible = not mapping["Unmapped"] and nr_cores <= c.nr_cores
+    return nr_cores, feasible
+
+
+# rows that no other row beats on every column: higher is better for
+# maximize, lower for minimize
+def pareto_front(df, maximize, minimize):
+    values = np.concatenate([-df[maximize].to_numpy(dtype=np.float64),
+                             df[minimize].to_numpy(dtype=np.float64)], axis=1)
+    no_worse = (values[:, None, :] <= values[None, :, :]).all(axis=2)
+    better = (values[:, None, :] < values[None, :, :]).any(axis=2)
+    dominated = (no_worse & better).any(axis=0)
+    return ~dominated
+
+
+# Trains every candidate that fits on the mesh of the model.json of the space
+# with a short schedule and scores it on accuracy, cores, area of the used
+# cores and routers, and dynamic energy per inference
+def search(space, jobs=1, threads=None, seed=0):
+    c = Costs(space["Model"])
+    _, _, input_dim, _, _ = load_dataset(space["Dataset"], 1)
+
+    rows = []
+    configs = []
+    for hidden, tau_m, tau_adp in candidates(space):
+        config = candidate_config(space, hidden, tau_m, tau_adp)
+        nr_cores, feasible = packing(hidden, input_dim, c)
+        rows.append({
+            "name": config["Name"],
+            "hidden": "x".join(str(s) for s in hidden),
+            "tau_m": tau_m,
+            "tau_adp": tau_adp,
+            "cores": nr_cores,
+            "feasible": feasible,
+            "area_mm2": nr_cores * (c.core_area + c.router_area) * 1E-6
+        })
+        if feasible:
+            configs.append(config)
+        else:
+            print(f"{config['Name']}: does not fit {c.width}x{c.height} ({nr_cores} cores), skipped")
+
+    results = {r["Name"]: r for r in sweep(configs, [seed], jobs, threads or max(1, os.cpu_count() // jobs))}
+    for row in rows:
+        result = results.get(row["name"])
+        row["accuracy"] = result["BestAccuracy"] if result else float("nan")
+        row["energy_uj"] = result["EnergyPerInference"] * 1E6 if result else float("nan")
+        row["checkpoint"] = result["Checkpoint"] if result else ""
+
+    df = pd.DataFrame(rows)
+    trained = df["accuracy"].notna()
+    df["pareto"] = False
+    df.loc[trained, "pareto"] = pareto_front(
+        df[trained], ["accuracy"], ["cores", "area_mm2", "energy_uj"])
+    return df
+
+
+if __name__ == "__main__":
+    # size_search.py <space.json> [jobs] [threads]
+    space = json.load(open(sys.argv[1]))
+    jobs = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    df = search(space, jobs, threads)
+    dest_dir = "./model/size_search"
+    if not os.path.isdir(dest_dir):
+        os.makedirs(dest_dir)
+    df.to_csv(f"{dest_dir}/{space['Name']}.csv", index=False)
+
+    front = df[df["pareto"]].sort_values("accuracy", ascending=False)
+    print("name,accuracy,cores,area_mm2,energy_uj")
+    for _, row in front.iterrows():
+        print(f"{row['name']},{row['accuracy']:.2f},{row['cores']},{row['area_mm2']:.2f},{row['energy_uj']:.3f}")
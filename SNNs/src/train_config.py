@@ -0,0 +1,161 @@
+import concurrent.futures
+import copy
+import itertools
+import json
+import os
+import sys
+import torch
+import torch.nn as nn
+from torch.optim.lr_scheduler import StepLR
+from models import *
+from training import *
+from datasets import load_dataset
+from energy import EnergyModel, EnergyRegularizer
+
+INDEX_PATH = "model/index.json"
+
+
+def build_model(layers, input_dim, output_dim):
+    modules = []
+    size = input_dim
+    for i, layer in enumerate(layers):
+        if layer["Type"] == "ALIF":
+            modules.append(ALIFLayer(size, layer["Size"], thr0=layer.get("Thr0", 0.01),
+                                     tau_m=layer["TauM"], tau_adp=layer["TauAdp"], name=f"h{i+1}"))
+            size = layer["Size"]
+        elif layer["Type"] == "Output":
+            modules.append(OutputLayer(size, output_dim, tau_m=layer["TauM"]))
+        else:
+            raise ValueError(f"Unknown layer type: {layer['Type']}")
+    return SRNN2(modules)
+
+
+def build_optimizer(model, config):
+    opt = config["Optimizer"]
+    if opt["Type"] == "Adam":
+        optimizer = torch.optim.Adam(model.parameters(), lr=opt["LearningRate"])
+    elif opt["Type"] == "SGD":
+        optimizer = torch.optim.SGD(model.parameters(), lr=opt["LearningRate"],
+                                    momentum=opt.get("Momentum", 0.0))
+    else:
+        raise ValueError(f"Unknown optimizer: {opt['Type']}")
+
+    schedule = config["Schedule"]
+    if schedule["Type"] == "StepLR":
+        scheduler = StepLR(optimizer, step_size=schedule["StepSize"], gamma=schedule["Gamma"])
+    else:
+        raise ValueError(f"Unknown schedule: {schedule['Type']}")
+    return optimizer, scheduler
+
+
+# A config with a "Grid" of top-level keys to lists of values gives one
+# config per combination, named after the values it took
+def expand(config):
+    grid = config.get("Grid", {})
+    base = {k: v for k, v in config.items() if k != "Grid"}
+    if not grid:
+        return [base]
+    configs = []
+    keys = list(grid)
+    for values in itertools.product(*[grid[k] for k in keys]):
+        variant = copy.deepcopy(base)
+        variant.update(zip(keys, values))
+        variant["Name"] = base["Name"] + "".join(
+            f"-{k}{v}" for k, v in zip(keys, values) if not isinstance(v, (list, dict)))
+        if any(isinstance(v, (list, dict)) for v in values):
+            variant["Name"] += f"-v{len(configs)}"
+        configs.append(variant)
+    return configs
+
+
+def run_config(config, seed, threads=None, device=None):
+    if threads:
+        torch.set_num_threads(threads)
+    device = device or torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+    torch.manual_seed(seed)
+
+    train_loader, test_loader, input_dim, output_dim, seq_dim = load_dataset(
+        config["Dataset"], config.get("BatchSize", 128), **config.get("DatasetArgs", {}))
+    model = build_model(config["Layers"], input_dim, output_dim).to(device)
+    optimizer, scheduler = build_optimizer(model, config)
+    # "Energy": {"Model": <model.json>, "Weight": <per uJ>, "Hops": <per packet>}
+    energy = regularizer = None
+    if "Energy" in config:
+        energy = EnergyModel(model, config["Energy"]["Model"], config["Energy"].get("Hops", 1.0))
+        if config["Energy"].get("Weight", 0.0) > 0.0:
+            regularizer = EnergyRegularizer(energy, config["Energy"]["Weight"])
+    model_name = f"{config['Name']}-s{seed}"
+    # only the checkpoints of this run, the directory may hold older ones
+    checkpoints = []
+    accuracy, samples_per_s = train(model, model_name, config["Epochs"], input_dim, seq_dim, train_loader,
+                                    test_loader, device, nn.CrossEntropyLoss(), scheduler, optimizer,
+                                    bf16=config.get("BF16", False), regularizer=regularizer, energy=energy,
+                                    on_checkpoint=lambda e, a, p: checkpoints.append((float(a), e, p)))
+    if not checkpoints:
+        raise ValueError(f"{model_name}: no epochs trained")
+    best, epoch, path = max(checkpoints, key=lambda c: c[0])
+    result = {
+        "Name": config["Name"],
+        "Seed": seed,
+        "Model": model_name,
+        "Config": config,
+        "FinalAccuracy": float(accuracy),
+        "BestAccuracy": best,
+        "BestEpoch": epoch,
+        "Checkpoint": path,
+        "SamplesPerSecond": samples_per_s
+    }
+    if energy:
+        model = torch.load(path, map_location=device)
+        _, result["EnergyPerInference"] = test(model, test_loader, device, input_dim, seq_dim,
+                                               config.get("BF16", False), energy)
+    return result
+
+
+def update_index(result, path=INDEX_PATH):
+    index = json.load(open(path)) if os.path.isfile(path) else {}
+    index[result["Model"]] = result
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    json.dump(index, open(path, "w"), indent=4)
+
+
+# Every config and seed as a job of a process pool, each job limited to
+# threads torch threads so the jobs do not oversubscribe the CPU
+def sweep(configs, seeds, jobs, threads):
+    work = [(config, seed) for config in configs for seed in seeds]
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(run_config, config, seed, threads): (config["Name"], seed)
+                   for config, seed in work}
+        for future in concurrent.futures.as_completed(futures):
+            name, seed = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"{name} seed {seed} failed: {e}")
+                continue
+            update_index(result)
+            results.append(result)
+            print(f"{name} seed {seed}: best {result['BestAccuracy']:.2f} at epoch {result['BestEpoch']}, "
+                  f"{result['SamplesPerSecond']:.1f} samples/s")
+    return results
+
+
+if __name__ == "__main__":
+    configs = [c for path in sys.argv[1].split(",") for c in expand(json.load(open(path)))]
+    seeds = [int(s) for s in sys.argv[2].split(",")] if len(sys.argv) > 2 else [0]
+    jobs = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    threads = int(sys.argv[4]) if len(sys.argv) > 4 else max(1, os.cpu_count() // jobs)
+
+    if len(configs) * len(seeds) == 1:
+        result = run_config(configs[0], seeds[0], threads)
+        update_index(result)
+        results = [result]
+    else:
+        results = sweep(configs, seeds, jobs, threads)
+
+    print("model,best_accuracy,best_epoch,final_accuracy,samples_s,checkpoint")
+    for r in sorted(results, key=lambda r: r["BestAccuracy"], reverse=True):
+        print(f"{r['Model']},{r['BestAccuracy']:.2f},{r['BestEpoch']},{r['FinalAccuracy']:.2f},"
+              f"{r['SamplesPerSecond']:.1f},{r['Checkpoint']}")
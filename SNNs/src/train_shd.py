@@ -6,41 +6,18 @@ from torch.utils import data
 import os
 from models import *
 from training import *
+from datasets import load_dataset
 import sys
 
 torch.manual_seed(0)
 
-SHD = np.load("data/SHD_10ms.npz")
-
-train_X = SHD["train_x"]
-train_y = SHD["train_y"]
-
-test_X = SHD["test_x"]
-test_y = SHD["test_y"]
-
-print('dataset shape: ', train_X.shape)
-print('dataset shape: ', test_X.shape)
-
 device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
 print("device:", device)
 
 batch_size = 128
-
-tensor_trainX = torch.Tensor(train_X)  # transform to torch tensor
-tensor_trainY = torch.Tensor(train_y)
-train_dataset = data.TensorDataset(tensor_trainX, tensor_trainY)
-train_loader = data.DataLoader(
-    train_dataset, batch_size=batch_size, shuffle=True)
-
-tensor_testX = torch.Tensor(test_X)  # transform to torch tensor
-tensor_testY = torch.Tensor(test_y)
-test_dataset = data.TensorDataset(tensor_testX, tensor_testY)
-test_loader = data.DataLoader(
-    test_dataset, batch_size=batch_size, shuffle=False)
-
-input_dim = 700
-output_dim = 20
-seq_dim = 100  # Number of steps to unroll
+train_loader, test_loader, input_dim, output_dim, seq_dim = load_dataset("shd", batch_size)
+print('dataset shape: ', train_loader.dataset.tensors[0].shape)
+print('dataset shape: ', test_loader.dataset.tensors[0].shape)
 
 # training
 # model = SRNN2([
@@ -6,7 +6,7 @@ from torch.utils import data
 import os
 from models import *
 from training import *
-from ssc_dataset import SSCZipDataset
+from datasets import load_dataset
 
 torch.manual_seed(0)
 
@@ -15,17 +15,7 @@ print("device:", device)
 
 batch_size = 128
 
-train_dataset = SSCZipDataset("data/ssc-train.zip")
-train_loader = data.DataLoader(
-    train_dataset, batch_size=batch_size, shuffle=True)
-
-test_dataset = SSCZipDataset("data/ssc-valid.zip")
-test_loader = data.DataLoader(
-    test_dataset, batch_size=batch_size, shuffle=False)
-
-input_dim = 700
-output_dim = 35
-seq_dim = 250
+train_loader, test_loader, input_dim, output_dim, seq_dim = load_dataset("ssc", batch_size)
 
 # train
 model = SRNN2([
@@ -4,15 +4,26 @@ import torch.nn as nn
 from torch.optim.lr_scheduler import StepLR
 from torch.utils import data
 import os
+import time
 from models import *
 import sys
 
 
-def train(model, model_name, num_epochs, input_dim, seq_dim, train_loader, test_loader, device, criterion, scheduler, optimizer):
+# bfloat16 autocast runs the matmuls in bfloat16, the layers keep their
+# state, threshold and surrogate gradient in float32
+def autocast(device, enabled):
+    return torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=enabled)
+
+
+def train(model, model_name, num_epochs, input_dim, seq_dim, train_loader, test_loader, device, criterion, scheduler, optimizer, after_step=None, bf16=False, regularizer=None, energy=None, on_checkpoint=None):
     dir_path = f"./model/{model_name}"
     if not os.path.isdir(dir_path):
-        os.mkdir(dir_path)
+        os.makedirs(dir_path)
+    nr_samples = 0
+    train_time = 0.0
+    ts_acc = None
     for epoch in range(num_epochs):
+        start_time = time.perf_counter()
         for i, (images, labels) in enumerate(train_loader):
             images = images.view(-1, seq_dim,
                                  input_dim).requires_grad_().to(device)
@@ -21,24 +32,45 @@ def train(model, model_name, num_epochs, input_dim, seq_dim, train_loader, test_
             # Clear gradients w.r.t. parameters
             optimizer.zero_grad()
             # Forward pass to get output/logits
-            outputs, _, _ = model(images)
-            # Calculate Loss: softmax --> cross entropy loss
-            loss = criterion(outputs, labels)
+            with autocast(device, bf16):
+                outputs, spike_trace, _ = model(images)
+                # Calculate Loss: softmax --> cross entropy loss
+                loss = criterion(outputs.float(), labels)
+                # e.g. penalise the expected hardware energy of the spikes
+                if regularizer:
+                    loss = loss + regularizer(images, spike_trace)
             # Getting gradients w.r.t. parameters
             loss.backward()
             # Updating parameters
             optimizer.step()
+            # e.g. re-apply pruning masks
+            if after_step:
+                after_step(model)
+            nr_samples += batch_size
+        train_time += time.perf_counter() - start_time
         scheduler.step()
-        accuracy = test(model, train_loader, device, input_dim, seq_dim)
-        ts_acc = test(model, test_loader, device, input_dim, seq_dim)
-        torch.save(
-            model, f'{dir_path}/model_{model_name}_{epoch}_{str(ts_acc)}.pth')
+        accuracy = test(model, train_loader, device, input_dim, seq_dim, bf16)
+        energy_log = ''
+        if energy:
+            ts_acc, ts_energy = test(model, test_loader, device, input_dim, seq_dim, bf16, energy)
+            energy_log = f'. Ts Energy: {ts_energy * 1E6:.3f} uJ/inference'
+        else:
+            ts_acc = test(model, test_loader, device, input_dim, seq_dim, bf16)
+        path = f'{dir_path}/model_{model_name}_{epoch}_{str(ts_acc)}.pth'
+        torch.save(model, path)
+        # e.g. keep track of the best checkpoint of this run
+        if on_checkpoint:
+            on_checkpoint(epoch, ts_acc, path)
         print('epoch: ', epoch, '. Loss: ', loss.item(),
-              '. Tr Accuracy: ', accuracy, '. Ts Accuracy: ', ts_acc)
+              '. Tr Accuracy: ', accuracy, '. Ts Accuracy: ', ts_acc,
+              f'{energy_log}. {nr_samples / train_time:.1f} samples/s')
+    return ts_acc, nr_samples / train_time if train_time > 0 else 0.0
 
 
-def test(model, dataloader, device, input_dim, seq_dim):
+# with an EnergyModel also gives the estimated energy per inference in J
+def test(model, dataloader, device, input_dim, seq_dim, bf16=False, energy=None):
     correct = total = 0
+    total_energy = 0.0
 
     # Iterate through test dataset
     for images, labels in dataloader:
@@ -46,7 +78,10 @@ def test(model, dataloader, device, input_dim, seq_dim):
         batch_size, _, _ = images.shape
         labels = labels.view(batch_size).long().to(device)
 
-        outputs, _, _ = model(images)
+        with torch.no_grad(), autocast(device, bf16):
+            outputs, spike_trace, _ = model(images)
+        if energy:
+            total_energy += energy.estimate(images, spike_trace).sum().item()
         _, predicted = torch.max(outputs.data, 1)
         total += labels.size(0)
         if torch.cuda.is_available():
@@ -55,4 +90,6 @@ def test(model, dataloader, device, input_dim, seq_dim):
             correct += (predicted == labels).sum()
 
     accuracy = 100. * correct.numpy() / total
+    if energy:
+        return accuracy, total_energy / total
     return accuracy
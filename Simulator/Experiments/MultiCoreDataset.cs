@@ -188,6 +188,13 @@ public class MultiCoreDataset : BatchExperiment<MultiCore>
 
     private static void ClearCurrentConsoleLine()
     {
+        // there is no cursor when the output goes to a pipe or file
+        if (Console.IsOutputRedirected)
+        {
+            Console.WriteLine();
+            return;
+        }
+
         int currentLineCursor = Console.CursorTop;
         Console.SetCursorPosition(0, Console.CursorTop);
         Console.Write(new string(' ', Console.WindowWidth));
@@ -22,6 +22,8 @@ class DatasetInfo
     public int InputSize { get; set; }
     public int NrSamples { get; set; }
     public int Timesteps { get; set; }
+    // traces of early-exit inference end at their own last line
+    public bool EarlyExit { get; set; }
 }
 
 public class ZipDataset : IDisposable
@@ -61,7 +63,7 @@ public class ZipDataset : IDisposable
     {
         var entry = entries[name];
 
-        return InputTraceFile.ReadFromStream(entry.Open(), info.InputSize, info.Timesteps);
+        return InputTraceFile.ReadFromStream(entry.Open(), info.InputSize, info.EarlyExit ? 0 : info.Timesteps);
     }
 
     public int NrSamples
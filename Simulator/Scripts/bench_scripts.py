@@ -0,0 +1,107 @@
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas
+from model_costs import *
+from model_metrics import *
+
+CORE_COUNTERS = ["sops", "faultySpikes", "layerReads", "layerWrites", "neuronReads", "neuronWrites",
+                 "synapseReads", "synapseWrites", "computePushes", "computePops", "outputPushes", "outputPops"]
+CORE_UTILS = ["sparsity", "alu_util", "recv_util", "snd_util"]
+
+
+# model.json of exp4 on a width x height mesh
+def synthetic_model(path, width, height, base="res/exp/exp4/model.json"):
+    m = json.load(open(base))
+    m["NoC"]["Width"] = width
+    m["NoC"]["Height"] = height
+    json.dump(m, open(path, "w"), indent=4)
+
+
+# experiments.csv with random counters for every core and router of the mesh
+def synthetic_experiments(path, width, height, nr_samples, seed=0):
+    rng = np.random.default_rng(seed)
+    cols = {
+        "expNr": np.arange(nr_samples),
+        "runningTime": rng.random(nr_samples),
+        "latency": rng.integers(10**7, 10**9, nr_samples),
+        "correct": rng.integers(0, 10, nr_samples),
+        "predicted": rng.integers(0, 10, nr_samples)
+    }
+    # numbered from core0 as save_hw does, the controller has no counters
+    for core in range(width * height - 1):
+        for counter in CORE_COUNTERS:
+            cols[f"core{core}_{counter}"] = rng.integers(0, 10**5, nr_samples)
+        for util in CORE_UTILS:
+            cols[f"core{core}_{util}"] = rng.random(nr_samples)
+        for op in ["Addf32", "Multf32"]:
+            cols[f"core{core}_ops_{op}"] = rng.integers(0, 10**6, nr_samples)
+    for x in range(width):
+        for y in range(height):
+            cols[f"router({x}_{y})_nrHops"] = rng.integers(0, 10**4, nr_samples)
+            cols[f"router({x}_{y})_nrPacketSwitches"] = rng.integers(0, 10**4, nr_samples)
+            cols[f"router({x}_{y})_averageLat"] = rng.random(nr_samples) * 1E5
+    pandas.DataFrame(cols).to_csv(path, index=False)
+
+
+# time of every repeat and the peak of memory allocated by Python and numpy
+# during a single extra call
+def measure(fn, repeats):
+    fn()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "mean": statistics.mean(times),
+        "min": min(times),
+        "peak": peak
+    }
+
+
+def run(meshes, nr_samples, repeats, tmp):
+    rows = []
+    for width in meshes:
+        model_path = f"{tmp}/model-{width}.json"
+        synthetic_model(model_path, width, width)
+        rows.append(("Costs.__init__", f"mesh={width}x{width}",
+                     measure(lambda: Costs(model_path), repeats)))
+        c = Costs(model_path)
+        for n in nr_samples:
+            csv_path = f"{tmp}/experiments-{width}-{n}.csv"
+            synthetic_experiments(csv_path, width, width, n)
+            exp = pandas.read_csv(csv_path)
+            params = f"mesh={width}x{width},samples={n}"
+            rows.append(("read_csv", params,
+                         measure(lambda: pandas.read_csv(csv_path), repeats)))
+            rows.append(("Metrics.__init__", params,
+                         measure(lambda: Metrics(c, exp), repeats)))
+            print(f"Done {params}", file=sys.stderr)
+    return rows
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    meshes = [int(w) for w in sys.argv[2].split(",")] if len(sys.argv) > 2 else [4, 8, 16]
+    nr_samples = [int(n) for n in sys.argv[3].split(",")] if len(sys.argv) > 3 else [100, 1000, 10000]
+
+    tmp = tempfile.mkdtemp(prefix="bench-")
+    try:
+        rows = run(meshes, nr_samples, repeats, tmp)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print("case,params,mean_ms,min_ms,peak_MB")
+    for case, params, r in rows:
+        print(f"{case},\"{params}\",{r['mean']*1E3:.3f},{r['min']*1E3:.3f},{r['peak']/2**20:.2f}")
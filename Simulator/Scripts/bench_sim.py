@@ -0,0 +1,161 @@
+import json
+import math
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from telemetry import SIM, run_sim
+
+# two-sided 95% quantiles of Student's t for 1..30 degrees of freedom
+T95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+       2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+       2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+def confidence(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    mean = statistics.mean(values)
+    if len(values) < 2:
+        return {"mean": mean, "ci": math.nan, "n": len(values)}
+    t = T95[len(values) - 2] if len(values) - 1 <= len(T95) else 1.96
+    ci = t * statistics.stdev(values) / math.sqrt(len(values))
+    return {"mean": mean, "ci": ci, "n": len(values)}
+
+
+# numbers printed with .NET's "n" format, e.g. 1,234.00 (or 1.234,00)
+def parse_n(text):
+    return int(re.sub(r"[,.]", "", re.sub(r"[,.]\d{2}$", "", text)))
+
+
+def case_command(case, output_dir):
+    if case["Type"] == "dataset":
+        return [SIM, "dataset-sim",
+                "-s", case["SNN"],
+                "-h", case["HW"],
+                "-m", case["Mapping"],
+                "-d", case["Dataset"],
+                f"--max-samples={case['MaxSamples']}",
+                "-o", output_dir]
+    elif case["Type"] == "sim":
+        return [SIM, "sim", case["Experiment"]]
+    raise ValueError(f"Unknown case type: {case['Type']}")
+
+
+def run_case(case):
+    output_dir = tempfile.mkdtemp(prefix="bench-")
+    try:
+        record = run_sim(case_command(case, output_dir), echo=False)
+        if record["returncode"] != 0:
+            raise RuntimeError(f"{case['Name']} failed:\n{record['output']}")
+        output = record["output"]
+        trial = {"wall": record["wall"], "peak_rss": record["peak_rss"]}
+        if case["Type"] == "dataset":
+            log = open(f"{output_dir}/summary.log").read()
+            samples = int(re.search(r"Samples: (\d+)", log).group(1))
+            running = parse_n(re.search(r"Running time: ([\d,.]+)ms", log).group(1))
+            trial["samples_per_s"] = samples / (running / 1000)
+        else:
+            events = re.search(r"Events handled: ([\d,.]+)", output)
+            running = re.search(r"Running time was: (\d+) ms", output)
+            if events and running:
+                trial["events_per_s"] = parse_n(events.group(1)) / (int(running.group(1)) / 1000)
+        return trial
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def run_benchmarks(cases, repeats=5, build=True):
+    if build:
+        subprocess.run(["dotnet", "build", "--configuration", "Release"], check=True)
+
+    commit = subprocess.run(["git", "rev-parse", "HEAD"],
+                            capture_output=True, text=True).stdout.strip()
+    results = {
+        "Date": datetime.now().isoformat(timespec="seconds"),
+        "Commit": commit,
+        "Machine": platform.node(),
+        "Platform": platform.platform(),
+        "Cases": {}
+    }
+    for case in cases:
+        trials = []
+        for i in range(repeats):
+            trial = run_case(case)
+            print(f"{case['Name']} #{i + 1}: {trial['wall']:.2f} s")
+            trials.append(trial)
+        keys = set(k for t in trials for k in t)
+        results["Cases"][case["Name"]] = {
+            "Trials": trials,
+            "Summary": {k: confidence([t.get(k) for t in trials]) for k in keys}
+        }
+    return results
+
+
+# metric: higher is better?
+METRICS = {
+    "wall": False,
+    "peak_rss": False,
+    "samples_per_s": True,
+    "events_per_s": True
+}
+
+
+# A regression is a metric that got worse by more than threshold (relative)
+# and whose confidence intervals no longer overlap
+def compare(base, new, threshold=0.05):
+    regressions = []
+    rows = []
+    for name, case in new["Cases"].items():
+        if name not in base["Cases"]:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            b = base["Cases"][name]["Summary"].get(metric)
+            n = case["Summary"].get(metric)
+            if not b or not n:
+                continue
+            change = (n["mean"] - b["mean"]) / b["mean"]
+            worse = -change if higher_is_better else change
+            b_ci = 0.0 if math.isnan(b["ci"]) else b["ci"]
+            n_ci = 0.0 if math.isnan(n["ci"]) else n["ci"]
+            overlap = abs(n["mean"] - b["mean"]) <= b_ci + n_ci
+            regressed = worse > threshold and not overlap
+            rows.append((name, metric, b["mean"], n["mean"], change, regressed))
+            if regressed:
+                regressions.append((name, metric))
+    return rows, regressions
+
+
+if __name__ == "__main__":
+    command = sys.argv[1]
+
+    if command == "run":
+        cases = json.load(open(sys.argv[2]))
+        out_path = sys.argv[3]
+        repeats = int(sys.argv[4]) if len(sys.argv) > 4 else 5
+        results = run_benchmarks(cases, repeats)
+        if os.path.dirname(out_path) and not os.path.isdir(os.path.dirname(out_path)):
+            os.makedirs(os.path.dirname(out_path))
+        json.dump(results, open(out_path, "w"), indent=4)
+        for name, case in results["Cases"].items():
+            for metric, s in case["Summary"].items():
+                print(f"{name} {metric}: {s['mean']:,.2f} +- {s['ci']:,.2f}")
+    elif command == "compare":
+        base = json.load(open(sys.argv[2]))
+        new = json.load(open(sys.argv[3]))
+        threshold = float(sys.argv[4]) if len(sys.argv) > 4 else 0.05
+        rows, regressions = compare(base, new, threshold)
+        print("case,metric,base,new,change,regression")
+        for name, metric, b, n, change, regressed in rows:
+            print(f"{name},{metric},{b:.4g},{n:.4g},{change*100:+.2f}%,{regressed}")
+        if regressions:
+            print(f"{len(regressions)} regression(s)")
+            sys.exit(1)
+    else:
+        raise ValueError(f"Unknown command: {command}")
@@ -0,0 +1,190 @@
+import os
+import re
+import sys
+import numpy as np
+import pandas
+from model_costs import *
+from model_metrics import *
+from model_traffic import HW, load_mapping
+
+# energy term: (core counter, Costs attribute)
+MEM_TERMS = {
+    "layer_read": ("layerReads", "layer_mem_read"),
+    "layer_write": ("layerWrites", "layer_mem_write"),
+    "neuron_read": ("neuronReads", "neuron_mem_read"),
+    "neuron_write": ("neuronWrites", "neuron_mem_write"),
+    "syn_read": ("synapseReads", "syn_mem_read"),
+    "syn_write": ("synapseWrites", "syn_mem_write")
+}
+BUFFER_TERMS = {
+    "compute_pop": ("computePops", "compute_buf_pops"),
+    "compute_push": ("computePushes", "compute_buf_pushes"),
+    "output_pop": ("outputPops", "output_buf_pops"),
+    "output_push": ("outputPushes", "output_buf_pushes")
+}
+
+
+# cores as save_hw places them: column-major, skipping the controller at (0,0)
+def default_positions(width, height):
+    positions = {}
+    for x in range(width):
+        for y in range(height):
+            if x == 0 and y == 0:
+                continue
+            positions[f"core{len(positions)}"] = (x, y)
+    return positions
+
+
+def column_sums(exp, columns):
+    return exp[columns].to_numpy(dtype=np.float64).sum(axis=0)
+
+
+# Energy of every core and router over all samples, with the same terms as
+# Metrics: cores and routers add up to Metrics.total_energy. The buffer
+# energies are reported too, but like in Metrics not counted in the total.
+class Attribution():
+    def __init__(self, cost: Costs, exp, positions=None, splits=None):
+        self.cost = cost
+        self.width = cost.width
+        self.height = cost.height
+        positions = positions or default_positions(cost.width, cost.height)
+
+        ids = sorted(int(m.group(1)) for m in (re.fullmatch(r"core(\d+)_neuronReads", col)
+                                                for col in exp.columns) if m)
+        names = [f"core{i}" for i in ids]
+        cores = pandas.DataFrame(index=pandas.Index(names, name="core"))
+        cores["x"] = [positions[c][0] for c in names]
+        cores["y"] = [positions[c][1] for c in names]
+
+        latency = exp["latency"].to_numpy(dtype=np.float64).sum() * 1E-12
+        cores["static"] = latency * cost.core_static
+        for terms in [MEM_TERMS, BUFFER_TERMS]:
+            for term, (counter, attr) in terms.items():
+                cores[term] = column_sums(
+                    exp, [f"{c}_{counter}" for c in names]) * getattr(cost, attr)
+        cores["mem"] = cores[list(MEM_TERMS)].sum(axis=1)
+        cores["buffers"] = cores[list(BUFFER_TERMS)].sum(axis=1)
+
+        cores["alu"] = 0.0
+        for op, op_cost in cost.alu_costs.items():
+            cols = [f"{c}_ops_{op}" for c in names]
+            present = [col in exp for col in cols]
+            if any(present):
+                sums = np.zeros(len(names))
+                sums[present] = column_sums(
+                    exp, [col for col, p in zip(cols, present) if p])
+                cores[f"alu_{op}"] = sums * op_cost["Dynamic"]
+                cores["alu"] += cores[f"alu_{op}"]
+
+        cores["sops"] = column_sums(exp, [f"{c}_sops" for c in names])
+        cores["total"] = cores["static"] + cores["mem"] + cores["alu"]
+        self.cores = cores
+
+        rxy = [(x, y) for x in range(cost.width) for y in range(cost.height)
+               if f"router({x}_{y})_nrHops" in exp]
+        rnames = [f"router({x}_{y})" for x, y in rxy]
+        routers = pandas.DataFrame(index=pandas.Index(rnames, name="router"))
+        routers["x"] = [x for x, _ in rxy]
+        routers["y"] = [y for _, y in rxy]
+        routers["hops"] = column_sums(exp, [f"{r}_nrHops" for r in rnames])
+        routers["switches"] = column_sums(
+            exp, [f"{r}_nrPacketSwitches" for r in rnames])
+        routers["link"] = routers["hops"] * cost.link_dyn_packet
+        routers["switch"] = routers["switches"] * cost.router_dyn_packet
+        routers["total"] = routers["link"] + routers["switch"]
+        self.routers = routers
+
+        self.total_energy = cores["total"].sum() + routers["total"].sum()
+        cores["share"] = cores["total"] / self.total_energy
+        routers["share"] = routers["total"] / self.total_energy
+
+        self.layers = self.layer_energy(splits) if splits else None
+
+    # Cores only count per core, a core holding several layers splits its
+    # energy over them by number of neurons
+    def layer_energy(self, splits):
+        names = list(self.cores.index)
+        layers = [layer for layer, parts in splits.items()
+                  if any(core in self.cores.index for core, _, _ in parts)]
+        neurons = np.zeros((len(layers), len(names)))
+        for i, layer in enumerate(layers):
+            for core, start, end in splits[layer]:
+                if core in self.cores.index:
+                    neurons[i, names.index(core)] += end - start
+        totals = neurons.sum(axis=0)
+        weights = np.divide(neurons, totals, out=np.zeros_like(
+            neurons), where=totals > 0)
+
+        columns = ["static", "mem", "buffers", "alu", "sops", "total"]
+        frame = pandas.DataFrame(weights @ self.cores[columns].to_numpy(),
+                                 index=pandas.Index(layers, name="layer"), columns=columns)
+        frame["cores"] = (neurons > 0).sum(axis=1)
+        frame["share"] = frame["total"] / self.total_energy
+        return frame
+
+    # column of cores or routers laid out as a [height, width] mesh, NaN where
+    # there is none
+    def grid(self, frame, column):
+        grid = np.full((self.height, self.width), np.nan)
+        grid[frame["y"].to_numpy(), frame["x"].to_numpy()] = frame[column].to_numpy()
+        return grid
+
+    def core_grid(self, column="total"):
+        return self.grid(self.cores, column)
+
+    def router_grid(self, column="total"):
+        return self.grid(self.routers, column)
+
+    def save(self, dest_dir):
+        if not os.path.isdir(dest_dir):
+            os.makedirs(dest_dir)
+        self.cores.to_csv(f"{dest_dir}/cores.csv")
+        self.routers.to_csv(f"{dest_dir}/routers.csv")
+        if self.layers is not None:
+            self.layers.to_csv(f"{dest_dir}/layers.csv")
+        np.savez(f"{dest_dir}/grids.npz",
+                 core_total=self.core_grid(), core_mem=self.core_grid("mem"),
+                 core_alu=self.core_grid("alu"), core_sops=self.core_grid("sops"),
+                 router_total=self.router_grid(), router_hops=self.router_grid("hops"),
+                 router_switches=self.router_grid("switches"))
+
+
+def hotspots(frame, column="total", n=10):
+    return frame.sort_values(column, ascending=False).head(n)
+
+
+# y = 0 at the bottom, like the mesh coordinates
+def print_grid(grid, scale, unit):
+    print(f"  (x right, y up, {unit})")
+    for y in reversed(range(grid.shape[0])):
+        cells = [f"{'-':>8}" if np.isnan(v) else f"{v*scale:8.2f}" for v in grid[y]]
+        print(f"  {y:3} {' '.join(cells)}")
+
+
+if __name__ == "__main__":
+    expName = sys.argv[1]
+    modelName = sys.argv[2]
+    n = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    exp = pandas.read_csv(
+        f"res/exp/{expName}/results/{modelName}/experiments.csv")
+    c = Costs(f"res/exp/{expName}/model.json")
+    hw_path = f"res/exp/{expName}/hw.json"
+    mapping_path = f"res/exp/{expName}/mappings/{modelName}.json"
+    positions = HW(hw_path).cores if os.path.isfile(hw_path) else None
+    splits = load_mapping(mapping_path) if os.path.isfile(mapping_path) else None
+    a = Attribution(c, exp, positions, splits)
+    a.save(f"res/exp/{expName}/results/{modelName}/attribution")
+
+    print(f"Total: {a.total_energy:.3f} J (cores {a.cores['total'].sum():.3f} J, routers {a.routers['total'].sum():.3f} J)")
+    print(f"Core energy (mJ):")
+    print_grid(a.core_grid(), 1E3, "mJ")
+    print(f"Router energy (mJ):")
+    print_grid(a.router_grid(), 1E3, "mJ")
+    print(f"Hottest cores:")
+    print(hotspots(a.cores, n=n)[["x", "y", "total", "share", "mem", "alu", "static", "sops"]].to_string())
+    print(f"Hottest routers:")
+    print(hotspots(a.routers, n=n)[["x", "y", "total", "share", "hops", "switches"]].to_string())
+    if a.layers is not None:
+        print(f"Layers:")
+        print(a.layers.to_string())
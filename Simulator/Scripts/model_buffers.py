@@ -0,0 +1,246 @@
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import numpy as np
+import pandas
+from model_costs import *
+from model_metrics import *
+from model_generate_hw import save_hw
+from model_latency import LatencyModel, EAST, WEST, NORTH, SOUTH, LOCAL
+from model_reference import run_reference
+from model_traffic import HW, TrafficModel, load_mapping, xy_path
+from telemetry import SIM, run_sim
+
+# (sample, timestep) rows handled at once
+CHUNK = 4096
+
+
+# input port of every router on an XY path: where the packet came from
+def xy_in_ports(path):
+    ports = [LOCAL]
+    for (x, y), (nx, ny) in zip(path, path[1:]):
+        if nx > x:
+            ports.append(WEST)
+        elif nx < x:
+            ports.append(EAST)
+        elif ny > y:
+            ports.append(SOUTH)
+        else:
+            ports.append(NORTH)
+    return ports
+
+
+# FIFO that gets arrivals[..., l] at the start of line l and sends up to
+# service packets during a line: peak occupancy and departures per line
+def lindley(arrivals, service):
+    queue = np.zeros(arrivals.shape[:-1])
+    peak = np.zeros(arrivals.shape[:-1])
+    departures = np.zeros(arrivals.shape)
+    for l in range(arrivals.shape[-1]):
+        queue = queue + arrivals[..., l]
+        peak = np.maximum(peak, queue)
+        departures[..., l] = np.minimum(queue, service)
+        queue = queue - departures[..., l]
+    return peak, departures
+
+
+# Occupancy of the output buffer of every core and the input and output
+# buffers of every router port over a timestep, in sync lines: every line a
+# core syncs NrParallel neurons and pushes a packet per destination split for
+# each spike, while its sender and the router ports drain what they can in
+# the SyncII of a line. Cores start syncing together and the controller sends
+# its input spikes and syncs from the first line on.
+class BufferModel():
+    def __init__(self, traffic: TrafficModel, cost: Costs):
+        self.traffic = traffic
+        self.cost = cost
+        m = cost.m
+        hw = traffic.hw
+        latency = LatencyModel(traffic, cost)
+        self.window = min(d["SyncII"] for d in m["LayerDelays"].values())
+        self.core_service = self.window / latency.inject_delay
+        self.out_service = self.window / latency.port_delay
+        self.in_service = self.window / latency.switch_delay
+        self.out_ports = latency.ports
+
+        self.in_ports = np.zeros(self.out_ports.shape)
+        for i, (src, dst) in enumerate(traffic.pairs):
+            path = xy_path(hw.cores[src], hw.cores[dst])
+            for (x, y), port in zip(path, xy_in_ports(path)):
+                self.in_ports[i, hw.router_index(x, y) * 5 + port] += 1
+        self.port_names = [f"{name}_{p}" for name in hw.router_names()
+                           for p in ["east", "west", "north", "south", "local"]]
+
+        # senders: the controller and every active core, with the splits they
+        # sync in order and the packets every spike of a split makes
+        self.senders = [hw.controller] + traffic.active_cores
+        self.sender_splits = {c: [] for c in traffic.active_cores}
+        for k, entries in enumerate(traffic.neuron_packets):
+            layer = traffic.layers[k]
+            if layer.type in ["input", "output"]:
+                continue
+            for core, start, end in traffic.splits[k]:
+                fanout = sum(1 for s, e, _ in entries if (s, e) == (start, end))
+                self.sender_splits[core].append((k, start, end, fanout))
+        self.parallel = m["NrParallel"]
+        self.nr_lines = max([sum(math.ceil((e - s) / self.parallel) for _, s, e, _ in splits)
+                             for splits in self.sender_splits.values()] + [1])
+        src = np.array([self.senders.index(s) for s, _ in traffic.pairs])
+        self.pair_src = src
+
+    # spikes: every layer [rows, size] for one timestep per row
+    def arrivals(self, spikes):
+        rows = spikes[0].shape[0]
+        arrivals = np.zeros((rows, len(self.senders), self.nr_lines))
+        flows = self.traffic.packets(spikes, 1).astype(np.float64)
+        controller = self.senders.index(self.traffic.hw.controller)
+        arrivals[:, controller, 0] = flows[:, self.pair_src == controller].sum(axis=1)
+        for c, splits in self.sender_splits.items():
+            i = self.senders.index(c)
+            line = 0
+            for k, start, end, fanout in splits:
+                size = end - start
+                nr_lines = math.ceil(size / self.parallel)
+                padded = np.zeros((rows, nr_lines * self.parallel))
+                padded[:, :size] = spikes[k][:, start:end]
+                counts = padded.reshape(rows, nr_lines, self.parallel).sum(axis=2)
+                arrivals[:, i, line:line + nr_lines] += counts * fanout
+                line += nr_lines
+            # ready packet after the last line
+            arrivals[:, i, max(line - 1, 0)] += 1
+        return arrivals, flows
+
+    # peak occupancy [rows, ...] of core output buffers and router ports
+    def peaks(self, spikes):
+        arrivals, flows = self.arrivals(spikes)
+        core_peak, departures = lindley(arrivals, self.core_service)
+
+        # packets leave in proportion to the destinations of their sender
+        sent = np.zeros(departures.shape[:2])
+        np.add.at(sent.T, self.pair_src, flows.T)
+        share = flows / np.maximum(sent[:, self.pair_src], 1.0)
+        pair_lines = departures[:, self.pair_src, :] * share[:, :, None]
+
+        in_arrivals = np.einsum("rpl,pq->rql", pair_lines, self.in_ports)
+        in_peak, _ = lindley(in_arrivals, self.in_service)
+        # the switch is taken not to smooth the bursts towards the output ports
+        out_arrivals = np.einsum("rpl,pq->rql", pair_lines, self.out_ports)
+        out_peak, _ = lindley(out_arrivals, self.out_service)
+        return core_peak[:, 1:], in_peak, out_peak
+
+
+# peak occupancies of every core and port for every (sample, timestep)
+def burst_peaks(snn_path, hw_path, mapping_path, dataset_path, cost: Costs, max_samples=2147483647):
+    hw = HW(hw_path)
+    splits = load_mapping(mapping_path)
+    model = None
+    cores, ins, outs, spikes_per_step = [], [], [], []
+    for layers, _, _, _, nr_steps, _, _, trains in run_reference(snn_path, dataset_path, max_samples, keep_spikes=True):
+        if model is None:
+            model = BufferModel(TrafficModel(layers, splits, hw), cost)
+        batch_size, max_steps = trains[0].shape[:2]
+        active = (np.arange(max_steps)[None, :] < nr_steps[:, None]).reshape(-1)
+        flat = [t.reshape(batch_size * max_steps, -1)[active] for t in trains]
+        for start in range(0, flat[0].shape[0], CHUNK):
+            chunk = [f[start:start + CHUNK].astype(np.int64) for f in flat]
+            core_peak, in_peak, out_peak = model.peaks(chunk)
+            cores.append(core_peak)
+            ins.append(in_peak)
+            outs.append(out_peak)
+            spikes_per_step.append(np.stack([c.sum(axis=1) for c in chunk], axis=1))
+    return model, np.concatenate(cores), np.concatenate(ins), np.concatenate(outs), \
+        np.concatenate(spikes_per_step)
+
+
+# smallest depth d with P(peak > d) <= target
+def depth_for(peaks, target):
+    return max(1, int(math.ceil(np.quantile(peaks, 1.0 - target))))
+
+
+def buffer_costs(cost: Costs, output_depth, input_size, output_size):
+    out_bits = cost.output_mem_width * output_depth
+    in_bits = input_size * cost.packet_size
+    port_bits = output_size * cost.packet_size
+    area = cost.nr_cores * (cost.mem_area(out_bits) + 5 * (cost.mem_area(in_bits) + cost.mem_area(port_bits)))
+    leakage = cost.nr_cores * (cost.mem_leakage(out_bits) + 5 * (cost.mem_leakage(in_bits) + cost.mem_leakage(port_bits)))
+    return area, leakage
+
+
+# faulty spikes of a short dataset-sim with the given buffer depths
+def confirm(expName, modelName, dsFile, depths, max_samples):
+    output_depth, input_size, output_size = depths
+    m = json.load(open(f"res/exp/{expName}/model.json"))
+    m["OutputBufferDepth"] = output_depth
+    m["NoC"]["InputSize"] = input_size
+    m["NoC"]["OutputSize"] = output_size
+    tmp = tempfile.mkdtemp()
+    try:
+        model_path = os.path.join(tmp, "model.json")
+        hw_path = os.path.join(tmp, "hw.json")
+        json.dump(m, open(model_path, "w"), indent=4)
+        cost = Costs(model_path)
+        save_hw(model_path, hw_path, cost)
+        record = run_sim([SIM, "dataset-sim", "-s", f"res/snn/snn-{modelName}.json", "-h", hw_path,
+                          "-m", f"res/exp/{expName}/mappings/{modelName}.json",
+                          "-d", f"res/dataset/{dsFile}.zip", f"--max-samples={max_samples}", "-o", tmp],
+                         tags={"exp": expName, "model": modelName, "sizing": list(depths)}, echo=False)
+        if record["returncode"] != 0:
+            raise RuntimeError(f"dataset-sim failed: {record['output'].strip()[-200:]}")
+        return Metrics(cost, pandas.read_csv(os.path.join(tmp, "experiments.csv"))).nr_faults
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    # model_buffers.py <exp> <model> <dsFile> [target] [max_samples] [confirm_samples]
+    expName = sys.argv[1]
+    modelName = sys.argv[2]
+    dsFile = sys.argv[3]
+    target = float(sys.argv[4]) if len(sys.argv) > 4 else 1E-3
+    max_samples = int(sys.argv[5]) if len(sys.argv) > 5 else 100
+    confirm_samples = int(sys.argv[6]) if len(sys.argv) > 6 else 20
+
+    c = Costs(f"res/exp/{expName}/model.json")
+    model, core_peak, in_peak, out_peak, spikes = burst_peaks(
+        f"res/snn/snn-{modelName}.json", f"res/exp/{expName}/hw.json",
+        f"res/exp/{expName}/mappings/{modelName}.json", f"res/dataset/{dsFile}.zip", c, max_samples)
+
+    layers = model.traffic.layers
+    print(f"{spikes.shape[0]:,} timesteps")
+    print("Spikes per timestep:")
+    for k, layer in enumerate(layers):
+        print(f"  {layer.name}: mean {spikes[:, k].mean():.1f}, p99 {np.quantile(spikes[:, k], 0.99):.0f}, max {spikes[:, k].max():.0f}")
+    cores = pandas.DataFrame({
+        "mean": core_peak.mean(axis=0),
+        "p99": np.quantile(core_peak, 0.99, axis=0),
+        "max": core_peak.max(axis=0)
+    }, index=model.senders[1:])
+    print("Output buffer peak per core (packets):")
+    print(cores.sort_values("max", ascending=False).head(10).to_string(float_format=lambda v: f"{v:.1f}"))
+    ports = pandas.DataFrame({
+        "in_p99": np.quantile(in_peak, 0.99, axis=0),
+        "in_max": in_peak.max(axis=0),
+        "out_p99": np.quantile(out_peak, 0.99, axis=0),
+        "out_max": out_peak.max(axis=0)
+    }, index=model.port_names)
+    ports = ports[(ports["in_max"] > 0) | (ports["out_max"] > 0)]
+    print("Router port peaks (packets):")
+    print(ports.sort_values("in_max", ascending=False).head(10).to_string(float_format=lambda v: f"{v:.1f}"))
+
+    current = (c.m["OutputBufferDepth"], c.m["NoC"]["InputSize"], c.m["NoC"]["OutputSize"])
+    sized = (depth_for(core_peak.max(axis=1), target), depth_for(in_peak.max(axis=1), target),
+             depth_for(out_peak.max(axis=1), target))
+    for name, depths in [("current", current), ("sized", sized)]:
+        p = [(core_peak.max(axis=1) > depths[0]).mean(), (in_peak.max(axis=1) > depths[1]).mean(),
+             (out_peak.max(axis=1) > depths[2]).mean()]
+        area, leakage = buffer_costs(c, *depths)
+        print(f"{name}: OutputBufferDepth {depths[0]}, InputSize {depths[1]}, OutputSize {depths[2]}, "
+              f"P(overflow) {max(p):.2e}, buffer area {area * 1E-6:,.2f} mm^2, leakage {leakage * 1E6:,.1f} uW")
+
+    if confirm_samples > 0:
+        for name, depths in [("current", current), ("sized", sized)]:
+            print(f"{name}: {confirm(expName, modelName, dsFile, depths, confirm_samples)} faulty spikes "
+                  f"in {confirm_samples} samples")
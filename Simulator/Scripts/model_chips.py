@@ -0,0 +1,185 @@
+import itertools
+import math
+import sys
+import numpy as np
+import pandas
+from model_costs import *
+from model_attribution import default_positions
+from model_mapping import firing_rates, packing_layers
+from model_packing import estimate_cores
+from model_reference import load_snn
+
+# without a dataset every neuron spikes at this rate for this many timesteps
+UNIFORM_RATE = 0.05
+UNIFORM_STEPS = 100
+
+
+# Splits of the hidden layers of a network over nr_chips meshes. The hidden
+# layers are cut into consecutive groups, one per chip, and every group is
+# packed by FirstFit1 on its own chip, so that only layer boundaries cross
+# chips. Of all cuts that fit, the one with the fewest cores on the fullest
+# chip is taken, then the one using the fewest chips. Every group is placed
+# on the cores of its chip in save_hw order. The input and output layers
+# live on the controller of chip 0. Packets between chips go from the
+# source core to the bridge at (0,0), over the link between both chips and
+# from the bridge to the destination core.
+class Partition():
+    def __init__(self, layers, rates, nr_steps, cost: Costs, nr_chips):
+        self.layers = layers
+        self.cost = cost
+        self.nr_chips = nr_chips
+        self.nr_steps = nr_steps
+        index = {l["Name"]: i for i, l in enumerate(layers)}
+        hidden = [l for l in layers if l["Type"] not in ["input", "output"]]
+
+        packed = {}
+
+        def pack(start, end):
+            if (start, end) not in packed:
+                packed[(start, end)] = estimate_cores(hidden[start:end], cost.m)
+            return packed[(start, end)]
+
+        best = None
+        for nr_groups in range(1, min(nr_chips, len(hidden)) + 1):
+            for cuts in itertools.combinations(range(1, len(hidden)), nr_groups - 1):
+                bounds = list(zip((0,) + cuts, cuts + (len(hidden),)))
+                groups = [pack(start, end) for start, end in bounds]
+                if any(m["Unmapped"] or n > cost.nr_cores for n, m in groups):
+                    continue
+                fullest = max(n for n, _ in groups)
+                if best is None or fullest < best[0]:
+                    best = (fullest, groups)
+        if best is None:
+            raise ValueError(f"Layers do not fit on {nr_chips} chips of {cost.nr_cores} cores")
+
+        # unit: (chip, position, [(layer, start, end)]), unit 0 the controller
+        positions = list(default_positions(cost.width, cost.height).values())
+        self.units = [(0, (0, 0), [(i, 0, l["Size"]) for i, l in enumerate(layers)
+                                   if l["Type"] in ["input", "output"]])]
+        for chip, (_, mapping) in enumerate(best[1]):
+            by_core = {}
+            for entry in mapping["Mapped"]:
+                by_core.setdefault(entry["Core"], []).append(
+                    (index[entry["Layer"]], entry["Start"], entry["End"]))
+            for n, core in enumerate(sorted(by_core, key=lambda c: int(c[len("core"):]))):
+                self.units.append((chip, positions[n], by_core[core]))
+        self.chips_used = len(best[1])
+
+        # packets per inference between units: every spike goes to all units
+        # holding the next layer and, when recurrent, its own layer
+        holders = {}
+        for u, (_, _, parts) in enumerate(self.units):
+            for k, _, _ in parts:
+                holders.setdefault(k, []).append(u)
+        nr = len(self.units)
+        self.traffic = np.zeros((nr, nr))
+        for u, (_, _, parts) in enumerate(self.units):
+            for k, start, end in parts:
+                spikes = rates[k][start:end].sum()
+                dests = holders.get(k + 1, []) + (holders[k] if layers[k]["Recurrent"] else [])
+                for v in dests:
+                    self.traffic[u, v] += spikes
+        # a sync to and a ready packet from every core each timestep
+        self.traffic[0, 1:] += nr_steps
+        self.traffic[1:, 0] += nr_steps
+
+        chip = np.array([c for c, _, _ in self.units])
+        pos = np.array([p for _, p, _ in self.units])
+        to_bridge = pos.sum(axis=1)
+        local = np.abs(pos[:, None, :] - pos[None, :, :]).sum(axis=2)
+        self.crossing = chip[:, None] != chip[None, :]
+        self.hops = np.where(self.crossing, to_bridge[:, None] + to_bridge[None, :], local)
+        self.switches = self.hops + np.where(self.crossing, 2, 1)
+        self.chip = chip
+
+    # packets per inference over every chip pair link, [chips, chips]
+    def link_packets(self):
+        onehot = np.eye(self.nr_chips)[self.chip]
+        packets = onehot.T @ np.where(self.crossing, self.traffic, 0.0) @ onehot
+        return packets
+
+    def report(self):
+        c = self.cost
+        m = c.m
+        packets = self.traffic.sum()
+        crossing = (self.traffic * self.crossing).sum()
+        hops = (self.traffic * self.hops).sum()
+        switches = (self.traffic * self.switches).sum()
+        links = self.link_packets()
+
+        # timestep: slowest core syncing its neurons and integrating what it
+        # receives, the busiest link and, across chips, a sync and a ready
+        # packet over a link
+        step = 0.0
+        for v, (_, _, parts) in enumerate(self.units[1:], start=1):
+            received = self.traffic[:, v].sum() / self.nr_steps
+            busy = 0.0
+            for k, start, end in parts:
+                delays = m["LayerDelays"][self.layers[k]["Type"]]
+                lines = math.ceil((end - start) / m["NrParallel"])
+                busy += delays["SyncLat"] + (lines - 1) * delays["SyncII"]
+                busy += received * (delays["IntegrateLat"] + (lines - 1) * delays["IntegrateII"])
+            step = max(step, busy)
+        noc = m["NoC"]
+        step += 2 * (c.width + c.height) * (noc["SwitchDelay"] + c.router_transfer_delay)
+        if self.chips_used > 1:
+            step += links.max() / self.nr_steps * c.chip_link_delay + 2 * c.chip_link_latency
+        latency = step * self.nr_steps * 1E-12
+
+        nr_active = len(self.units) - 1
+        static = latency * (c.core_static * nr_active + c.chip_link_static * self.chips_used)
+        router = hops * c.link_dyn_packet + switches * c.router_dyn_packet
+        link = crossing * c.chip_link_dyn_packet
+        return {
+            "chips": self.nr_chips,
+            "chips_used": self.chips_used,
+            "cores": nr_active,
+            "area_mm2": c.chips_area(self.nr_chips) * 1E-6,
+            "packets": packets,
+            "crossing_packets": crossing,
+            "link_bits": crossing * c.packet_size,
+            "busiest_link_packets": links.max(),
+            "static_energy": static,
+            "router_energy": router,
+            "link_energy": link,
+            "energy": static + router + link,
+            "latency": latency,
+            "inferences_per_second": 1.0 / latency
+        }
+
+
+def scaling(layers, rates, nr_steps, cost: Costs, max_chips):
+    rows = []
+    for nr_chips in range(1, max_chips + 1):
+        try:
+            rows.append(Partition(layers, rates, nr_steps, cost, nr_chips).report())
+        except ValueError as e:
+            print(f"{nr_chips} chips: {e}")
+    return pandas.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    # model_chips.py <exp> <model> [max_chips] [dsFile [max_samples]]
+    expName = sys.argv[1]
+    modelName = sys.argv[2]
+    max_chips = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+    cost = Costs(f"res/exp/{expName}/model.json")
+    snn_path = f"res/snn/snn-{modelName}.json"
+    if len(sys.argv) > 4:
+        max_samples = int(sys.argv[5]) if len(sys.argv) > 5 else 1000
+        snn, rates, nr_steps = firing_rates(snn_path, f"res/dataset/{sys.argv[4]}.zip", max_samples)
+    else:
+        snn = load_snn(snn_path)
+        nr_steps = UNIFORM_STEPS
+        rates = [np.full(l.size, UNIFORM_RATE * nr_steps) for l in snn]
+    layers = packing_layers(snn)
+
+    df = scaling(layers, rates, nr_steps, cost, max_chips)
+    if df.empty:
+        sys.exit(1)
+    base = df.iloc[0]
+    df["area_scale"] = df["area_mm2"] / base["area_mm2"]
+    df["energy_scale"] = df["energy"] / base["energy"]
+    df["throughput_scale"] = df["inferences_per_second"] / base["inferences_per_second"]
+    print(df.to_string(index=False, float_format=lambda v: f"{v:.4g}"))
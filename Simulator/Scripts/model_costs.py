@@ -3,11 +3,30 @@ import math
 import sys
 
 
+# Technology assumptions used when model.json has no "Technology" entry.
+# They only change the energy and area model, never the simulated behaviour.
+TECHNOLOGY = {
+    "Voltage": 1.1,
+    "RefVoltage": 1.2,
+    "MemArea": [0.4586, 12652],
+    "MemLeakage": [8E-05, 1.822],
+    "MemDynRead": [0.0000331817313, 0.200534285, 3.70946309],
+    "MemDynWrite": [0.0000467955605, 0.305233644, 3.23205817],
+    "RouterBit": 0.98,
+    "LinkBit": [0.39, 0.12],
+    "ALU": {}
+}
+
+
 class Costs():
-    def __init__(self, model_path: str):
+    def __init__(self, model_path: str, technology=None):
         # parse model
         m = json.load(open(model_path))
         self.m = m
+        self.technology = dict(TECHNOLOGY)
+        self.technology.update(m.get("Technology", {}))
+        self.technology.update(technology or {})
+        tech = self.technology
 
         # parse costs
         self.alu_costs = {
@@ -28,32 +47,21 @@ class Costs():
                 "Dynamic": 7.701E-12
             }
         }
+        for name, values in tech["ALU"].items():
+            self.alu_costs[name] = {**self.alu_costs.get(name, {}), **values}
 
         self.width = m["NoC"]["Width"]
         self.height = m["NoC"]["Height"]
         self.size = self.width * self.height
         self.nr_cores = self.size - 1
         feedback = 1
-        my_voltage = 1.1
-        wolkotte_voltage = 1.2
+        self.voltage = tech["Voltage"]
         self.period = 1E4
         neuron_offset_size = 16
 
         def addr(x):
             return math.ceil(math.log2(x))
 
-        def mem_area(bits):  # um^2
-            return 0.4586 * bits + 12652
-
-        def mem_leakage(bits):  # W
-            return (8E-05 * bits + 1.822) * my_voltage * 1E-6
-
-        def mem_dyn_read(bits, word_size):  # J
-            return (0.0000331817313*bits+0.200534285*word_size+3.70946309)*1E-12
-
-        def mem_dyn_write(bits, word_size):  # J
-            return (0.0000467955605*bits+0.305233644*word_size+3.23205817)*1E-12
-
         # address size calculations
         dx = addr(self.width)
         dy = addr(self.height)
@@ -95,11 +103,11 @@ class Costs():
         self.router_output_mem_size = m["NoC"]["OutputSize"] * self.packet_size
 
         # core area: um^2
-        self.neuron_area = mem_area(self.neuron_mem_size)
-        self.syn_area = mem_area(self.syn_mem_size)
-        self.layer_area = mem_area(self.layer_mem_size)
-        self.output_area = mem_area(self.output_mem_size)
-        self.compute_area = mem_area(self.compute_mem_size)
+        self.neuron_area = self.mem_area(self.neuron_mem_size)
+        self.syn_area = self.mem_area(self.syn_mem_size)
+        self.layer_area = self.mem_area(self.layer_mem_size)
+        self.output_area = self.mem_area(self.output_mem_size)
+        self.compute_area = self.mem_area(self.compute_mem_size)
         core_mem_area = self.neuron_area + self.syn_area + \
             self.layer_area + self.output_area + self.compute_area
 
@@ -111,19 +119,19 @@ class Costs():
         self.core_area = core_mem_area + self.alu_area_total
 
         # router area
-        self.router_input_area = mem_area(self.router_input_mem_size)
-        self.router_output_area = mem_area(self.router_output_mem_size)
+        self.router_input_area = self.mem_area(self.router_input_mem_size)
+        self.router_output_area = self.mem_area(self.router_output_mem_size)
         self.router_area = 5 * self.router_input_area + 5 * self.router_output_area
         self.chip_area = (self.core_area + self.router_area) * self.nr_cores
         self.synaptic_area = self.chip_area / \
             (self.nr_cores * m["MaxSynapses"])
 
         # Static: W
-        self.neuron_static = mem_leakage(self.neuron_mem_size)
-        self.layer_static = mem_leakage(self.layer_mem_size)
-        self.syn_static = mem_leakage(self.syn_mem_size)
-        self.compute_static = mem_leakage(self.compute_mem_size)
-        self.output_static = mem_leakage(self.output_mem_size)
+        self.neuron_static = self.mem_leakage(self.neuron_mem_size)
+        self.layer_static = self.mem_leakage(self.layer_mem_size)
+        self.syn_static = self.mem_leakage(self.syn_mem_size)
+        self.compute_static = self.mem_leakage(self.compute_mem_size)
+        self.output_static = self.mem_leakage(self.output_mem_size)
         self.core_mem_static = (self.neuron_static + self.layer_static + self.syn_static +
                                 self.compute_static + self.output_static)
 
@@ -138,36 +146,36 @@ class Costs():
 
         # Dynamic: Depends on memory + layer operations using Aladdin
         l = (self.core_area/1E6)**(0.5)  # calculate dimensions of cores
-        technology = my_voltage**2 / wolkotte_voltage**2
-        self.router_dyn_bit = 0.98 * technology * 1E-12
-        self.link_dyn_bit = (0.39 + 0.12*l) * technology * 1E-12
+        technology = self.voltage**2 / tech["RefVoltage"]**2
+        self.router_dyn_bit = tech["RouterBit"] * technology * 1E-12
+        self.link_dyn_bit = (tech["LinkBit"][0] + tech["LinkBit"][1]*l) * technology * 1E-12
         self.router_dyn_packet = self.router_dyn_bit * \
             self.packet_size  # Depends on formula from Wolkotte
         self.link_dyn_packet = self.link_dyn_bit * self.packet_size
 
         # memory energies
         # per layer, per neuron, per synapse energies
-        self.layer_mem_read = mem_dyn_read(
+        self.layer_mem_read = self.mem_dyn_read(
             self.layer_mem_size, self.layer_mem_width)
-        self.layer_mem_write = mem_dyn_write(
+        self.layer_mem_write = self.mem_dyn_write(
             self.layer_mem_size, self.layer_mem_width)
-        self.neuron_mem_read = mem_dyn_read(
+        self.neuron_mem_read = self.mem_dyn_read(
             self.neuron_mem_size, self.neuron_mem_width) / nr_parallel
-        self.neuron_mem_write = mem_dyn_write(
+        self.neuron_mem_write = self.mem_dyn_write(
             self.neuron_mem_size, self.neuron_mem_width) / nr_parallel
-        self.syn_mem_read = mem_dyn_read(
+        self.syn_mem_read = self.mem_dyn_read(
             self.syn_mem_size, self.syn_mem_width) / nr_parallel
-        self.syn_mem_write = mem_dyn_write(
+        self.syn_mem_write = self.mem_dyn_write(
             self.syn_mem_size, self.syn_mem_width) / nr_parallel
 
         # Buffer energies
-        self.compute_buf_pops = mem_dyn_read(
+        self.compute_buf_pops = self.mem_dyn_read(
             self.compute_mem_size, self.compute_mem_width)
-        self.compute_buf_pushes = mem_dyn_write(
+        self.compute_buf_pushes = self.mem_dyn_write(
             self.compute_mem_size, self.compute_mem_width)
-        self.output_buf_pops = mem_dyn_read(
+        self.output_buf_pops = self.mem_dyn_read(
             self.output_mem_size, self.output_mem_width)
-        self.output_buf_pushes = mem_dyn_write(
+        self.output_buf_pushes = self.mem_dyn_write(
             self.output_mem_size, self.output_mem_width)
 
         # should be in PS
@@ -175,6 +183,41 @@ class Costs():
         self.router_transfer_delay = noc["TransferDelay"] if "NrDataWires" not in noc \
             else math.ceil(self.packet_size / noc["NrDataWires"]) * noc["TransferDelay"]
 
+        # multi-chip systems: identical meshes, the controller on chip 0 and a
+        # bridge to the links of the other chips at (0,0) of every chip
+        chips = m.get("Chips", {})
+        link = chips.get("Link", {})
+        self.nr_chips = chips.get("Count", 1)
+        self.chip_link_dyn_bit = link.get("EnergyBit", 10E-12)  # J
+        self.chip_link_dyn_packet = self.chip_link_dyn_bit * self.packet_size
+        self.chip_link_bandwidth = link.get("Bandwidth", 16)  # bits per ns
+        self.chip_link_latency = link.get("Latency", 20000)  # ps
+        self.chip_link_delay = self.chip_link_latency + \
+            math.ceil(self.packet_size * 1000 / self.chip_link_bandwidth)
+        self.chip_link_area = link.get("Area", 0.0)  # um^2 per chip
+        self.chip_link_static = link.get("Static", 0.0)  # W per chip
+        self.system_cores = self.nr_cores * self.nr_chips
+        self.system_area = self.chips_area(self.nr_chips)
+
+    def chips_area(self, nr_chips):  # um^2
+        return (self.chip_area + (self.chip_link_area if nr_chips > 1 else 0.0)) * nr_chips
+
+    def mem_area(self, bits):  # um^2
+        a, b = self.technology["MemArea"]
+        return a * bits + b
+
+    def mem_leakage(self, bits):  # W
+        a, b = self.technology["MemLeakage"]
+        return (a * bits + b) * self.voltage * 1E-6
+
+    def mem_dyn_read(self, bits, word_size):  # J
+        a, b, c = self.technology["MemDynRead"]
+        return (a*bits+b*word_size+c)*1E-12
+
+    def mem_dyn_write(self, bits, word_size):  # J
+        a, b, c = self.technology["MemDynWrite"]
+        return (a*bits+b*word_size+c)*1E-12
+
     def print_summary(self):
         print(f"Core memory:")
         print(
@@ -226,6 +269,9 @@ class Costs():
             f"    Output: {self.router_output_area:,.2f} um^2 ({self.router_output_area*1E-6:,.2f} mm^2)")
         print(
             f"  Chip: {self.chip_area:,.2f} um^2 ({self.chip_area*1E-6:,.2f} mm^2)")
+        if self.nr_chips > 1:
+            print(
+                f"  System: {self.nr_chips} chips, {self.system_area:,.2f} um^2 ({self.system_area*1E-6:,.2f} mm^2)")
 
         print(f"Static power:")
         print(f"  Chip: {self.chip_static*1E6:,.2f} uW")
@@ -267,9 +313,15 @@ class Costs():
         print(f"      Output:")
         print(f"        Pop: {self.output_buf_pops * 1E12:,.2f} pJ / pop")
         print(f"        Push: {self.output_buf_pushes * 1E12:,.2f} pJ / push")
+        if self.nr_chips > 1:
+            print(
+                f"  Chip link: {self.chip_link_dyn_bit * 1E12:,.2f} pJ/b ({self.chip_link_dyn_packet * 1E12:,.2f} pJ/packet)")
         print(f"Delays:")
         print(
             f"  Packet transfer: {self.router_transfer_delay:,} ps")
+        if self.nr_chips > 1:
+            print(
+                f"  Chip link: {self.chip_link_delay:,} ps ({self.chip_link_bandwidth} Gb/s, {self.chip_link_latency:,} ps latency)")
         for layer, values in self.m["LayerDelays"].items():
             print(f"  {layer}:")
             print(
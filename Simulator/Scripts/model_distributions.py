@@ -0,0 +1,122 @@
+import sys
+import numpy as np
+import pandas
+from model_costs import *
+from model_metrics import *
+
+PERCENTILES = [50, 90, 99]
+
+
+def tail(values):
+    values = np.asarray(values, dtype=np.float64)
+    stats = {f"p{p}": np.percentile(values, p) for p in PERCENTILES}
+    stats["max"] = values.max()
+    stats["mean"] = values.mean()
+    return stats
+
+
+def print_histogram(values, scale, unit, bins=20, width=50):
+    counts, edges = np.histogram(np.asarray(values) * scale, bins=bins)
+    for count, low, high in zip(counts, edges, edges[1:]):
+        bar = "#" * int(round(width * count / counts.max()))
+        print(f"  {low:10.2f} - {high:10.2f} {unit} | {count:6} {bar}")
+
+
+# Response times of a single chip serving a Poisson stream of inferences in
+# FIFO order, using the Lindley recursion with service times drawn from the
+# simulated latencies
+def poisson_response(latency, rate, nr_arrivals=100000, seed=0):
+    rng = np.random.default_rng(seed)
+    service = rng.choice(np.asarray(latency, dtype=np.float64), nr_arrivals)
+    interarrival = rng.exponential(1.0 / rate, nr_arrivals)
+    wait = np.zeros(nr_arrivals)
+    for i in range(1, nr_arrivals):
+        wait[i] = max(0.0, wait[i - 1] + service[i - 1] - interarrival[i])
+    return wait + service
+
+
+# M/G/1 mean response time (Pollaczek-Khinchine), inf when overloaded
+def mg1_response(latency, rate):
+    latency = np.asarray(latency, dtype=np.float64)
+    util = rate * latency.mean()
+    if util >= 1.0:
+        return math.inf
+    return latency.mean() + rate * (latency ** 2).mean() / (2 * (1 - util))
+
+
+# highest Poisson rate at which the p99 response time stays within the SLO
+def max_rate(latency, slo, iterations=20):
+    low, high = 0.0, 1.0 / np.mean(latency)
+    if np.percentile(latency, 99) > slo:
+        return 0.0
+    for _ in range(iterations):
+        rate = (low + high) / 2
+        if np.percentile(poisson_response(latency, rate, 20000), 99) <= slo:
+            low = rate
+        else:
+            high = rate
+    return low
+
+
+class Distributions():
+    def __init__(self, m: Metrics):
+        self.latency = m.latency.values
+        self.energy = m.sample_energy.values
+        self.sops = m.sample_sops.values
+        self.latency_tail = tail(self.latency)
+        self.energy_tail = tail(self.energy)
+        self.sops_tail = tail(self.sops)
+
+        # back to back: the next inference starts when the previous one ends
+        self.back_to_back = 1.0 / self.latency.mean()
+
+    def poisson(self, rate):
+        response = poisson_response(self.latency, rate)
+        return {
+            "rate": rate,
+            "utilization": rate * self.latency.mean(),
+            "throughput": min(rate, self.back_to_back),
+            "mean": mg1_response(self.latency, rate),
+            "response": tail(response)
+        }
+
+    def print_summary(self):
+        print(f"Samples: {len(self.latency)}")
+        for name, stats, scale, unit in [("Latency", self.latency_tail, 1E6, "us"),
+                                         ("Energy", self.energy_tail, 1E6, "uJ"),
+                                         ("SOPs", self.sops_tail, 1.0, "")]:
+            values = ", ".join(
+                f"{k}: {v*scale:,.2f}" for k, v in stats.items())
+            print(f"{name} ({unit or 'count'}): {values}")
+        print(f"Latency histogram:")
+        print_histogram(self.latency, 1E6, "us")
+        print(f"Energy histogram:")
+        print_histogram(self.energy, 1E6, "uJ")
+        print(f"Back to back: {self.back_to_back:,.2f} inferences/s")
+
+
+if __name__ == "__main__":
+    expName = sys.argv[1]
+    modelName = sys.argv[2]
+    rate = float(sys.argv[3]) if len(sys.argv) > 3 else None
+    slo = float(sys.argv[4]) * 1E-6 if len(sys.argv) > 4 else None
+
+    exp = pandas.read_csv(
+        f"res/exp/{expName}/results/{modelName}/experiments.csv")
+    c = Costs(f"res/exp/{expName}/model.json")
+    d = Distributions(Metrics(c, exp))
+    d.print_summary()
+
+    if rate is not None:
+        p = d.poisson(rate)
+        response = ", ".join(
+            f"{k}: {v*1E6:,.2f}" for k, v in p["response"].items())
+        print(f"Poisson at {rate:,.2f} inferences/s:")
+        print(f"  Utilization: {p['utilization']:.3f}")
+        print(f"  Throughput: {p['throughput']:,.2f} inferences/s")
+        print(f"  Mean response (M/G/1): {p['mean']*1E6:,.2f} us")
+        print(f"  Response (us): {response}")
+
+    if slo is not None:
+        print(
+            f"Max Poisson rate with p99 <= {slo*1E6:,.2f} us: {max_rate(d.latency, slo):,.2f} inferences/s")
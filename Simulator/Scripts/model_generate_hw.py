@@ -1,35 +1,23 @@
+import glob
 import json
 import math
 from multiprocessing.sharedctypes import Value
 import sys
-from orderings import matrix_colMajor, matrix_diagonal
+from orderings import matrix_colMajor, orderings, best_ordering
 
 from model_costs import Costs
 
 
-def save_hw(model_path: str, hw_path: str, costs: Costs):
-    f = open(model_path)
-    m = json.load(f)
+# networks used to pick the ordering when CoreOrdering is Auto
+def snn_networks(pattern="res/snn/snn-*.json"):
+    from model_mapping import packing_layers
+    from model_reference import load_shapes
+    return [packing_layers(load_shapes(path)) for path in sorted(glob.glob(pattern))]
 
-    width = m["NoC"]["Width"]
-    height = m["NoC"]["Height"]
-    size = width * height
 
-    hw = {"Global": {}, "CoreTemplates": {}}
-    hw["NoC"] = {
-        "Type": "XYMesh",
-        "Width": width,
-        "Height": height,
-        "InputSize": m["NoC"]["InputSize"],
-        "OutputSize": m["NoC"]["OutputSize"],
-        "SwitchDelay": m["NoC"]["SwitchDelay"],
-        "TransferDelay": int(costs.router_transfer_delay),
-        "InputDelay": m["NoC"]["InputDelay"],
-        "OutputDelay": m["NoC"]["OutputDelay"],
-        "ReportLatency": True,
-        "ReportTraffic": False
-    }
-    hw["CoreTemplates"]["Core"] = {
+# template of every core but the controller, also what the ordering search maps on
+def core_template(m):
+    template = {
         "Type": "core-v1",
         "Accepts": [
             "ALIF"
@@ -47,23 +35,53 @@ def save_hw(model_path: str, hw_path: str, costs: Costs):
         "ShowLayerStats": False,
         "ShowALUStats": True
     }
-    hw["CoreTemplates"]["Core"]["LayerCosts"] = {}
+    template["LayerCosts"] = {}
     for layer, latencies in m["LayerDelays"].items():
-        hw["CoreTemplates"]["Core"]["LayerCosts"][layer] = {
+        template["LayerCosts"][layer] = {
             "SyncII": int(latencies["SyncII"]),
             "SyncLat": int(latencies["SyncLat"]),
             "IntegrateII": int(latencies["IntegrateII"]),
             "IntegrateLat": int(latencies["IntegrateLat"])
         }
+    return template
+
+
+def save_hw(model_path: str, hw_path: str, costs: Costs, networks=None):
+    f = open(model_path)
+    m = json.load(f)
+
+    width = m["NoC"]["Width"]
+    height = m["NoC"]["Height"]
+    size = width * height
+
+    hw = {"Global": {}, "CoreTemplates": {}}
+    hw["NoC"] = {
+        "Type": "XYMesh",
+        "Width": width,
+        "Height": height,
+        "InputSize": m["NoC"]["InputSize"],
+        "OutputSize": m["NoC"]["OutputSize"],
+        "SwitchDelay": m["NoC"]["SwitchDelay"],
+        "TransferDelay": int(costs.router_transfer_delay),
+        "InputDelay": m["NoC"]["InputDelay"],
+        "OutputDelay": m["NoC"]["OutputDelay"],
+        "ReportLatency": True,
+        "ReportTraffic": False
+    }
+    hw["CoreTemplates"]["Core"] = core_template(m)
 
     hw["Cores"] = []
     coreNumber = 0
     if "CoreOrdering" not in m:
         ordering = matrix_colMajor(width, height)
-    elif m["CoreOrdering"] == "ColumnMajor":
-        ordering = matrix_colMajor(width, height)
-    elif m["CoreOrdering"] == "Diagonal":
-        ordering = matrix_diagonal(width, height)
+    elif m["CoreOrdering"] == "Auto":
+        if not networks:
+            raise ValueError("CoreOrdering Auto needs at least one SNN")
+        name, _ = best_ordering(width, height, networks, m)
+        print(f"{model_path}: using {name} ordering")
+        ordering = orderings[name](width, height)
+    elif m["CoreOrdering"] in orderings:
+        ordering = orderings[m["CoreOrdering"]](width, height)
     else:
         raise ValueError(f"Unknown ordering type: {m['CoreOrdering']}")
     for x in range(width):
@@ -90,15 +108,41 @@ def save_hw(model_path: str, hw_path: str, costs: Costs):
                     "ConnectsTo": f"{x},{y}"
                 })
                 coreNumber = coreNumber + 1
+
+    # The simulator runs chip 0, the other chips are listed with their cores
+    # and the links between the bridges at (0,0) of every chip
+    if costs.nr_chips > 1:
+        hw["Chips"] = []
+        for chip in range(costs.nr_chips):
+            prefix = "" if chip == 0 else f"chip{chip}_"
+            cores = [{"Name": f"{prefix}{core['Name']}", "Priority": core["Priority"],
+                      "ConnectsTo": core["ConnectsTo"]} for core in hw["Cores"][1:]]
+            hw["Chips"].append({
+                "Name": f"chip{chip}",
+                "Width": width,
+                "Height": height,
+                "Bridge": "0,0",
+                "Controller": "controller" if chip == 0 else None,
+                "Cores": cores
+            })
+        hw["ChipLinks"] = {
+            "Topology": "AllToAll",
+            "Bandwidth": costs.chip_link_bandwidth,
+            "Latency": costs.chip_link_latency,
+            "TransferDelay": int(costs.chip_link_delay)
+        }
     json.dump(hw, open(hw_path, mode="w"), indent=4, sort_keys=False)
 
 
 if __name__ == "__main__":
     expNames = sys.argv[1].split(",")
+    networks = None
 
     for expName in expNames:
         model_path = f"res/exp/{expName}/model.json"
         cost_path = f"res/exp/{expName}/cost.json"
         hw_path = f"res/exp/{expName}/hw.json"
         costs = Costs(model_path)
-        save_hw(model_path, hw_path, costs)
+        if networks is None and json.load(open(model_path)).get("CoreOrdering") == "Auto":
+            networks = snn_networks()
+        save_hw(model_path, hw_path, costs, networks)
@@ -0,0 +1,270 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas
+from model_costs import *
+from model_reference import run_reference
+from model_traffic import HW, TrafficModel, load_mapping, xy_path
+
+# output ports of an XYRouter, local is the port towards the core
+EAST, WEST, NORTH, SOUTH, LOCAL = range(5)
+MAX_UTIL = 0.95
+
+
+def xy_ports(path):
+    ports = []
+    for (x, y), (nx, ny) in zip(path, path[1:]):
+        if nx > x:
+            ports.append(EAST)
+        elif nx < x:
+            ports.append(WEST)
+        elif ny > y:
+            ports.append(NORTH)
+        else:
+            ports.append(SOUTH)
+    return ports + [LOCAL]
+
+
+# waiting time of an M/D/1 queue with deterministic service time s
+def md1_wait(rate, s):
+    util = np.minimum(rate * s, MAX_UTIL)
+    return util * s / (2 * (1 - util))
+
+
+# integrate and sync delay of a split of size neurons, as CoreV1 computes
+# them: its lines are MathUtils.CeilDivide(size, nr_parallel)
+def split_delays(delays, size, nr_parallel):
+    lines = -(-size // nr_parallel)
+    integrate = delays["IntegrateLat"] + (lines - 1) * delays["IntegrateII"]
+    sync = delays["SyncLat"] + (lines - 1) * delays["SyncII"]
+    return integrate, sync
+
+
+# Every router is a switch (SwitchDelay per packet) followed by one output
+# link per direction (TransferDelay, or OutputDelay towards the core), each
+# modelled as an M/D/1 queue fed by the packets of one timestep. The cores
+# are a pipeline of integrating, syncing and sending, with the controller
+# injecting the input spikes and the syncs one by one. A timestep ends when
+# the last ready packet reaches the controller.
+class LatencyModel():
+    def __init__(self, traffic: TrafficModel, cost: Costs):
+        self.traffic = traffic
+        hw = traffic.hw
+        noc = cost.m["NoC"]
+        self.switch_delay = noc["SwitchDelay"]
+        self.inject_delay = max(noc["InputDelay"], self.switch_delay)
+        nr_routers = hw.width * hw.height
+
+        # service time of every output port
+        self.port_delay = np.tile(
+            [cost.router_transfer_delay] * 4 + [noc["OutputDelay"]], nr_routers).astype(np.float64)
+
+        nr_pairs = len(traffic.pairs)
+        self.ports = np.zeros((nr_pairs, nr_routers * 5))
+        self.zero_load = np.zeros(nr_pairs)
+        for i, (src, dst) in enumerate(traffic.pairs):
+            path = xy_path(hw.cores[src], hw.cores[dst])
+            for (x, y), port in zip(path, xy_ports(path)):
+                self.ports[i, hw.router_index(x, y) * 5 + port] += 1
+            self.zero_load[i] = noc["InputDelay"] + len(path) * self.switch_delay + \
+                self.ports[i] @ self.port_delay
+        self.switches = traffic.switches.astype(np.float64)
+
+        # packets every core sends
+        self.cores = list(hw.cores)
+        self.src = np.zeros((nr_pairs, len(self.cores)))
+        for i, (src, _) in enumerate(traffic.pairs):
+            self.src[i, self.cores.index(src)] = 1
+        self.controller = self.cores.index(hw.controller)
+        self.active = [self.cores.index(c) for c in traffic.active_cores]
+
+        # integrate and sync delay of every layer split per core
+        self.core_splits = {c: [] for c in self.active}
+        for k, layer in enumerate(traffic.layers):
+            if layer.type in ["input", "output"]:
+                continue
+            delays = cost.m["LayerDelays"][layer.type]
+            for core, start, end in traffic.splits[k]:
+                integrate, sync = split_delays(delays, end - start, cost.m["NrParallel"])
+                self.core_splits[self.cores.index(core)].append(
+                    (k, integrate, sync))
+
+    # integrated spikes of layer k at timestep t: its input spikes of t (or of
+    # t - 1 for hidden layers) and its own spikes of t - 1 when recurrent
+    def integrated(self, k, now, prev):
+        layer = self.traffic.layers[k]
+        inputs = now[0] if k == 1 else prev[k - 1]
+        count = inputs.sum(axis=1)
+        if layer.recurrent:
+            count = count + prev[k].sum(axis=1)
+        return count
+
+    # now, prev: spikes of every layer [batch, size] at t and t - 1. Gives
+    # the duration of the timestep plus packets and sojourn time per port
+    def timestep(self, now, prev, active, iterations=4):
+        traffic = self.traffic
+        flows = traffic.packets(now).astype(np.float64)
+        spike_out = flows @ self.src
+        for pair in traffic.sync_pairs + traffic.ready_pairs:
+            flows[:, pair] += active
+        port_packets = flows @ self.ports
+        switch_packets = flows @ self.switches
+
+        batch_size = flows.shape[0]
+        busy = np.zeros((batch_size, len(self.cores)))
+        for c, splits in self.core_splits.items():
+            integrate = sum(self.integrated(k, now, prev) * d for k, d, _ in splits)
+            sync = sum(d for _, _, d in splits)
+            send = spike_out[:, c] * self.inject_delay
+            busy[:, c] = integrate + np.maximum(sync, send) + self.inject_delay
+
+        # the controller sends the input spikes first and then the syncs
+        sync_sent = (spike_out[:, self.controller, None] +
+                     np.arange(1, len(self.active) + 1)) * self.inject_delay
+
+        # the busiest resource bounds the timestep when the queues saturate
+        bound = np.maximum((port_packets * self.port_delay).max(axis=1),
+                           (switch_packets * self.switch_delay).max(axis=1))
+
+        switch_wait = np.zeros(switch_packets.shape)
+        port_wait = np.zeros(port_packets.shape)
+        for _ in range(iterations):
+            latency = self.zero_load + switch_wait @ self.switches.T + \
+                port_wait @ self.ports.T
+            finish = sync_sent + latency[:, traffic.sync_pairs] + \
+                busy[:, self.active] + latency[:, traffic.ready_pairs]
+            duration = np.maximum(finish.max(axis=1), bound)
+            duration = np.where(active, duration, 0.0)
+            span = np.maximum(duration, 1.0)[:, None]
+            switch_wait = md1_wait(switch_packets / span, self.switch_delay)
+            port_wait = md1_wait(port_packets / span, self.port_delay)
+
+        # averageLat: from entering a router until leaving over an output port
+        switch_time = np.repeat(switch_wait + self.switch_delay, 5, axis=1)
+        sojourn = switch_time + port_wait + self.port_delay
+        return duration, port_packets, sojourn
+
+
+def estimate(snn_path, hw_path, mapping_path, dataset_path, cost: Costs, max_samples=2147483647):
+    hw = HW(hw_path)
+    splits = load_mapping(mapping_path)
+    model = None
+    frames = []
+    timesteps = []
+    for layers, start, correct, predicted, nr_steps, _, _, trains in run_reference(snn_path, dataset_path, max_samples, keep_spikes=True):
+        if model is None:
+            model = LatencyModel(TrafficModel(layers, splits, hw), cost)
+        batch_size, max_steps = trains[0].shape[:2]
+        nr_routers = hw.width * hw.height
+        durations = np.zeros((batch_size, max_steps))
+        packets = np.zeros((batch_size, nr_routers))
+        total_lat = np.zeros((batch_size, nr_routers))
+        prev = [np.zeros((batch_size, l.size), dtype=bool) for l in layers]
+        for ts in range(max_steps):
+            now = [train[:, ts, :] for train in trains]
+            duration, port_packets, sojourn = model.timestep(
+                now, prev, ts < nr_steps)
+            durations[:, ts] = duration
+            packets += port_packets.reshape(batch_size, nr_routers, 5).sum(axis=2)
+            total_lat += (port_packets * sojourn).reshape(batch_size,
+                                                          nr_routers, 5).sum(axis=2)
+            prev = now
+        timesteps.append(durations)
+
+        frame = {
+            "expNr": np.arange(start, start + len(correct)),
+            "latency": durations.sum(axis=1),
+            "timesteps": nr_steps,
+            "maxTimestepLat": durations.max(axis=1)
+        }
+        for r, name in enumerate(hw.router_names()):
+            frame[f"{name}_packets"] = packets[:, r]
+            frame[f"{name}_averageLat"] = total_lat[:, r] / \
+                np.maximum(packets[:, r], 1)
+        frames.append(pandas.DataFrame(frame))
+
+    results = pandas.concat(frames, ignore_index=True)
+    idle = [name for name in hw.router_names()
+            if results[f"{name}_packets"].sum() == 0]
+    results = results.drop(
+        columns=[f"{name}_averageLat" for name in idle] + [f"{name}_packets" for name in hw.router_names()])
+
+    # average duration of every timestep over the samples that reach it
+    max_steps = max(d.shape[1] for d in timesteps)
+    durations = np.concatenate([np.pad(d, ((0, 0), (0, max_steps - d.shape[1])))
+                                for d in timesteps])
+    reached = np.maximum((durations > 0).sum(axis=0), 1)
+    per_timestep = pandas.DataFrame({
+        "ts": np.arange(max_steps),
+        "latency": durations.sum(axis=0) / reached,
+        "maxLatency": durations.max(axis=0)
+    })
+    return results, per_timestep
+
+
+# same averaging over routers as Metrics
+def average_lat(results):
+    cols = [col for col in results.columns if col.endswith("_averageLat")]
+    return sum(results[col].mean() for col in cols) / len(cols)
+
+
+if __name__ == "__main__":
+    expNames = sys.argv[1].split(",")
+    max_samples = int(sys.argv[2]) if len(sys.argv) > 2 else 2147483647
+    models = [
+        ("best", "shd-10"),
+        ("shd1", "shd-10"),
+        ("shd4", "shd-10"),
+        ("smnist3", "smnist-3"),
+        ("smnist4", "smnist-4"),
+        ("psmnist1", "psmnist-1"),
+        ("psmnist2", "psmnist-2"),
+        ("ssc2", "ssc-4"),
+        ("ssc3", "ssc-4")
+    ]
+
+    # latencies in ps, errors of the estimate relative to the simulation
+    print("exp,model,samples,duration,latency,sim_latency,latency_err,latency_mape,averageLat,sim_averageLat,averageLat_err")
+    for expName in expNames:
+        c = Costs(f"res/exp/{expName}/model.json")
+        for modelName, dsFile in models:
+            mapping_path = f"res/exp/{expName}/mappings/{modelName}.json"
+            if not os.path.isfile(mapping_path):
+                continue
+
+            start_time = time.perf_counter()
+            results, per_timestep = estimate(f"res/snn/snn-{modelName}.json", f"res/exp/{expName}/hw.json",
+                                             mapping_path, f"res/dataset/{dsFile}.zip", c, max_samples)
+            duration = time.perf_counter() - start_time
+            out_dir = f"res/exp/{expName}/estimates/{modelName}"
+            if not os.path.isdir(out_dir):
+                os.makedirs(out_dir)
+            results.to_csv(f"{out_dir}/latency.csv", index=False)
+            per_timestep.to_csv(f"{out_dir}/timesteps.csv", index=False)
+
+            parts = []
+            parts.append(expName)
+            parts.append(modelName)
+            parts.append(f"{results.shape[0]}")
+            parts.append(f"{duration:.2f}")
+            parts.append(f"{results['latency'].mean():.0f}")
+            exp_path = f"res/exp/{expName}/results/{modelName}/experiments.csv"
+            if os.path.isfile(exp_path):
+                exp = pandas.read_csv(exp_path, nrows=results.shape[0])
+                est = results["latency"].values[:exp.shape[0]]
+                sim = exp["latency"].values
+                parts.append(f"{sim.mean():.0f}")
+                parts.append(f"{(est.mean() - sim.mean()) / sim.mean() * 100:+.2f}%")
+                parts.append(f"{np.mean(np.abs(est - sim) / sim) * 100:.2f}%")
+            else:
+                parts.extend(["", "", ""])
+            parts.append(f"{average_lat(results):.1f}")
+            if os.path.isfile(exp_path) and any(col.endswith("_averageLat") for col in exp.columns):
+                sim_lat = average_lat(exp)
+                parts.append(f"{sim_lat:.1f}")
+                parts.append(
+                    f"{(average_lat(results) - sim_lat) / sim_lat * 100:+.2f}%")
+            else:
+                parts.extend(["", ""])
+            print(",".join(parts))
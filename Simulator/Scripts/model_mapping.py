@@ -0,0 +1,185 @@
+import json
+import math
+import os
+import sys
+import numpy as np
+from model_costs import *
+from model_packing import INT_MAX, CoreUsage, first_fit
+from model_reference import run_reference
+from model_traffic import HW
+
+
+# average spikes per inference of every neuron and the average amount of
+# timesteps, measured with the reference model
+def firing_rates(snn_path, dataset_path, max_samples=2147483647):
+    rates = None
+    nr_samples = 0
+    nr_steps = 0
+    for layers, _, correct, _, steps, _, _, trains in run_reference(snn_path, dataset_path, max_samples, keep_spikes=True):
+        counts = [t.sum(axis=(0, 1)) for t in trains]
+        rates = counts if rates is None else [
+            r + c for r, c in zip(rates, counts)]
+        nr_samples += len(correct)
+        nr_steps += steps.sum()
+    return layers, [r / nr_samples for r in rates], nr_steps / nr_samples
+
+
+# layer dicts as used by model_packing
+def packing_layers(layers):
+    packing = []
+    for i, layer in enumerate(layers):
+        packing.append({
+            "Name": layer.name,
+            "Type": layer.type,
+            "InputSize": layers[i - 1].size if i > 0 else 0,
+            "Size": layer.size,
+            "Recurrent": layer.type not in ["input", "output"] and layer.recurrent
+        })
+    return packing
+
+
+def hw_cores(hw: HW):
+    return [CoreUsage(name, spec.get("Accepts", []), spec, spec.get("Priority", INT_MAX))
+            for name, spec in hw.specs.items()]
+
+
+# Places the splits FirstFit1 makes on the mesh such that the spike packets
+# travel as few hops as possible. Splits can move to any core they fit on
+# and the contents of two cores can be swapped; the input and output layer
+# stay on the controller.
+class TrafficMapper():
+    def __init__(self, layers, rates, nr_steps, hw: HW):
+        self.layers = packing_layers(layers)
+        self.hw = hw
+        self.nr_steps = nr_steps
+        self.cores = list(hw.cores)
+        self.controller = self.cores.index(hw.controller)
+        coords = np.array([hw.cores[c] for c in self.cores])
+        self.distance = np.abs(coords[:, None, :] - coords[None, :, :]).sum(axis=2)
+
+        self.baseline = first_fit(self.layers, hw_cores(hw))
+        if self.baseline["Unmapped"]:
+            raise ValueError(
+                f"FirstFit1 could not map: {', '.join(self.baseline['Unmapped'])}")
+
+        # every split is a unit: (layer index, start, end)
+        index = {l["Name"]: i for i, l in enumerate(self.layers)}
+        self.units = []
+        self.start = []
+        for entry in self.baseline["Mapped"]:
+            self.units.append(
+                (index[entry["Layer"]], entry["Start"], entry["End"]))
+            self.start.append(self.cores.index(entry["Core"]))
+        self.start = np.array(self.start)
+        self.fixed = np.array([self.layers[k]["Type"] in ["input", "output"]
+                               for k, _, _ in self.units])
+
+        # packets per inference between units: every spike goes to all splits
+        # of the next layer and, when recurrent, to all splits of its own
+        nr_units = len(self.units)
+        self.traffic = np.zeros((nr_units, nr_units))
+        for u, (k, start, end) in enumerate(self.units):
+            spikes = rates[k][start:end].sum()
+            for v, (j, _, _) in enumerate(self.units):
+                if j == k + 1 or (j == k and self.layers[k]["Recurrent"]):
+                    self.traffic[u, v] += spikes
+
+    # weighted hops per inference, including a sync and a ready packet per
+    # timestep for every core in use
+    def cost(self, assign):
+        spikes = (self.traffic * self.distance[assign][:, assign]).sum()
+        used = np.unique(assign[~self.fixed])
+        control = 2 * self.nr_steps * self.distance[self.controller, used].sum()
+        return spikes + control
+
+    # packets per inference, every one switched once more than it hops
+    def packets(self, assign):
+        used = np.unique(assign[~self.fixed])
+        return self.traffic.sum() + 2 * self.nr_steps * len(used)
+
+    # FirstFit1 never puts two splits of a layer on the same core
+    def fits(self, assign, u, core):
+        k, start, end = self.units[u]
+        if any(self.units[v][0] == k for v in np.flatnonzero(assign == core)):
+            return False
+        usage = CoreUsage(self.cores[core], self.hw.specs[self.cores[core]].get(
+            "Accepts", []), self.hw.specs[self.cores[core]])
+        for v in np.flatnonzero(assign == core):
+            j, s, e = self.units[v]
+            usage.add_layer(self.layers[j], s, e)
+        return usage.maximum_cut(self.layers[k], start) >= end - start
+
+    def anneal(self, iterations=50000, seed=0):
+        rng = np.random.default_rng(seed)
+        assign = self.start.copy()
+        cost = self.cost(assign)
+        best, best_cost = assign.copy(), cost
+        movable = np.flatnonzero(~self.fixed)
+        cores = [i for i in range(len(self.cores)) if i != self.controller]
+        temp = 0.05 * cost / max(len(movable), 1)
+        cooling = math.pow(1E-4, 1.0 / iterations)
+
+        for _ in range(iterations):
+            candidate = assign.copy()
+            if rng.random() < 0.5:
+                u = rng.choice(movable)
+                core = rng.choice(cores)
+                if core == assign[u] or not self.fits(assign, u, core):
+                    temp *= cooling
+                    continue
+                candidate[u] = core
+            else:
+                a, b = rng.choice(cores, 2, replace=False)
+                candidate[assign == a] = b
+                candidate[assign == b] = a
+
+            new_cost = self.cost(candidate)
+            if new_cost <= cost or rng.random() < math.exp((cost - new_cost) / temp):
+                assign, cost = candidate, new_cost
+                if cost < best_cost:
+                    best, best_cost = assign.copy(), cost
+            temp *= cooling
+        return best, best_cost
+
+    # mapping JSON with the splits of every layer in the original order
+    def mapping(self, assign):
+        mapping = {"Mapped": [], "Unmapped": []}
+        for entry, core in zip(self.baseline["Mapped"], assign):
+            mapping["Mapped"].append(dict(entry, Core=self.cores[core]))
+        return mapping
+
+
+if __name__ == "__main__":
+    # model_mapping.py <exp> <model> <dsFile> [max_samples] [iterations] [out.json]
+    expName = sys.argv[1]
+    modelName = sys.argv[2]
+    dsFile = sys.argv[3]
+    max_samples = int(sys.argv[4]) if len(sys.argv) > 4 else 1000
+    iterations = int(sys.argv[5]) if len(sys.argv) > 5 else 50000
+    # next to, not over, the FirstFit1 mapping the results are simulated with
+    mapping_path = sys.argv[6] if len(sys.argv) > 6 else \
+        f"res/exp/{expName}/mappings/{modelName}-traffic.json"
+
+    c = Costs(f"res/exp/{expName}/model.json")
+    hw = HW(f"res/exp/{expName}/hw.json")
+    layers, rates, nr_steps = firing_rates(
+        f"res/snn/snn-{modelName}.json", f"res/dataset/{dsFile}.zip", max_samples)
+    mapper = TrafficMapper(layers, rates, nr_steps, hw)
+    baseline_cost = mapper.cost(mapper.start)
+    assign, cost = mapper.anneal(iterations)
+
+    dest_dir = os.path.dirname(mapping_path)
+    if dest_dir and not os.path.isdir(dest_dir):
+        os.makedirs(dest_dir)
+    json.dump(mapper.mapping(assign), open(mapping_path, "w"), indent=2)
+
+    def energy(hops, assign):
+        return hops * c.link_dyn_packet + (hops + mapper.packets(assign)) * c.router_dyn_packet
+
+    print(f"Hops / inference (link and switch energy):")
+    print(f"  FirstFit1: {baseline_cost:,.1f} ({energy(baseline_cost, mapper.start) * 1E9:.3f} nJ)")
+    print(f"  Annealed: {cost:,.1f} ({energy(cost, assign) * 1E9:.3f} nJ)")
+    if baseline_cost > 0:
+        print(f"  Reduction: {(baseline_cost - cost) / baseline_cost * 100:.2f}%")
+    print(f"Cores: {len(set(mapper.start[~mapper.fixed]))} -> {len(set(assign[~mapper.fixed]))}")
+    print(f"Saved to {mapping_path}")
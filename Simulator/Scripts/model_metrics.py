@@ -56,6 +56,7 @@ class Metrics():
 
         self.dynamic_alu = {}
         self.dynamic_alu_total = 0.0
+        self.sample_alu = 0.0
         self.alu_util = 0.0
         self.recv_util = 0.0
         self.snd_util = 0.0
@@ -64,6 +65,7 @@ class Metrics():
                 nr_ops = exp[f"{c}_ops_{op}"].sum()
                 energy_per_op = self.cost.alu_costs[op]["Dynamic"]
                 energy = nr_ops * energy_per_op
+                self.sample_alu += exp[f"{c}_ops_{op}"] * energy_per_op
                 self.dynamic_alu_total += energy
                 if op in self.dynamic_alu:
                     self.dynamic_alu[op] += energy
@@ -89,14 +91,19 @@ class Metrics():
 
         self.total_energy = self.static_energy.sum() + self.dynamic_mem.sum() + \
             self.dynamic_alu_total + self.dynamic_router.sum()
+        # per inference, sums up to total_energy
+        self.sample_energy = self.static_energy + self.dynamic_mem + \
+            self.sample_alu + self.dynamic_router
         self.total_power = self.total_energy.sum() / self.latency.sum()
 
         self.nr_samples = exp.shape[0]
         self.accuracy = (exp["predicted"] == exp["correct"]
                          ).sum() / self.nr_samples
         self.nr_sops = 0
+        self.sample_sops = 0
         for c in self.cores:
             self.nr_sops += exp[f"{c}_sops"].sum()
+            self.sample_sops += exp[f"{c}_sops"]
         self.sop_energy = self.total_energy / self.nr_sops
 
         self.inferences_per_second = self.nr_samples / self.latency.sum()
@@ -110,9 +117,9 @@ class Metrics():
 
     def layers(self, c):
         layers = []
-        if f"{c}_ALIF_syncs" in exp:
+        if f"{c}_ALIF_syncs" in self.exp:
             layers.append("ALIF")
-        if f"{c}_output_syncs" in exp:
+        if f"{c}_output_syncs" in self.exp:
             layers.append("output")
         return layers
 
@@ -135,7 +142,7 @@ class Metrics():
         print(f"Energy:")
         print(f"  Synaptic energy: {self.sop_energy * 1E12:.2f} pJ")
         print(
-            f"  Static: {self.static_energy.sum():.3f} J ({c.core_static * self.nr_active_cores * 1E6:,.3f} uW)")
+            f"  Static: {self.static_energy.sum():.3f} J ({self.cost.core_static * self.nr_active_cores * 1E6:,.3f} uW)")
         print(f"  Dynamic:")
         print(f"    Core Mem: {self.dynamic_mem.sum():.3f} J")
         print(f"      Layer read: {self.dyn_layer_read.sum():.3f} J")
@@ -0,0 +1,158 @@
+import math
+import sys
+import numpy as np
+import pandas
+from model_costs import *
+from model_latency import xy_ports
+from model_reference import run_reference
+from model_traffic import HW, TrafficModel, load_mapping, xy_path
+
+SCHEMES = ["unicast", "multicast", "bitmap"]
+# (sample, timestep) rows handled at once
+CHUNK = 4096
+
+
+# Packets of one scheme as flows: every flow is a packet that a source split
+# sends when it spikes, with the output ports it takes, how wide it is and
+# whether it goes once per spike or once per timestep with any spike.
+#  unicast:   a spike packet per spike and destination split, as simulated
+#  multicast: a spike packet per spike, replicated along the union of the XY
+#             paths to all destinations; the header carries the source, the
+#             routers look the destinations up
+#  bitmap:    a packet per (layer split, timestep, destination split) with a
+#             bit for every neuron of the split after the spike packet header
+# Syncs and ready packets are unicast in every scheme.
+class PacketScheme():
+    def __init__(self, name, traffic: TrafficModel, cost: Costs):
+        self.name = name
+        hw = traffic.hw
+        nr_ports = hw.width * hw.height * 5
+
+        # source groups: every split of every sending layer, last one the
+        # timestep itself for the control packets
+        self.groups = []
+        flows = []
+        for k, layer in enumerate(traffic.layers[:-1]):
+            dests = [core for core, _, _ in traffic.splits[k + 1]]
+            if layer.type not in ["input", "output"] and layer.recurrent:
+                dests += [core for core, _, _ in traffic.splits[k]]
+            for core, start, end in traffic.splits[k]:
+                g = len(self.groups)
+                self.groups.append((k, start, end))
+                if name == "multicast":
+                    flows.append((g, core, dests, cost.spike_packet, False))
+                else:
+                    for dest in dests:
+                        if name == "bitmap":
+                            flows.append((g, core, [dest], cost.spike_packet + end - start, True))
+                        else:
+                            flows.append((g, core, [dest], cost.spike_packet, False))
+        control = len(self.groups)
+        for pair in traffic.sync_pairs + traffic.ready_pairs:
+            src, dst = traffic.pairs[pair]
+            flows.append((control, src, [dst], cost.packet_size, False))
+
+        # the NoC moves packet_size wide flits, wider packets take several
+        self.cores = list(hw.cores)
+        self.group = np.array([g for g, _, _, _, _ in flows])
+        self.any = np.array([a for _, _, _, _, a in flows])
+        self.flits = np.array([math.ceil(bits / cost.packet_size) for _, _, _, bits, _ in flows])
+        self.ports = np.zeros((len(flows), nr_ports))
+        self.src = np.zeros((len(flows), len(self.cores)))
+        self.hops = np.zeros(len(flows))
+        self.switches = np.zeros(len(flows))
+        for i, (_, src, dests, _, _) in enumerate(flows):
+            used = set()
+            for dest in dests:
+                path = xy_path(hw.cores[src], hw.cores[dest])
+                for (x, y), port in zip(path, xy_ports(path)):
+                    used.add(hw.router_index(x, y) * 5 + port)
+            for p in used:
+                self.ports[i, p] = self.flits[i]
+            self.src[i, self.cores.index(src)] = self.flits[i]
+            # a switch for every output port it leaves, as nrPacketSwitches
+            self.switches[i] = len(used)
+            self.hops[i] = sum(1 for p in used if p % 5 != 4)
+        self.bits = self.flits * cost.packet_size
+        self.energy = self.bits * (self.hops * cost.link_dyn_bit + self.switches * cost.router_dyn_bit)
+
+    # packets per flow [rows, flows] from the spikes [rows, size] of every layer
+    def packets(self, spikes):
+        rows = spikes[0].shape[0]
+        counts = np.ones((rows, len(self.groups) + 1))
+        for g, (k, start, end) in enumerate(self.groups):
+            counts[:, g] = spikes[k][:, start:end].sum(axis=1)
+        counts = counts[:, self.group]
+        return np.where(self.any, counts > 0, counts)
+
+    # totals over the rows and the flits every output port and every core
+    # sends per row
+    def replay(self, spikes):
+        packets = self.packets(spikes)
+        return {
+            "packets": packets.sum(),
+            "flits": (packets @ self.flits).sum(),
+            "bits": (packets @ self.bits).sum(),
+            "hops": (packets @ (self.hops * self.flits)).sum(),
+            "router_energy": (packets @ self.energy).sum()
+        }, packets @ self.ports, packets @ self.src
+
+
+def explore(snn_path, hw_path, mapping_path, dataset_path, cost: Costs, max_samples=2147483647):
+    hw = HW(hw_path)
+    splits = load_mapping(mapping_path)
+    schemes = None
+    totals = {name: {} for name in SCHEMES}
+    port_peaks = {name: [] for name in SCHEMES}
+    core_peaks = {name: [] for name in SCHEMES}
+    nr_samples = 0
+    for layers, _, _, _, nr_steps, _, _, trains in run_reference(snn_path, dataset_path, max_samples, keep_spikes=True):
+        if schemes is None:
+            traffic = TrafficModel(layers, splits, hw)
+            schemes = [PacketScheme(name, traffic, cost) for name in SCHEMES]
+        batch_size, max_steps = trains[0].shape[:2]
+        nr_samples += batch_size
+        active = (np.arange(max_steps)[None, :] < nr_steps[:, None]).reshape(-1)
+        flat = [t.reshape(batch_size * max_steps, -1)[active] for t in trains]
+        for start in range(0, flat[0].shape[0], CHUNK):
+            chunk = [f[start:start + CHUNK].astype(np.int64) for f in flat]
+            for scheme in schemes:
+                sums, ports, cores = scheme.replay(chunk)
+                for key, value in sums.items():
+                    totals[scheme.name][key] = totals[scheme.name].get(key, 0.0) + value
+                port_peaks[scheme.name].append(ports.max(axis=1))
+                core_peaks[scheme.name].append(cores.max(axis=1))
+
+    rows = []
+    for name in SCHEMES:
+        ports = np.concatenate(port_peaks[name])
+        cores = np.concatenate(core_peaks[name])
+        row = {"scheme": name}
+        row.update({key: value / nr_samples for key, value in totals[name].items()})
+        row.update({
+            "port_flits_mean": ports.mean(),
+            "port_flits_p99": np.quantile(ports, 0.99),
+            "port_flits_max": ports.max(),
+            "core_flits_p99": np.quantile(cores, 0.99),
+            "core_flits_max": cores.max()
+        })
+        rows.append(row)
+    return pandas.DataFrame(rows).set_index("scheme")
+
+
+if __name__ == "__main__":
+    # model_packets.py <exp> <model> <dsFile> [max_samples]
+    expName = sys.argv[1]
+    modelName = sys.argv[2]
+    dsFile = sys.argv[3]
+    max_samples = int(sys.argv[4]) if len(sys.argv) > 4 else 100
+
+    c = Costs(f"res/exp/{expName}/model.json")
+    df = explore(f"res/snn/snn-{modelName}.json", f"res/exp/{expName}/hw.json",
+                 f"res/exp/{expName}/mappings/{modelName}.json", f"res/dataset/{dsFile}.zip", c, max_samples)
+    print(f"Spike packet {c.spike_packet} bits, flit {c.packet_size} bits")
+    print("Per inference, flits per timestep of the busiest output port and core:")
+    print(df.to_string(float_format=lambda v: f"{v:,.4g}"))
+    print("Relative to unicast:")
+    print((df[["packets", "bits", "router_energy", "port_flits_p99"]] / df.loc["unicast"]).to_string(
+        float_format=lambda v: f"{v:.3f}"))
@@ -0,0 +1,120 @@
+import numpy as np
+
+INT_MAX = 2147483647
+
+
+# Python version of CoreData in Mapping/Mapper.cs, with optional per neuron
+# synapse counts so that sparse layers can be packed as well
+class CoreUsage():
+    def __init__(self, name, accepts, m=None, priority=0):
+        self.name = name
+        self.accepts = accepts
+        self.priority = priority
+        m = m or {}
+        self.max_neurons = m.get("MaxNeurons", INT_MAX)
+        self.max_synapses = m.get("MaxSynapses", INT_MAX)
+        self.max_layers = m.get("MaxLayers", INT_MAX)
+        self.max_fanin = m.get("MaxFanIn", INT_MAX)
+        self.max_splits = m.get("MaxSplits", INT_MAX)
+
+        self.nr_neurons = 0
+        self.nr_synapses = 0
+        self.nr_layers = 0
+        self.nr_fanin = 0
+
+    def maximum_cut(self, layer, start=0):
+        if layer["Type"] not in self.accepts:
+            return 0
+
+        if self.nr_layers == self.max_layers:
+            return 0
+
+        # FanIn includes the reccurrent connections
+        fanin = layer["InputSize"] + (layer["Size"] if layer["Recurrent"] else 0)
+        if self.nr_fanin + fanin > self.max_fanin:
+            return 0
+
+        limited_by_neuron = self.max_neurons - self.nr_neurons
+        free_synapses = self.max_synapses - self.nr_synapses
+        synapses = np.cumsum(layer_synapses(layer)[start:])
+        limited_by_synapse = int(np.searchsorted(
+            synapses, free_synapses, side="right"))
+        return min(limited_by_neuron, limited_by_synapse, layer["Size"] - start)
+
+    def fits_layer(self, layer):
+        return self.maximum_cut(layer) == layer["Size"]
+
+    def add_layer(self, layer, start, end):
+        self.nr_neurons += end - start
+        self.nr_synapses += int(layer_synapses(layer)[start:end].sum())
+        self.nr_fanin += layer["InputSize"]
+        self.nr_layers += 1
+
+
+# incoming synapses of every neuron, dense unless the layer says otherwise
+def layer_synapses(layer):
+    if "Synapses" in layer:
+        return np.asarray(layer["Synapses"], dtype=np.int64)
+    per_neuron = layer["InputSize"] + \
+        (layer["Size"] if layer["Recurrent"] else 0)
+    return np.full(layer["Size"], per_neuron, dtype=np.int64)
+
+
+def mapped_layer(layer, core, partial, index, start, end):
+    return {
+        "Layer": layer["Name"],
+        "Core": core.name,
+        "Partial": partial,
+        "Index": index,
+        "Start": start,
+        "End": end
+    }
+
+
+# FirstFitMapper1: layers in order, whole fit on the first core that has room
+# for it, else split over cores in priority order
+def first_fit(layers, cores):
+    cores = sorted(cores, key=lambda c: -c.priority)
+    mapping = {"Mapped": [], "Unmapped": []}
+    for layer in layers:
+        core = next((c for c in cores if c.fits_layer(layer)), None)
+        if core:
+            core.add_layer(layer, 0, layer["Size"])
+            mapping["Mapped"].append(mapped_layer(
+                layer, core, False, 0, 0, layer["Size"]))
+            continue
+
+        if not layer.get("Splittable", True):
+            mapping["Unmapped"].append(layer["Name"])
+            continue
+
+        splits = []
+        mapped = 0
+        for c in cores:
+            to_map = c.maximum_cut(layer, mapped)
+            if to_map == 0:
+                continue
+            splits.append((c, mapped, mapped + to_map))
+            mapped += to_map
+            if mapped == layer["Size"]:
+                break
+        if mapped != layer["Size"] or len(splits) >= min(c.max_splits for c, _, _ in splits):
+            mapping["Unmapped"].append(layer["Name"])
+            continue
+
+        for i, (c, start, end) in enumerate(splits):
+            mapping["Mapped"].append(mapped_layer(
+                layer, c, True, i + 1, start, end))
+            c.add_layer(layer, start, end)
+    return mapping
+
+
+# amount of cores FirstFit needs for the hidden layers on an unbounded mesh
+def estimate_cores(layers, m):
+    hidden = [l for l in layers if l["Type"] not in ["input", "output"]]
+    upper_bound = sum(l["Size"] for l in hidden)
+    cores = [CoreUsage(f"core{i}", ["ALIF", "ALIFQ"], m, priority=-i)
+             for i in range(upper_bound)]
+    mapping = first_fit(hidden, cores)
+    used = set(entry["Core"] for entry in mapping["Mapped"])
+    return len(used), mapping
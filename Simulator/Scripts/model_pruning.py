@@ -0,0 +1,101 @@
+import glob
+import json
+import os
+import sys
+import numpy as np
+import pandas
+from model_costs import *
+from model_packing import estimate_cores
+
+
+def read_rates(path):
+    return pandas.read_csv(path, index_col=0).values.flatten()
+
+
+def read_coo(path, shape):
+    coo = pandas.read_csv(path)
+    src_nnz = np.bincount(coo["src"], minlength=shape[0])
+    dst_nnz = np.bincount(coo["dst"], minlength=shape[1])
+    return src_nnz, dst_nnz
+
+
+# Compares a pruned network exported by SNNs/src/pruning.py when its synapses
+# are stored densely (as the simulator does now) and when only the non-zero
+# synapses are stored
+class PruningReport():
+    def __init__(self, cost: Costs, export_dir):
+        self.info = json.load(open(f"{export_dir}/pruning.json"))
+        self.sparsity = self.info["Sparsity"]
+        self.accuracy = self.info["Accuracy"]
+
+        dense_layers = []
+        sparse_layers = []
+        self.dense_synapses = 0
+        self.synapses = 0
+        self.dense_syn_reads = 0.0
+        self.syn_reads = 0.0
+        for layer in self.info["Layers"]:
+            name, size, input_size = layer["Name"], layer["Size"], layer["InputSize"]
+            recurrent = layer["Type"] == "ALIF"
+            in_rates = read_rates(f"{export_dir}/rates_{layer['Input']}.csv")
+            in_src, in_dst = read_coo(
+                f"{export_dir}/weights_{layer['Input']}_2_{name}.coo.csv", (input_size, size))
+            synapses = in_dst
+            reads = in_rates @ in_src
+            dense_reads = in_rates.sum() * size
+            if recurrent:
+                rates = read_rates(f"{export_dir}/rates_{name}.csv")
+                rec_src, rec_dst = read_coo(
+                    f"{export_dir}/weights_{name}_2_{name}.coo.csv", (size, size))
+                synapses = synapses + rec_dst
+                reads += rates @ rec_src
+                dense_reads += rates.sum() * size
+
+            dense = {"Name": name, "Type": layer["Type"],
+                     "InputSize": input_size, "Size": size, "Recurrent": recurrent}
+            dense_layers.append(dense)
+            sparse_layers.append(dict(dense, Synapses=synapses))
+
+            # the output layer lives on the controller
+            if layer["Type"] == "output":
+                continue
+            self.dense_synapses += size * \
+                (input_size + (size if recurrent else 0))
+            self.synapses += int(synapses.sum())
+            self.dense_syn_reads += dense_reads
+            self.syn_reads += reads
+
+        self.dense_cores, _ = estimate_cores(dense_layers, cost.m)
+        self.cores, _ = estimate_cores(sparse_layers, cost.m)
+        self.dense_syn_energy = self.dense_syn_reads * cost.syn_mem_read
+        self.syn_energy = self.syn_reads * cost.syn_mem_read
+
+
+if __name__ == "__main__":
+    expName = sys.argv[1]
+    export_root = sys.argv[2]
+
+    c = Costs(f"res/exp/{expName}/model.json")
+    reports = [PruningReport(c, d) for d in glob.glob(
+        f"{export_root}/sparsity-*") if os.path.isfile(f"{d}/pruning.json")]
+    reports.sort(key=lambda r: r.sparsity)
+
+    # energies are synapse memory reads in nJ per inference
+    print("sparsity,accuracy,dense_synapses,synapses,dense_cores,cores,dense_syn_energy,syn_energy,saved_synapses,saved_cores,saved_energy")
+    for r in reports:
+        parts = []
+        parts.append(f"{r.sparsity:.2f}")
+        parts.append(f"{r.accuracy:.3f}")
+        parts.append(f"{r.dense_synapses}")
+        parts.append(f"{r.synapses}")
+        parts.append(f"{r.dense_cores}")
+        parts.append(f"{r.cores}")
+        parts.append(f"{r.dense_syn_energy*1E9:.2f}")
+        parts.append(f"{r.syn_energy*1E9:.2f}")
+        parts.append(f"{r.dense_synapses - r.synapses}")
+        parts.append(f"{r.dense_cores - r.cores}")
+        parts.append(f"{(r.dense_syn_energy - r.syn_energy)*1E9:.2f}")
+        print(",".join(parts))
+
+    if reports and c.nr_cores < max(r.cores for r in reports):
+        print(f"Warning: {expName} only has {c.nr_cores} cores")
@@ -0,0 +1,244 @@
+import copy
+import glob
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas
+from model_costs import *
+from model_generate_hw import save_hw, snn_networks
+
+# Metrics attribute: (core counter, Costs attribute)
+CORE_TERMS = {
+    "dyn_layer_read": ("layerReads", "layer_mem_read"),
+    "dyn_layer_write": ("layerWrites", "layer_mem_write"),
+    "dyn_neuron_read": ("neuronReads", "neuron_mem_read"),
+    "dyn_neuron_write": ("neuronWrites", "neuron_mem_write"),
+    "dyn_syn_read": ("synapseReads", "syn_mem_read"),
+    "dyn_syn_write": ("synapseWrites", "syn_mem_write"),
+    "dyn_compute_pop": ("computePops", "compute_buf_pops"),
+    "dyn_compute_push": ("computePushes", "compute_buf_pushes"),
+    "dyn_output_pop": ("outputPops", "output_buf_pops"),
+    "dyn_output_push": ("outputPushes", "output_buf_pushes")
+}
+ROUTER_TERMS = {
+    "dyn_router_hops": ("nrHops", "link_dyn_packet"),
+    "dyn_router_switches": ("nrPacketSwitches", "router_dyn_packet")
+}
+MEM_TERMS = ["dyn_layer_read", "dyn_layer_write", "dyn_neuron_read",
+             "dyn_neuron_write", "dyn_syn_read", "dyn_syn_write"]
+
+
+def flatten(d, prefix=()):
+    items = {}
+    for k, v in d.items():
+        if isinstance(v, dict) and v:
+            items.update(flatten(v, prefix + (k,)))
+        else:
+            items[prefix + (k,)] = v
+    return items
+
+
+def with_value(m, path, value):
+    m = copy.deepcopy(m)
+    node = m
+    for k in path[:-1]:
+        node = node.setdefault(k, {})
+    if value is None:
+        node.pop(path[-1], None)
+    else:
+        node[path[-1]] = value
+    return m
+
+
+# the hw.json save_hw makes from a model, which is all the simulator sees of it
+def render_hw(m, networks=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, "model.json")
+        hw_path = os.path.join(tmp, "hw.json")
+        json.dump(m, open(model_path, "w"))
+        if m.get("CoreOrdering") == "Auto" and networks is None:
+            networks = snn_networks()
+        save_hw(model_path, hw_path, Costs(model_path), networks)
+        return json.load(open(hw_path))
+
+
+# Every changed field between two models as (field, old, new, kind). A field
+# is "cost" when changing only that field leaves hw.json the same, so the
+# existing results stay valid and only have to be re-costed.
+def classify(old, new, networks=None):
+    old_flat, new_flat = flatten(old), flatten(new)
+    base_hw = None
+    changes = []
+    for path in sorted(set(old_flat) | set(new_flat)):
+        before, after = old_flat.get(path), new_flat.get(path)
+        if before == after:
+            continue
+        if path[0] == "Technology":
+            kind = "cost"
+        else:
+            if base_hw is None:
+                base_hw = render_hw(old, networks)
+            try:
+                same = render_hw(with_value(old, path, after), networks) == base_hw
+            except (KeyError, ValueError, TypeError, ZeroDivisionError):
+                same = False
+            kind = "cost" if same else "behaviour"
+        changes.append((".".join(path), before, after, kind))
+    return changes
+
+
+# fields of hw.json that differ from what model.json gives now
+def stale_hw(expName, networks=None):
+    hw_path = f"res/exp/{expName}/hw.json"
+    if not os.path.isfile(hw_path):
+        return None
+    current = flatten(render_hw(json.load(open(f"res/exp/{expName}/model.json")), networks))
+    simulated = flatten(json.load(open(hw_path)))
+    return [".".join(p) for p in sorted(set(current) | set(simulated))
+            if current.get(p) != simulated.get(p)]
+
+
+# Sums over all samples of every counter the energy model multiplies with a
+# cost, plus what the other Metrics outputs need. Only these columns are read.
+def run_counters(path):
+    header = pandas.read_csv(path, nrows=0).columns
+    cores = [m.group(1) for m in (re.fullmatch(r"(core\d+)_neuronReads", col)
+                                  for col in header) if m]
+    routers = [m.group(1) for m in (re.fullmatch(r"(router\(\d+_\d+\))_nrHops", col)
+                                    for col in header) if m]
+    ops = sorted(set(col.split("_ops_", 1)[1] for col in header
+                     if "_ops_" in col and col.split("_ops_", 1)[0] in cores))
+    columns = {"latency", "predicted", "correct"}
+    columns.update(f"{c}_{counter}" for c in cores for counter, _ in CORE_TERMS.values())
+    columns.update(f"{c}_sops" for c in cores)
+    columns.update(f"{c}_ops_{op}" for c in cores for op in ops if f"{c}_ops_{op}" in header)
+    columns.update(f"{r}_{counter}" for r in routers for counter, _ in ROUTER_TERMS.values())
+    exp = pandas.read_csv(path, usecols=sorted(columns))
+    sums = exp.drop(columns=["predicted", "correct"]).to_numpy(dtype=np.float64).sum(axis=0)
+    sums = dict(zip([c for c in exp.columns if c not in ("predicted", "correct")], sums))
+
+    seconds = sums["latency"] * 1E-12
+    counters = {
+        "seconds": seconds,
+        "samples": exp.shape[0],
+        "correct": int((exp["predicted"] == exp["correct"]).sum()),
+        "sops": sum(sums[f"{c}_sops"] for c in cores),
+        "static_energy": seconds * len(cores)
+    }
+    for term, (counter, _) in CORE_TERMS.items():
+        counters[term] = sum(sums[f"{c}_{counter}"] for c in cores)
+    for term, (counter, _) in ROUTER_TERMS.items():
+        counters[term] = sum(sums[f"{r}_{counter}"] for r in routers)
+    for op in ops:
+        counters[f"dyn_alu_{op}"] = sum(sums.get(f"{c}_ops_{op}", 0.0) for c in cores)
+    return counters
+
+
+# counters of every experiments.csv under res/exp, indexed by (exp, model)
+def load_runs(expNames=None, root="res/exp"):
+    rows = {}
+    for path in sorted(glob.glob(f"{root}/*/results/*/experiments.csv")):
+        parts = os.path.normpath(path).split(os.sep)
+        if expNames is not None and parts[-4] not in expNames:
+            continue
+        try:
+            rows[(parts[-4], parts[-2])] = run_counters(path)
+        except pandas.errors.EmptyDataError:
+            continue
+    runs = pandas.DataFrame.from_dict(rows, orient="index").fillna(0.0)
+    runs.index.names = ["exp", "model"]
+    return runs
+
+
+def coefficients(cost: Costs, terms):
+    coefs = {"static_energy": cost.core_static, "chip_area": cost.chip_area}
+    for term, (_, attr) in {**CORE_TERMS, **ROUTER_TERMS}.items():
+        coefs[term] = getattr(cost, attr)
+    for term in terms:
+        if term.startswith("dyn_alu_"):
+            coefs[term] = cost.alu_costs[term[len("dyn_alu_"):]]["Dynamic"]
+    return coefs
+
+
+# All Metrics outputs of every run under every Costs of its experiment:
+# costs maps (exp, variant) to a Costs. The energies of all runs and variants
+# are one element-wise product of the counter and coefficient matrices.
+def recost(runs, costs):
+    terms = ["static_energy"] + list(CORE_TERMS) + list(ROUTER_TERMS) + \
+        sorted(c for c in runs.columns if c.startswith("dyn_alu_"))
+    coefs = pandas.DataFrame.from_dict(
+        {key: coefficients(cost, terms) for key, cost in costs.items()}, orient="index")
+    coefs.index.names = ["exp", "variant"]
+
+    table = runs.reset_index().merge(coefs.reset_index(), on="exp", suffixes=("", "_coef"))
+    counters = table[terms].to_numpy(dtype=np.float64)
+    factors = table[[f"{t}_coef" for t in terms]].to_numpy(dtype=np.float64)
+    energies = pandas.DataFrame(counters * factors, columns=terms)
+
+    alu = [t for t in terms if t.startswith("dyn_alu_")]
+    out = pandas.concat([table[["exp", "model", "variant"]], energies], axis=1)
+    out["dynamic_mem"] = energies[MEM_TERMS].sum(axis=1)
+    out["dynamic_alu_total"] = energies[alu].sum(axis=1)
+    out["dynamic_router"] = energies[list(ROUTER_TERMS)].sum(axis=1)
+    out["total_energy"] = out["static_energy"] + out["dynamic_mem"] + \
+        out["dynamic_alu_total"] + out["dynamic_router"]
+    out["total_power"] = out["total_energy"] / table["seconds"]
+    out["accuracy"] = table["correct"] / table["samples"]
+    out["nr_sops"] = table["sops"]
+    out["sop_energy"] = out["total_energy"] / table["sops"]
+    out["inferences_per_second"] = table["samples"] / table["seconds"]
+    out["sops_per_second"] = table["sops"] / table["seconds"]
+    out["delay_per_inference"] = 1.0 / out["inferences_per_second"]
+    out["chip_area"] = table["chip_area"]
+    out["throughput_eff"] = out["sops_per_second"] / (table["chip_area"] / 1_000_000.0)
+    out["eat"] = out["throughput_eff"] / out["sop_energy"]
+    return out.set_index(["exp", "model", "variant"]).sort_index()
+
+
+if __name__ == "__main__":
+    # model_recost.py classify <old model.json> <new model.json>
+    if sys.argv[1] == "classify":
+        changes = classify(json.load(open(sys.argv[2])), json.load(open(sys.argv[3])))
+        for field, before, after, kind in changes:
+            print(f"{kind:>9}  {field}: {before} -> {after}")
+        if any(kind == "behaviour" for *_, kind in changes):
+            print("Behaviour changed: results have to be simulated again")
+        else:
+            print("Cost-only changes: results can be re-costed")
+        sys.exit(0)
+
+    # model_recost.py <exps|all> [variants.json] [out.csv], variants.json maps
+    # a variant name to the Technology entries it overrides
+    start = time.perf_counter()
+    expNames = None if sys.argv[1] == "all" else sys.argv[1].split(",")
+    variants = {"model": {}}
+    if len(sys.argv) > 2:
+        variants.update(json.load(open(sys.argv[2])))
+    dest = sys.argv[3] if len(sys.argv) > 3 else "res/exp/recost.csv"
+
+    runs = load_runs(expNames)
+    valid = []
+    for expName in runs.index.get_level_values("exp").unique():
+        changed = stale_hw(expName)
+        if changed:
+            print(f"{expName}: skipped, behaviour changed since simulation ({', '.join(changed[:5])})")
+            continue
+        if changed is None:
+            print(f"{expName}: no hw.json, assuming the results match model.json")
+        valid.append(expName)
+    runs = runs[runs.index.get_level_values("exp").isin(valid)]
+
+    costs = {(expName, name): Costs(f"res/exp/{expName}/model.json", technology)
+             for expName in valid for name, technology in variants.items()}
+    table = recost(runs, costs)
+    table.to_csv(dest)
+
+    summary = table.groupby("variant")[["total_energy", "sop_energy", "chip_area", "eat"]].mean()
+    summary["sop_energy"] *= 1E12
+    print(summary.rename(columns={"sop_energy": "sop_energy_pj"}).to_string())
+    print(f"Re-costed {len(runs)} runs x {len(variants)} variants in "
+          f"{time.perf_counter() - start:.2f} s -> {dest}")
@@ -0,0 +1,342 @@
+import json
+import sys
+import time
+import zipfile
+import numpy as np
+import pandas
+
+
+# C# float.Parse of a CSV written by pandas: header row and index column skipped,
+# stored as [src, dst] like WeigthsUtil.Read2DFloat
+def read_2d(path):
+    values = pandas.read_csv(path, index_col=0).values.astype(np.float32)
+    return np.ascontiguousarray(values.T)
+
+
+def read_1d(path):
+    return read_2d(path)[0]
+
+
+# WeigthsUtil.Exp: (float)Math.Exp(-1.0f / value)
+def decay(tau):
+    return np.exp((np.float32(-1.0) / tau).astype(np.float64)).astype(np.float32)
+
+
+# C# integer division truncates towards zero, numpy floors
+def cdiv(a, b):
+    q = np.abs(a) // b
+    return np.where(a < 0, -q, q)
+
+
+# exact integer matrix product through float64 BLAS, see ALIFQ
+def int_matmul(spikes, weights):
+    return np.rint(spikes.astype(np.float64) @ weights).astype(np.int64)
+
+
+class InputRef():
+    def __init__(self, layer):
+        self.name = layer["Name"]
+        self.size = layer["Size"]
+        self.type = "input"
+
+
+class ALIF():
+    def __init__(self, base, layer):
+        self.name = layer["Name"]
+        self.type = "ALIF"
+        self.vth = np.float32(layer["Vth"])
+        self.beta = np.float32(layer["Beta"])
+        self.alpha = decay(read_1d(base + layer["TauM"]))
+        self.rho = decay(read_1d(base + layer["TauAdp"]))
+        alpha_comp = np.float32(1) - self.alpha
+        self.in_weights = read_2d(base + layer["InWeights"]) * alpha_comp
+        self.rec_weights = read_2d(base + layer["RecWeights"]) * alpha_comp
+        self.bias = read_1d(base + layer["Bias"])
+        self.input_size, self.size = self.in_weights.shape
+        self.recurrent = True
+
+    def reset(self, batch_size):
+        self.pots = np.zeros((batch_size, self.size), dtype=np.float32)
+        self.adapt = np.full((batch_size, self.size),
+                             self.vth, dtype=np.float32)
+        self.spiked = np.zeros((batch_size, self.size), dtype=bool)
+
+    # all spikes of the previous timestep reach the core before its sync,
+    # summation order can differ from the simulator in the last float bits
+    def integrate(self, forward):
+        self.pots += forward.astype(np.float32) @ self.in_weights
+        self.pots += self.spiked.astype(np.float32) @ self.rec_weights
+
+    # ALIFLayer.Sync for every neuron at once
+    def sync(self):
+        pot = self.pots
+        self.adapt = self.adapt * self.rho
+        self.adapt = np.where(self.spiked, self.adapt +
+                              (np.float32(1) - self.rho), self.adapt)
+        reset_pot = self.beta * self.adapt + self.vth
+        pot = np.where(self.spiked, pot - reset_pot, pot)
+        self.spiked = pot >= reset_pot - self.bias
+        self.pots = pot * self.alpha
+        return self.spiked
+
+
+class ALIFQ():
+    def __init__(self, base, layer):
+        self.name = layer["Name"]
+        self.type = "ALIFQ"
+        scale = np.float32(layer["Scale"])
+        self.scale = int(scale)
+
+        def quantize(v):
+            return np.trunc(v * scale).astype(np.int64)
+
+        alpha = decay(read_1d(base + layer["TauM"]))
+        rho = decay(read_1d(base + layer["TauAdp"]))
+        alpha_comp = np.float32(1) - alpha
+        self.in_weights = quantize(
+            read_2d(base + layer["InWeights"]) * alpha_comp)
+        self.rec_weights = quantize(
+            read_2d(base + layer["RecWeights"]) * alpha_comp)
+        self.bias = quantize(read_1d(base + layer["Bias"]))
+        self.alpha = quantize(alpha)
+        self.rho = quantize(rho)
+        self.vth = int(np.trunc(np.float32(layer["Vth"]) * scale))
+        self.beta = int(np.trunc(np.float32(layer["Beta"]) * scale))
+        self.input_size, self.size = self.in_weights.shape
+        self.recurrent = True
+
+        # float64 sums of integers are exact below 2^53
+        bound = np.abs(self.in_weights).sum(axis=0).max() + \
+            np.abs(self.rec_weights).sum(axis=0).max()
+        if bound >= 2**53:
+            raise ValueError(f"Weights of {self.name} too large for exact sums")
+
+    def reset(self, batch_size):
+        self.pots = np.zeros((batch_size, self.size), dtype=np.int64)
+        self.adapt = np.full((batch_size, self.size), self.vth, dtype=np.int64)
+        self.spiked = np.zeros((batch_size, self.size), dtype=bool)
+
+    def integrate(self, forward):
+        self.pots += int_matmul(forward, self.in_weights)
+        self.pots += int_matmul(self.spiked, self.rec_weights)
+
+    # ALIFQLayer.Sync for every neuron at once
+    def sync(self):
+        pot = self.pots
+        self.adapt = self.adapt * self.rho
+        self.adapt = np.where(self.spiked, self.adapt + 1 - self.rho, self.adapt)
+        self.adapt = cdiv(self.adapt, self.scale)
+        reset_pot = cdiv(self.beta * self.adapt + self.vth, self.scale)
+        pot = np.where(self.spiked, pot - reset_pot, pot)
+        self.spiked = pot >= reset_pot - self.bias
+        self.pots = cdiv(pot * self.alpha, self.scale)
+        return self.spiked
+
+
+class Output():
+    def __init__(self, base, layer):
+        self.name = layer["Name"]
+        self.type = "output"
+        self.alpha = decay(read_1d(base + layer["TauM"]))
+        alpha_comp = np.float32(1) - self.alpha
+        self.weights = read_2d(base + layer["InWeights"]) * alpha_comp
+        self.input_size, self.size = self.weights.shape
+        self.recurrent = False
+
+    def reset(self, batch_size):
+        self.pots = np.zeros((batch_size, self.size), dtype=np.float64)
+        self.output = np.zeros((batch_size, self.size), dtype=np.float64)
+
+    def integrate(self, forward):
+        self.inputs = forward.astype(np.float32) @ self.weights
+
+    # OutputLayer.Sync and the softmax of FinishSync, active masks out samples
+    # whose trace already ended
+    def sync(self, active):
+        pots = self.alpha.astype(np.float64) * self.pots + self.inputs
+        self.pots = np.where(active[:, None], pots, self.pots)
+        exp = np.exp(self.pots).astype(np.float32).astype(np.float64)
+        total = exp[:, 0].copy()
+        for i in range(1, self.size):
+            total += exp[:, i]
+        softmax = exp / total[:, None]
+        self.output += np.where(active[:, None], softmax, 0.0)
+
+
+def load_snn(path):
+    snn = json.load(open(path))
+    base = snn["BasePath"]
+    layers = []
+    for layer in snn["Layers"]:
+        type = layer["Type"]
+        if type == "input":
+            layers.append(InputRef(layer))
+        elif type == "ALIF":
+            layers.append(ALIF(base, layer))
+        elif type == "ALIFQ":
+            layers.append(ALIFQ(base, layer))
+        elif type == "output":
+            layers.append(Output(base, layer))
+        else:
+            raise ValueError(f"Unknown layer type: {type}")
+    return layers
+
+
+# Name, type and size of a layer without its weights: hidden and output
+# layers have a TauM value for every neuron
+class LayerShape():
+    def __init__(self, name, type, size):
+        self.name = name
+        self.type = type
+        self.size = size
+        self.recurrent = type not in ["input", "output"]
+
+
+def load_shapes(path):
+    snn = json.load(open(path))
+    base = snn["BasePath"]
+    shapes = []
+    for layer in snn["Layers"]:
+        if layer["Type"] == "input":
+            size = layer["Size"]
+        else:
+            with open(base + layer["TauM"]) as f:
+                size = sum(1 for line in f if line.strip()) - 1
+        shapes.append(LayerShape(layer["Name"], layer["Type"], size))
+    return shapes
+
+
+# ZipDataset/InputTraceFile: first line is the label, every other line a
+# timestep, padded with empty timesteps up to the Timesteps of info.json
+# unless it has EarlyExit set
+class TraceDataset():
+    def __init__(self, path):
+        self.archive = zipfile.ZipFile(path, mode="r")
+        info = json.loads(self.archive.read("info.json"))
+        self.input_size = info["InputSize"]
+        self.nr_samples = info["NrSamples"]
+        self.timesteps = 0 if info.get("EarlyExit", False) else info["Timesteps"]
+
+    def read(self, i):
+        lines = self.archive.read(
+            f"input_{i}.trace").decode("utf-8").splitlines()
+        correct = int(lines[0])
+        spikes = [[int(v) for v in line.split(",")[1:] if v != ""]
+                  for line in lines[1:]]
+        return correct, spikes
+
+    def batch(self, start, end):
+        samples = [self.read(i) for i in range(start, end)]
+        nr_steps = np.array([max(len(s), self.timesteps)
+                            for _, s in samples])
+        inputs = np.zeros((len(samples), nr_steps.max(),
+                          self.input_size), dtype=bool)
+        for b, (_, spikes) in enumerate(samples):
+            for ts, neurons in enumerate(spikes):
+                inputs[b, ts, neurons] = True
+        correct = np.array([c for c, _ in samples])
+        return inputs, nr_steps, correct
+
+
+# Executes a batch with the timestep ordering of the simulator: the controller
+# sends the spikes of trace line t and syncs the output layer with the spikes
+# of t - 1, after which every core integrates all spikes sent to it and syncs
+# its layers. A trace of N lines gives N syncs of which the last one gets no
+# input, so the last trace line is never sent.
+def run_batch(layers, inputs, nr_steps, keep_spikes=False):
+    batch_size, max_steps, _ = inputs.shape
+    hidden = layers[1:-1]
+    output = layers[-1]
+    for layer in layers[1:]:
+        layer.reset(batch_size)
+
+    prev = [np.zeros((batch_size, layer.size), dtype=bool)
+            for layer in layers]
+    spike_counts = [np.zeros(batch_size, dtype=np.int64) for _ in layers]
+    integrated = [np.zeros(batch_size, dtype=np.int64) for _ in layers]
+    trains = [np.zeros((batch_size, max_steps, layer.size), dtype=bool)
+              for layer in layers] if keep_spikes else None
+
+    for ts in range(max_steps):
+        active = ts < nr_steps
+        sent = ts < nr_steps - 1
+        prev[0] = inputs[:, ts, :] & sent[:, None]
+        if keep_spikes:
+            trains[0][:, ts, :] = prev[0]
+
+        # controller
+        output.integrate(prev[-2])
+        output.sync(active)
+
+        # cores
+        for i, layer in enumerate(hidden, start=1):
+            integrated[i] += prev[i - 1].sum(axis=1) * active
+            integrated[i] += layer.spiked.sum(axis=1) * active
+            layer.integrate(prev[i - 1])
+        for i, layer in enumerate(hidden, start=1):
+            spikes = layer.sync() & active[:, None]
+            layer.spiked = spikes
+            spike_counts[i] += spikes.sum(axis=1)
+            if keep_spikes:
+                trains[i][:, ts, :] = spikes
+            prev[i] = spikes
+        spike_counts[0] += prev[0].sum(axis=1)
+
+    predicted = np.argmax(output.output, axis=1)
+    sops = [integrated[i] * layer.size if layer in hidden else np.zeros(batch_size, dtype=np.int64)
+            for i, layer in enumerate(layers)]
+    return predicted, spike_counts, sops, trains
+
+
+def run_reference(snn_path, dataset_path, max_samples=2147483647, batch_size=256, keep_spikes=False):
+    layers = load_snn(snn_path)
+    dataset = TraceDataset(dataset_path)
+    nr_samples = min(max_samples, dataset.nr_samples)
+    for start in range(0, nr_samples, batch_size):
+        end = min(start + batch_size, nr_samples)
+        inputs, nr_steps, correct = dataset.batch(start, end)
+        predicted, spike_counts, sops, trains = run_batch(
+            layers, inputs, nr_steps, keep_spikes)
+        yield layers, start, correct, predicted, nr_steps, spike_counts, sops, trains
+
+
+if __name__ == "__main__":
+    snn_path = sys.argv[1]
+    dataset_path = sys.argv[2]
+    max_samples = int(sys.argv[3]) if len(sys.argv) > 3 else 2147483647
+    output_path = sys.argv[4] if len(sys.argv) > 4 else None
+
+    start_time = time.perf_counter()
+    frames = []
+    for layers, start, correct, predicted, nr_steps, spike_counts, sops, _ in run_reference(snn_path, dataset_path, max_samples):
+        frame = {
+            "expNr": np.arange(start, start + len(correct)),
+            "correct": correct,
+            "predicted": predicted,
+            "timesteps": nr_steps
+        }
+        for layer, spikes, layer_sops in zip(layers, spike_counts, sops):
+            frame[f"{layer.name}_spikes"] = spikes
+            if layer.type not in ["input", "output"]:
+                frame[f"{layer.name}_sops"] = layer_sops
+        frames.append(pandas.DataFrame(frame))
+    results = pandas.concat(frames, ignore_index=True)
+    duration = time.perf_counter() - start_time
+
+    nr_samples = results.shape[0]
+    accuracy = (results["predicted"] == results["correct"]).sum() / nr_samples
+    print(f"Samples: {nr_samples} ({duration:.2f} s)")
+    print(f"Accuracy: {accuracy:.4f} ({accuracy*100:.2f}%)")
+    print(f"Spikes per inference:")
+    for layer in layers:
+        if layer.type == "output":
+            continue
+        spikes = results[f"{layer.name}_spikes"]
+        sparsity = spikes.sum() / (layer.size * results["timesteps"].sum())
+        print(f"  {layer.name}: {spikes.mean():,.2f} (sparsity: {sparsity:.4f})")
+    sop_cols = [col for col in results.columns if col.endswith("_sops")]
+    nr_sops = results[sop_cols].values.sum()
+    print(f"Total SOPs: {nr_sops:,} ({nr_sops / nr_samples:,.0f} per inference)")
+
+    if output_path:
+        results.to_csv(output_path, index=False)
@@ -0,0 +1,217 @@
+import glob
+import os
+import sys
+import numpy as np
+import pandas
+
+
+# Spikes of one layer as the neuron indices per timestep (CSR layout)
+class SparseSpikes():
+    def __init__(self, size, timesteps, indptr, indices):
+        self.size = size
+        self.timesteps = np.asarray(timesteps, dtype=np.int32)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+
+    @staticmethod
+    def from_dense(dense, timesteps=None):
+        dense = np.asarray(dense) > 0.5
+        ts, neurons = np.nonzero(dense)
+        indptr = np.concatenate(([0], np.cumsum(dense.sum(axis=1))))
+        if timesteps is None:
+            timesteps = np.arange(dense.shape[0])
+        return SparseSpikes(dense.shape[1], timesteps, indptr, neurons)
+
+    @staticmethod
+    def load(path):
+        f = np.load(path)
+        return SparseSpikes(int(f["size"]), f["timesteps"], f["indptr"], f["indices"])
+
+    def save(self, path):
+        np.savez_compressed(path, size=self.size, timesteps=self.timesteps,
+                            indptr=self.indptr, indices=self.indices)
+
+    def __len__(self):
+        return len(self.timesteps)
+
+    def at(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def counts(self):
+        return np.diff(self.indptr)
+
+    def rates(self):
+        return np.bincount(self.indices, minlength=self.size) / max(len(self), 1)
+
+    def dense(self):
+        dense = np.zeros((len(self), self.size), dtype=bool)
+        rows = np.repeat(np.arange(len(self)), self.counts())
+        dense[rows, self.indices] = True
+        return dense
+
+
+# (timesteps, dense bool block) chunks of a TensorReporter spike_<layer>.csv:
+# a header ",0,1,..", then "ts,1.0,0.0,.." per timestep
+def iter_tensor(path, chunksize=256):
+    for chunk in pandas.read_csv(path, index_col=0, dtype=np.float32, chunksize=chunksize):
+        yield chunk.index.to_numpy(dtype=np.int32), chunk.to_numpy() > 0.5
+
+
+def read_tensor(path, chunksize=256):
+    timesteps, counts, indices = [], [], []
+    size = 0
+    for ts, block in iter_tensor(path, chunksize):
+        size = block.shape[1]
+        timesteps.append(ts)
+        counts.append(block.sum(axis=1))
+        indices.append(np.nonzero(block)[1].astype(np.int32))
+    if not timesteps:
+        return SparseSpikes(size, [], [0], [])
+    indptr = np.concatenate(([0], np.cumsum(np.concatenate(counts))))
+    return SparseSpikes(size, np.concatenate(timesteps), indptr, np.concatenate(indices))
+
+
+# Histograms with fixed bins, so they can be filled chunk by chunk
+class DelayHistogram():
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = {}
+        self.stats = {}
+
+    def add(self, key, delays):
+        counts, _ = np.histogram(np.clip(delays, self.edges[0], self.edges[-1]), self.edges)
+        self.counts[key] = self.counts.get(key, 0) + counts
+        n, total, low, high = self.stats.get(key, (0, 0.0, np.inf, -np.inf))
+        self.stats[key] = (n + len(delays), total + delays.sum(),
+                           min(low, delays.min()), max(high, delays.max()))
+
+    def mean(self, key):
+        n, total, _, _ = self.stats[key]
+        return total / n
+
+    # upper edge of the bin holding the p-th percentile
+    def percentile(self, key, p):
+        cumulative = np.cumsum(self.counts[key])
+        return self.edges[1:][np.searchsorted(cumulative, cumulative[-1] * p / 100)]
+
+    def summary(self, percentiles=(50, 90, 99)):
+        rows = []
+        for key in sorted(self.counts, key=str):
+            n, _, low, high = self.stats[key]
+            row = {"key": key, "count": n, "mean": self.mean(key), "min": low, "max": high}
+            for p in percentiles:
+                row[f"p{p}"] = self.percentile(key, p)
+            rows.append(row)
+        return pandas.DataFrame(rows).set_index("key")
+
+
+# TimeDelayReporter CSV: start,end,layer,hops. Delays (end - start, in ps)
+# are binned per layer and per hop count.
+def read_delays(path, bin_width=10000, max_delay=10**8, chunksize=100000):
+    edges = np.arange(0, max_delay + bin_width, bin_width)
+    by_layer = DelayHistogram(edges)
+    by_hops = DelayHistogram(edges)
+    for chunk in pandas.read_csv(path, chunksize=chunksize):
+        delays = (chunk["end"] - chunk["start"]).to_numpy(dtype=np.float64)
+        for key, index in chunk.groupby("layer").indices.items():
+            by_layer.add(key, delays[index])
+        if "hops" in chunk:
+            for key, index in chunk.groupby("hops").indices.items():
+                by_hops.add(int(key), delays[index])
+    return by_layer, by_hops
+
+
+# parse-vcd output: kind,neuron,time with kind 0 for a neuron event entering
+# the core and 1 for an output spike. Gives (neurons, times) per kind.
+def read_vcd(path, chunksize=100000):
+    parts = {0: ([], []), 1: ([], [])}
+    for chunk in pandas.read_csv(path, header=None, names=["kind", "neuron", "time"],
+                                 dtype={"kind": np.int8, "neuron": np.int32, "time": np.int64},
+                                 chunksize=chunksize):
+        for kind, (neurons, times) in parts.items():
+            selected = chunk[chunk["kind"] == kind]
+            neurons.append(selected["neuron"].to_numpy())
+            times.append(selected["time"].to_numpy())
+    return {kind: (np.concatenate(neurons) if neurons else np.zeros(0, np.int32),
+                   np.concatenate(times) if times else np.zeros(0, np.int64))
+            for kind, (neurons, times) in parts.items()}
+
+
+# events with a HW time binned into timesteps of period
+def events_to_spikes(neurons, times, period, size=None):
+    size = size or (int(neurons.max()) + 1 if len(neurons) else 0)
+    ts = times // period
+    order = np.lexsort((neurons, ts))
+    ts, neurons = ts[order], neurons[order]
+    nr_steps = int(ts.max()) + 1 if len(ts) else 0
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(ts, minlength=nr_steps))))
+    return SparseSpikes(size, np.arange(nr_steps), indptr, neurons)
+
+
+# Per timestep difference between the spikes in a spike_<layer>.csv and a
+# reference [timesteps, neurons] array, e.g. a layer of the spike trace of a
+# PyTorch SRNN2 run. Simulator timestep ts is compared with reference row
+# ts + offset. The file is read chunk by chunk.
+def diff_tensor(path, reference, offset=0, chunksize=256):
+    reference = np.asarray(reference) > 0.5
+    rows = []
+    for ts, block in iter_tensor(path, chunksize):
+        ref_rows = ts + offset
+        valid = (ref_rows >= 0) & (ref_rows < reference.shape[0])
+        ref = np.zeros_like(block)
+        ref[valid] = reference[ref_rows[valid], :block.shape[1]]
+        rows.append(pandas.DataFrame({
+            "ts": ts,
+            "sim": block.sum(axis=1),
+            "reference": ref.sum(axis=1),
+            "missing": (ref & ~block).sum(axis=1),
+            "extra": (block & ~ref).sum(axis=1)
+        }))
+    return pandas.concat(rows, ignore_index=True) if rows else pandas.DataFrame()
+
+
+def print_diff(name, d):
+    mismatch = d["missing"] + d["extra"]
+    first = d["ts"][mismatch > 0].min() if (mismatch > 0).any() else None
+    print(f"{name}: {d['sim'].sum()} spikes (reference {d['reference'].sum()}), "
+          f"{d['missing'].sum()} missing, {d['extra'].sum()} extra, "
+          f"{(mismatch > 0).sum()} / {len(d)} timesteps differ"
+          + (f", first at ts {first}" if first is not None else ""))
+
+
+if __name__ == "__main__":
+    command = sys.argv[1]
+
+    if command == "tensor":
+        spikes = read_tensor(sys.argv[2])
+        print(f"{len(spikes)} timesteps, {spikes.size} neurons, {len(spikes.indices)} spikes")
+        print(f"Spikes per timestep: mean {spikes.counts().mean():.2f}, max {spikes.counts().max()}")
+        if len(sys.argv) > 3:
+            spikes.save(sys.argv[3])
+    elif command == "delays":
+        bin_width = int(sys.argv[3]) if len(sys.argv) > 3 else 10000
+        by_layer, by_hops = read_delays(sys.argv[2], bin_width)
+        print("Per layer (ps):")
+        print(by_layer.summary().to_string())
+        print("Per hops (ps):")
+        print(by_hops.summary().to_string())
+    elif command == "vcd":
+        events = read_vcd(sys.argv[2])
+        for kind, name in [(0, "Input events"), (1, "Output spikes")]:
+            neurons, times = events[kind]
+            print(f"{name}: {len(neurons)}")
+        if len(sys.argv) > 3:
+            outputs = events_to_spikes(*events[1], int(sys.argv[3]))
+            print(f"Output spikes per timestep: {outputs.counts().tolist()}")
+    elif command == "diff":
+        # reference: npz with a [timesteps, neurons] array per layer name
+        results_dir = sys.argv[2]
+        reference = np.load(sys.argv[3])
+        offset = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+        for path in sorted(glob.glob(f"{results_dir}/spike_*.csv")):
+            name = os.path.basename(path)[len("spike_"):-len(".csv")]
+            if name not in reference:
+                continue
+            print_diff(name, diff_tensor(path, reference[name], offset))
+    else:
+        raise ValueError(f"Unknown command: {command}")
@@ -0,0 +1,205 @@
+import glob
+import json
+import os
+import sys
+import threading
+import time
+import numpy as np
+import pandas
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from model_costs import *
+from model_metrics import *
+
+
+# The results of one refresh: frames of every (exp, model) and the stamps
+# they were read at. Frames are never changed once a snapshot is published,
+# the Costs and Metrics caches only ever gain entries that any reader may add.
+class Snapshot():
+    def __init__(self, root, frames, stamps, costs, metrics):
+        self.root = root
+        self.frames = frames
+        self.stamps = stamps
+        self.costs = costs
+        self.metrics = metrics
+
+    def model_path(self, exp):
+        return f"{self.root}/{exp}/model.json"
+
+    def exps(self):
+        return sorted(set(exp for exp, _ in self.frames))
+
+    def models(self):
+        return sorted(set(model for _, model in self.frames))
+
+    def samples(self, exp, model):
+        return self.frames[(exp, model)]
+
+    def cost(self, exp):
+        if exp not in self.costs:
+            self.costs[exp] = (time.time(), Costs(self.model_path(exp)))
+        return self.costs[exp][1]
+
+    def metric(self, exp, model):
+        key = (exp, model)
+        if key not in self.metrics:
+            self.metrics[key] = Metrics(self.cost(exp), self.frames[key])
+        return self.metrics[key]
+
+    # any Metrics attribute over exps x models, series are summed
+    def pivot(self, name, exps=None, models=None):
+        exps = exps or self.exps()
+        models = models or self.models()
+        table = pandas.DataFrame(index=exps, columns=models, dtype=np.float64)
+        for exp in exps:
+            for model in models:
+                if (exp, model) not in self.frames:
+                    continue
+                value = getattr(self.metric(exp, model), name)
+                table.loc[exp, model] = float(
+                    value if np.ndim(value) == 0 else value.sum())
+        return table
+
+
+# All res/exp/<exp>/results/<model>/experiments.csv files, indexed by (exp,
+# model). Files are only read again when they change and Costs/Metrics are
+# cached until then. refresh builds a new Snapshot and swaps it in, so
+# readers take store.snapshot once and never wait for a refresh.
+class ResultsStore():
+    def __init__(self, root="res/exp"):
+        self.root = root
+        self.lock = threading.Lock()
+        self.snapshot = Snapshot(root, {}, {}, {}, {})
+        self.refresh()
+
+    @property
+    def frames(self):
+        return self.snapshot.frames
+
+    def pivot(self, name, exps=None, models=None):
+        return self.snapshot.pivot(name, exps, models)
+
+    def refresh(self):
+        with self.lock:
+            old = self.snapshot
+            frames = dict(old.frames)
+            stamps = dict(old.stamps)
+            costs = dict(old.costs)
+            metrics = dict(old.metrics)
+
+            found = {}
+            for path in glob.glob(f"{self.root}/*/results/*/experiments.csv"):
+                parts = os.path.normpath(path).split(os.sep)
+                found[(parts[-4], parts[-2])] = path
+
+            changed = []
+            for key in list(frames):
+                if key not in found:
+                    del frames[key]
+                    del stamps[key]
+                    metrics.pop(key, None)
+                    changed.append(key)
+            for key, path in found.items():
+                stat = os.stat(path)
+                stamp = (stat.st_mtime_ns, stat.st_size)
+                if stamps.get(key) == stamp:
+                    continue
+                try:
+                    frame = pandas.read_csv(path)
+                except pandas.errors.EmptyDataError:
+                    continue
+                frame.index.name = "sample"
+                frames[key] = frame
+                stamps[key] = stamp
+                metrics.pop(key, None)
+                changed.append(key)
+
+            # a changed model.json invalidates the costs and metrics of that exp
+            for exp in list(costs):
+                if os.path.getmtime(old.model_path(exp)) > costs[exp][0]:
+                    del costs[exp]
+                    for key in [k for k in metrics if k[0] == exp]:
+                        del metrics[key]
+
+            self.snapshot = Snapshot(self.root, frames, stamps, costs, metrics)
+            return changed
+
+
+def split_arg(query, name):
+    if name not in query:
+        return None
+    return query[name][0].split(",")
+
+
+def serve(store: ResultsStore, port, refresh_interval=5.0):
+    last_refresh = [time.time()]
+
+    class Handler(BaseHTTPRequestHandler):
+        def reply(self, status, body, content_type="text/csv"):
+            data = body.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            status, body, content_type = self.answer(url, query)
+            self.reply(status, body, content_type)
+
+        def answer(self, url, query):
+            if time.time() - last_refresh[0] > refresh_interval:
+                last_refresh[0] = time.time()
+                store.refresh()
+
+            # one snapshot for the whole request, refreshes swap in a new one
+            snapshot = store.snapshot
+            try:
+                if url.path == "/pivot":
+                    table = snapshot.pivot(query["metric"][0], split_arg(
+                        query, "exps"), split_arg(query, "models"))
+                    return 200, table.to_csv(), "text/csv"
+                elif url.path == "/samples":
+                    frame = snapshot.samples(query["exp"][0], query["model"][0])
+                    cols = split_arg(query, "columns")
+                    return 200, (frame[cols] if cols else frame).to_csv(), "text/csv"
+                elif url.path == "/keys":
+                    return 200, json.dumps(sorted(snapshot.frames)), "application/json"
+                elif url.path == "/refresh":
+                    last_refresh[0] = time.time()
+                    changed = store.refresh()
+                    return 200, json.dumps(changed), "application/json"
+                else:
+                    return 404, "unknown path\n", "text/plain"
+            except (KeyError, AttributeError, TypeError, ValueError) as e:
+                return 400, f"{e}\n", "text/plain"
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print(f"Serving {len(store.frames)} results on http://127.0.0.1:{port}")
+    print(f"  /pivot?metric=<name>[&exps=a,b][&models=a,b]")
+    print(f"  /samples?exp=<exp>&model=<model>[&columns=a,b]")
+    print(f"  /keys, /refresh")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    command = sys.argv[1]
+
+    start_time = time.perf_counter()
+    store = ResultsStore()
+    print(f"Loaded {len(store.frames)} results in {time.perf_counter() - start_time:.2f} s", file=sys.stderr)
+    if command == "serve":
+        port = int(sys.argv[2]) if len(sys.argv) > 2 else 8050
+        serve(store, port)
+    elif command == "pivot":
+        metric = sys.argv[2]
+        exps = sys.argv[3].split(",") if len(sys.argv) > 3 else None
+        models = sys.argv[4].split(",") if len(sys.argv) > 4 else None
+        print(store.pivot(metric, exps, models).to_csv(), end="")
+    else:
+        raise ValueError(f"Unknown command: {command}")
@@ -0,0 +1,127 @@
+import re
+import sys
+import time
+import numpy as np
+import pandas
+from model_costs import *
+from model_metrics import *
+
+# every column Metrics reads
+METRICS_COLUMNS = [
+    r"latency", r"correct", r"predicted",
+    r"core\d+_(sops|faultySpikes|sparsity|alu_util|recv_util|snd_util)",
+    r"core\d+_(layer|neuron|synapse)(Reads|Writes)",
+    r"core\d+_(compute|output)(Pops|Pushes)",
+    r"core\d+_ops_\w+",
+    r"router\(\d+_\d+\)_(nrHops|nrPacketSwitches|averageLat)"
+]
+
+FLOAT_SUFFIXES = ("_sparsity", "_util", "_averageLat", "runningTime")
+
+
+# Sum of one column over all samples. Metrics only scales, adds and reduces
+# columns, so these sums are all it needs.
+class Reduced():
+    def __init__(self, total, count):
+        self.total = total
+        self.count = count
+
+    def __add__(self, other):
+        if isinstance(other, Reduced):
+            return Reduced(self.total + other.total, self.count)
+        return Reduced(self.total + other * self.count, self.count)
+
+    __radd__ = __add__
+
+    def __mul__(self, scale):
+        return Reduced(self.total * scale, self.count)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, scale):
+        return Reduced(self.total / scale, self.count)
+
+    def sum(self):
+        return self.total
+
+    def mean(self):
+        return self.total / self.count
+
+
+class ReducedPrediction(Reduced):
+    def __init__(self, frame):
+        super().__init__(float("nan"), frame.count)
+        self.frame = frame
+
+    # predicted == correct gives the amount of correct samples
+    def __eq__(self, other):
+        return Reduced(self.frame.nr_correct, self.count)
+
+
+# The part of a DataFrame Metrics uses, backed by column sums
+class ReducedFrame():
+    def __init__(self, columns):
+        self.columns = pandas.Index(columns)
+        self.totals = np.zeros(len(columns))
+        self.count = 0
+        self.nr_correct = 0
+
+    def add(self, chunk):
+        self.totals += np.nansum(chunk[self.columns].to_numpy(dtype=np.float64), axis=0)
+        self.count += chunk.shape[0]
+        if "correct" in chunk and "predicted" in chunk:
+            self.nr_correct += int((chunk["correct"] ==
+                                    chunk["predicted"]).sum())
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    def __getitem__(self, column):
+        if column in ["correct", "predicted"]:
+            return ReducedPrediction(self)
+        return Reduced(self.totals[self.columns.get_loc(column)], self.count)
+
+    @property
+    def shape(self):
+        return (self.count, len(self.columns))
+
+
+def project(header, patterns):
+    regexes = [re.compile(p) for p in patterns]
+    return [col for col in header if any(r.fullmatch(col) for r in regexes)]
+
+
+# float columns in float32, the counters are left to pandas: they can pass
+# 2^31 on large runs and have empty cells
+def downcast(columns):
+    return {col: np.float32 for col in columns if col.endswith(FLOAT_SUFFIXES)}
+
+
+# reads experiments.csv in row chunks, keeping only the columns matching
+# patterns, into column sums
+def read_reduced(path, patterns=METRICS_COLUMNS, chunksize=1000):
+    header = pandas.read_csv(path, nrows=0).columns
+    columns = project(header, patterns)
+    frame = ReducedFrame(columns)
+    for chunk in pandas.read_csv(path, usecols=columns, dtype=downcast(columns), chunksize=chunksize):
+        frame.add(chunk)
+    return frame
+
+
+# Metrics of an experiments.csv of any size with bounded memory. Per-sample
+# vectors such as Metrics.sample_energy are sums instead.
+def streaming_metrics(cost: Costs, path, chunksize=1000):
+    return Metrics(cost, read_reduced(path, chunksize=chunksize))
+
+
+if __name__ == "__main__":
+    expName = sys.argv[1]
+    modelName = sys.argv[2]
+    chunksize = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+
+    start_time = time.perf_counter()
+    c = Costs(f"res/exp/{expName}/model.json")
+    m = streaming_metrics(
+        c, f"res/exp/{expName}/results/{modelName}/experiments.csv", chunksize)
+    print(f"Read {m.nr_samples} samples in {time.perf_counter() - start_time:.2f} s")
+    m.print_summary()
@@ -0,0 +1,228 @@
+import json
+import os
+import sys
+import time
+import numpy as np
+import pandas
+from model_costs import *
+from model_reference import run_reference
+
+
+class HW():
+    def __init__(self, path):
+        hw = json.load(open(path))
+        self.width = hw["NoC"]["Width"]
+        self.height = hw["NoC"]["Height"]
+        self.noc = hw["NoC"]
+        self.cores = {}
+        self.specs = {}
+        self.controller = None
+        for core in hw["Cores"]:
+            spec = dict(hw["CoreTemplates"].get(core.get("$Template"), {}))
+            spec.update(core)
+            x, y = spec["ConnectsTo"].split(",")
+            self.cores[spec["Name"]] = (int(x), int(y))
+            self.specs[spec["Name"]] = spec
+            if spec["Type"].startswith("controller"):
+                self.controller = spec["Name"]
+
+    def router_names(self):
+        # same order as MeshComm.Report
+        return [f"router({x}_{y})" for y in range(self.height) for x in range(self.width)]
+
+    def router_index(self, x, y):
+        return y * self.width + x
+
+
+# splits of every layer in the order SNN.SplitSNN numbers them
+def load_mapping(path):
+    mapping = json.load(open(path))
+    splits = {}
+    for entry in mapping["Mapped"]:
+        splits.setdefault(entry["Layer"], []).append(
+            (entry["Core"], entry["Start"], entry["End"]))
+    return splits
+
+
+# routers an XYRouter packet passes: first along X, then along Y. Every router
+# on the path switches the packet, all but the last also send it over a link.
+def xy_path(src, dst):
+    (x, y), (dx, dy) = src, dst
+    path = []
+    while x != dx:
+        path.append((x, y))
+        x += 1 if dx > x else -1
+    while y != dy:
+        path.append((x, y))
+        y += 1 if dy > y else -1
+    path.append((x, y))
+    return path
+
+
+class TrafficModel():
+    def __init__(self, layers, splits, hw: HW):
+        self.layers = layers
+        self.hw = hw
+        self.pairs = []
+        self.pair_index = {}
+
+        # cores of every layer split, input and output live on the controller
+        self.splits = []
+        for layer in layers:
+            if layer.type in ["input", "output"]:
+                self.splits.append([(hw.controller, 0, layer.size)])
+            else:
+                self.splits.append(splits[layer.name])
+        self.active_cores = [c for c in hw.cores if c != hw.controller and any(
+            core == c for s in self.splits for core, _, _ in s)]
+
+        # packets per spike of every neuron: recurrent spikes go to all
+        # siblings, forward spikes to all splits of the next layer
+        self.neuron_packets = []
+        for k, layer in enumerate(layers[:-1]):
+            dests = [core for core, _, _ in self.splits[k + 1]]
+            if layer.type not in ["input", "output"] and layer.recurrent:
+                dests += [core for core, _, _ in self.splits[k]]
+            entries = []
+            for core, start, end in self.splits[k]:
+                for dest in dests:
+                    entries.append((start, end, self.pair(core, dest)))
+            self.neuron_packets.append(entries)
+
+        # syncs from the controller and ready packets back every timestep
+        self.sync_pairs = [self.pair(hw.controller, c)
+                           for c in self.active_cores]
+        self.ready_pairs = [self.pair(c, hw.controller)
+                            for c in self.active_cores]
+
+        nr_routers = hw.width * hw.height
+        self.hops = np.zeros((len(self.pairs), nr_routers), dtype=np.int64)
+        self.switches = np.zeros((len(self.pairs), nr_routers), dtype=np.int64)
+        self.distance = np.zeros(len(self.pairs), dtype=np.int64)
+        for i, (src, dst) in enumerate(self.pairs):
+            path = xy_path(hw.cores[src], hw.cores[dst])
+            for j, (x, y) in enumerate(path):
+                r = hw.router_index(x, y)
+                self.switches[i, r] += 1
+                if j != len(path) - 1:
+                    self.hops[i, r] += 1
+            self.distance[i] = len(path) - 1
+
+    def pair(self, src, dst):
+        if (src, dst) not in self.pair_index:
+            self.pair_index[(src, dst)] = len(self.pairs)
+            self.pairs.append((src, dst))
+        return self.pair_index[(src, dst)]
+
+    # spikes: per layer an array [..., size] of spike counts, gives packets
+    # per (src, dst) pair [..., pairs]
+    def packets(self, spikes, nr_steps=None):
+        shape = spikes[0].shape[:-1]
+        flows = np.zeros(shape + (len(self.pairs),), dtype=np.int64)
+        for k, entries in enumerate(self.neuron_packets):
+            for start, end, pair in entries:
+                flows[..., pair] += spikes[k][..., start:end].sum(axis=-1)
+        if nr_steps is not None:
+            for pair in self.sync_pairs + self.ready_pairs:
+                flows[..., pair] += nr_steps
+        return flows
+
+    def routers(self, flows):
+        return flows @ self.hops, flows @ self.switches
+
+    # SOPs per core given the integrated spikes of every layer
+    def core_sops(self, integrated):
+        sops = {c: 0 for c in self.active_cores}
+        for k, layer in enumerate(self.layers):
+            if layer.type in ["input", "output"]:
+                continue
+            for core, start, end in self.splits[k]:
+                sops[core] = sops[core] + integrated[k] * (end - start)
+        return sops
+
+
+def estimate(snn_path, hw_path, mapping_path, dataset_path, max_samples=2147483647):
+    hw = HW(hw_path)
+    splits = load_mapping(mapping_path)
+    model = None
+    frames = []
+    for layers, start, correct, predicted, nr_steps, _, sops, trains in run_reference(snn_path, dataset_path, max_samples, keep_spikes=True):
+        if model is None:
+            model = TrafficModel(layers, splits, hw)
+        flows = model.packets([t.sum(axis=1) for t in trains], nr_steps)
+        hops, switches = model.routers(flows)
+        integrated = [s // l.size if l.type not in ["input", "output"] else s
+                      for s, l in zip(sops, layers)]
+
+        frame = {
+            "expNr": np.arange(start, start + len(correct)),
+            "correct": correct,
+            "predicted": predicted
+        }
+        for core, core_sops in model.core_sops(integrated).items():
+            frame[f"{core}_sops"] = core_sops
+        for r, name in enumerate(hw.router_names()):
+            frame[f"{name}_nrHops"] = hops[:, r]
+            frame[f"{name}_nrPacketSwitches"] = switches[:, r]
+        frames.append(pandas.DataFrame(frame))
+
+    results = pandas.concat(frames, ignore_index=True)
+    # routers without traffic are not reported by the simulator either
+    idle = [col for col in results.columns if col.startswith(
+        "router") and results[col].sum() == 0]
+    idle_routers = set(col.rsplit("_", 1)[0] for col in idle)
+    results = results.drop(columns=[col for col in results.columns if col.startswith(
+        "router") and col.rsplit("_", 1)[0] in idle_routers])
+    return results
+
+
+def router_energy(cost: Costs, results):
+    energy = 0.0
+    for col in results.columns:
+        if col.endswith("_nrHops"):
+            energy += results[col] * cost.link_dyn_packet
+        elif col.endswith("_nrPacketSwitches"):
+            energy += results[col] * cost.router_dyn_packet
+    return energy
+
+
+if __name__ == "__main__":
+    expName = sys.argv[1]
+    modelName = sys.argv[2]
+    dsFile = sys.argv[3]
+    max_samples = int(sys.argv[4]) if len(sys.argv) > 4 else 2147483647
+
+    start_time = time.perf_counter()
+    results = estimate(f"res/snn/snn-{modelName}.json", f"res/exp/{expName}/hw.json",
+                       f"res/exp/{expName}/mappings/{modelName}.json", f"res/dataset/{dsFile}.zip", max_samples)
+    duration = time.perf_counter() - start_time
+    c = Costs(f"res/exp/{expName}/model.json")
+    energy = router_energy(c, results)
+
+    out_dir = f"res/exp/{expName}/estimates/{modelName}"
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    results.to_csv(f"{out_dir}/traffic.csv", index=False)
+
+    hops = results[[col for col in results.columns if col.endswith("_nrHops")]].values.sum()
+    switches = results[[col for col in results.columns if col.endswith(
+        "_nrPacketSwitches")]].values.sum()
+    sops = results[[col for col in results.columns if col.endswith("_sops")]].values.sum()
+    print(f"Samples: {results.shape[0]} ({duration:.2f} s)")
+    print(f"Hops: {hops:,}")
+    print(f"Packet switches: {switches:,}")
+    print(f"SOPs: {sops:,}")
+    print(f"Router energy: {energy.sum():.3f} J ({energy.mean()*1E6:.3f} uJ / inference)")
+
+    # compare with the simulated counters when they exist
+    exp_path = f"res/exp/{expName}/results/{modelName}/experiments.csv"
+    if os.path.isfile(exp_path):
+        cols = [col for col in results.columns if col not in [
+            "expNr", "correct", "predicted"]]
+        exp = pandas.read_csv(exp_path, nrows=results.shape[0])
+        common = [col for col in cols if col in exp]
+        print(f"Compared to simulation:")
+        for suffix in ["_nrHops", "_nrPacketSwitches", "_sops"]:
+            sim = exp[[col for col in common if col.endswith(suffix)]].values.sum()
+            est = results[[col for col in common if col.endswith(suffix)]].values.sum()
+            print(f"  {suffix[1:]}: {est:,} vs {sim:,} ({(est - sim) / sim * 100:+.2f}%)")
@@ -0,0 +1,131 @@
+import io
+import json
+import os
+import sys
+import time
+import pandas
+from model_costs import *
+from model_metrics import *
+from model_stream import METRICS_COLUMNS, ReducedFrame, downcast, project, streaming_metrics
+
+
+# Follows an experiments.csv that dataset-sim is still writing and keeps the
+# column sums of all complete rows
+class Tail():
+    def __init__(self, path, patterns=METRICS_COLUMNS):
+        self.path = path
+        self.patterns = patterns
+        self.offset = 0
+        self.header = None
+        self.frame = None
+        self.partial = ""
+
+    def poll(self):
+        if not os.path.isfile(self.path):
+            return 0
+        with open(self.path) as f:
+            f.seek(self.offset)
+            data = f.read()
+            self.offset = f.tell()
+        data = self.partial + data
+        end = data.rfind("\n") + 1
+        self.partial = data[end:]
+        lines = data[:end]
+        if not lines:
+            return 0
+
+        if self.header is None:
+            self.header, lines = lines.split("\n", 1)
+            columns = project(self.header.split(","), self.patterns)
+            self.frame = ReducedFrame(columns)
+            self.dtypes = downcast(columns)
+            if not lines:
+                return 0
+        chunk = pandas.read_csv(io.StringIO(self.header + "\n" + lines),
+                                usecols=self.frame.columns, dtype=self.dtypes)
+        self.frame.add(chunk)
+        return chunk.shape[0]
+
+
+# objectives of a design point: energy and delay per inference are
+# minimised, accuracy maximised
+def objectives(m: Metrics):
+    return (m.total_energy / m.nr_samples, m.delay_per_inference, -m.accuracy)
+
+
+# a is better than b in every objective by more than margin (relative)
+def dominates(a, b, margin):
+    return all(x < y - margin * abs(y) for x, y in zip(a, b))
+
+
+def reference_points(expName, modelName, exps):
+    points = {}
+    for ref in exps:
+        path = f"res/exp/{ref}/results/{modelName}/experiments.csv"
+        if ref == expName or not os.path.isfile(path):
+            continue
+        points[ref] = objectives(streaming_metrics(
+            Costs(f"res/exp/{ref}/model.json"), path))
+    return points
+
+
+def summary(m: Metrics, nr_done, nr_samples, sample_rate, dominated_by):
+    left = nr_samples - nr_done
+    return {
+        "samples": nr_done,
+        "total": nr_samples,
+        "sample_rate": sample_rate,
+        "eta": left / sample_rate if sample_rate > 0 else None,
+        "accuracy": m.accuracy,
+        "energy": m.total_energy / m.nr_samples,
+        "sop_energy": m.sop_energy,
+        "sops_per_second": m.sops_per_second,
+        "eat": m.eat,
+        "dominated_by": dominated_by
+    }
+
+
+def watch(expName, modelName, nr_samples, interval=10.0, exps=(), margin=0.05, min_samples=100):
+    results_dir = f"res/exp/{expName}/results/{modelName}"
+    c = Costs(f"res/exp/{expName}/model.json")
+    tail = Tail(f"{results_dir}/experiments.csv")
+    references = reference_points(expName, modelName, exps)
+
+    # the rate is measured from the first rows seen, the run may have
+    # started long before the watcher
+    first = None
+    nr_done = 0
+    while nr_done < nr_samples:
+        time.sleep(interval)
+        nr_done += tail.poll()
+        if nr_done == 0:
+            continue
+        now = time.perf_counter()
+        if first is None:
+            first = (now, nr_done)
+        elapsed = now - first[0]
+        sample_rate = (nr_done - first[1]) / elapsed if elapsed > 0 else 0.0
+
+        m = Metrics(c, tail.frame)
+        point = objectives(m)
+        dominated_by = [ref for ref, other in references.items()
+                        if nr_done >= min_samples and dominates(other, point, margin)]
+        s = summary(m, nr_done, nr_samples, sample_rate, dominated_by)
+        json.dump(s, open(f"{results_dir}/live.json", "w"), indent=4)
+
+        eta = f"{s['eta']:.0f} s" if s["eta"] is not None else "?"
+        line = f"{nr_done} / {nr_samples} ({sample_rate:.1f} samples/s, ETA {eta}): accuracy {m.accuracy:.4f}, " \
+            f"{s['energy']*1E6:.3f} uJ / inference, {m.sops_per_second:,.0f} SOP/s, EAT {m.eat*1E-12:.2f} SOP^2/s/mm^2/pJ"
+        if dominated_by:
+            line += f", dominated by {','.join(dominated_by)}"
+        print(line, flush=True)
+
+
+if __name__ == "__main__":
+    expName = sys.argv[1]
+    modelName = sys.argv[2]
+    nr_samples = int(sys.argv[3])
+    interval = float(sys.argv[4]) if len(sys.argv) > 4 else 10.0
+    exps = sys.argv[5].split(",") if len(sys.argv) > 5 else []
+
+    watch(expName, modelName, nr_samples, interval, exps)
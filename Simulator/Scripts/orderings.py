@@ -1,3 +1,9 @@
+import json
+import math
+import sys
+from model_packing import CoreUsage, first_fit
+
+
 def diagonal(startX, startY, width, height):
     values = []
     x = startX
@@ -34,21 +40,216 @@ def matrix_colMajor(width, height):
 
     return matrix
 
-if __name__ == "__main__":
-    print(diagonal(0, 0, 3, 3))
-    print(diagonal(0, 1, 3, 3))
-    print(diagonal(0, 2, 3, 3))
-    print(diagonal(1, 2, 3, 3))
-    print(diagonal(2, 2, 3, 3))
+def matrix_order(width, height, coords):
+    matrix = [[0 for _ in range(width)] for _ in range(height)]
+    for i, (x, y) in enumerate(coords):
+        matrix[y][x] = i
+    return matrix
+
+
+# boustrophedon: column major, but every other column runs downwards so that
+# consecutive cores are always neighbours
+def matrix_snake(width, height):
+    coords = []
+    for x in range(0, width):
+        ys = range(0, height) if x % 2 == 0 else range(height - 1, -1, -1)
+        coords.extend((x, y) for y in ys)
+    return matrix_order(width, height, coords)
+
+
+# square shells around the controller at (0,0), alternating direction, and
+# the rest of a rectangular mesh as a snake. The directions are chosen such
+# that the last shell ends next to that rest, so the walk stays contiguous.
+def matrix_spiral(width, height):
+    m = min(width, height)
+    coords = []
+    for s in range(0, m):
+        shell = [(s, y) for y in range(0, s)] + [(s, s)] + \
+            [(x, s) for x in range(s - 1, -1, -1)]
+        # reversed shells end at (s, 0), the others at (0, s)
+        if ((m - 1 - s) % 2 == 0) == (width > height):
+            shell.reverse()
+        coords.extend(shell)
+    for x in range(m, width):
+        ys = range(0, height) if (x - m) % 2 == 0 else range(height - 1, -1, -1)
+        coords.extend((x, y) for y in ys)
+    for y in range(m, height):
+        xs = range(0, width) if (y - m) % 2 == 0 else range(width - 1, -1, -1)
+        coords.extend((x, y) for x in xs)
+    return matrix_order(width, height, coords)
+
+
+# n split in three odd parts of about the same size
+def odd_thirds(n):
+    p = 2 * round((n / 3 - 1) / 2) + 1
+    if n - 2 * p < 1:
+        p -= 2
+    return [p, p, n - 2 * p]
+
+
+# Peano curve from (0,0) to (w-1,h-1) over w x h cells: three column strips
+# of three blocks each, run as a snake, every block a Peano curve mirrored to
+# join its neighbours. Only exists for odd w and h: a walk between opposite
+# corners of a grid with an even side can not visit every cell.
+def peano(w, h):
+    if w == 1:
+        return [(0, y) for y in range(h)]
+    if h == 1:
+        return [(x, 0) for x in range(w)]
+    ws, hs = odd_thirds(w), odd_thirds(h)
+    coords = []
+    x0 = 0
+    for i in range(3):
+        rows = range(3) if i % 2 == 0 else range(2, -1, -1)
+        for j in rows:
+            y0 = sum(hs[:j])
+            for x, y in peano(ws[i], hs[j]):
+                x = ws[i] - 1 - x if j % 2 == 1 else x
+                y = hs[j] - 1 - y if i % 2 == 1 else y
+                coords.append((x0 + x, y0 + y))
+        x0 += ws[i]
+    return coords
+
+
+def matrix_peano(width, height):
+    if width % 2 == 0 or height % 2 == 0:
+        raise ValueError(f"No Peano ordering for a {width}x{height} mesh, the sides have to be odd")
+    return matrix_order(width, height, peano(width, height))
+
+
+def sign(x):
+    return (x > 0) - (x < 0)
+
 
+# generalized Hilbert curve for arbitrary rectangles ("gilbert2d")
+def gilbert(x, y, ax, ay, bx, by):
+    w = abs(ax + ay)
+    h = abs(bx + by)
+    dax, day = sign(ax), sign(ay)
+    dbx, dby = sign(bx), sign(by)
+
+    if h == 1:
+        for _ in range(w):
+            yield (x, y)
+            x, y = x + dax, y + day
+        return
+    if w == 1:
+        for _ in range(h):
+            yield (x, y)
+            x, y = x + dbx, y + dby
+        return
+
+    ax2, ay2 = ax // 2, ay // 2
+    bx2, by2 = bx // 2, by // 2
+    w2 = abs(ax2 + ay2)
+    h2 = abs(bx2 + by2)
+    if 2 * w > 3 * h:
+        if (w2 % 2) and (w > 2):
+            ax2, ay2 = ax2 + dax, ay2 + day
+        yield from gilbert(x, y, ax2, ay2, bx, by)
+        yield from gilbert(x + ax2, y + ay2, ax - ax2, ay - ay2, bx, by)
+    else:
+        if (h2 % 2) and (h > 2):
+            bx2, by2 = bx2 + dbx, by2 + dby
+        yield from gilbert(x, y, bx2, by2, ax2, ay2)
+        yield from gilbert(x + bx2, y + by2, ax, ay, bx - bx2, by - by2)
+        yield from gilbert(x + (ax - dax) + (bx2 - dbx), y + (ay - day) + (by2 - dby),
+                           -bx2, -by2, -(ax - ax2), -(ay - ay2))
+
+
+def matrix_hilbert(width, height):
+    if width >= height:
+        coords = gilbert(0, 0, width, 0, 0, height)
+    else:
+        coords = gilbert(0, 0, 0, height, width, 0)
+    return matrix_order(width, height, coords)
+
+
+orderings = {
+    "ColumnMajor": matrix_colMajor,
+    "Diagonal": matrix_diagonal,
+    "Snake": matrix_snake,
+    "Spiral": matrix_spiral,
+    "Hilbert": matrix_hilbert,
+    "Peano": matrix_peano
+}
+
+
+# FirstFit1 on a mesh with the core priorities of save_hw for the ordering
+def ordering_mapping(ordering, layers, m):
+    from model_generate_hw import core_template
+
+    template = core_template(m)
+    height, width = len(ordering), len(ordering[0])
+    size = width * height
+    cores = []
+    coords = {}
+    for x in range(width):
+        for y in range(height):
+            name = f"{x},{y}"
+            if x == 0 and y == 0:
+                core = CoreUsage(name, ["input", "output"], None, priority=size - ordering[y][x])
+            else:
+                core = CoreUsage(name, template["Accepts"], template, priority=size - ordering[y][x])
+            cores.append(core)
+            coords[name] = (x, y)
+    return first_fit(layers, cores), coords
+
+
+# Expected hops per inference of the spike packets when every neuron spikes
+# once (or as often as rates says): a split sends to every split of the next
+# layer and, when recurrent, to every split of its own layer
+def ordering_hops(ordering, layers, m, rates=None):
+    mapping, coords = ordering_mapping(ordering, layers, m)
+    if mapping["Unmapped"]:
+        return math.inf
+
+    splits = {}
+    for entry in mapping["Mapped"]:
+        splits.setdefault(entry["Layer"], []).append(
+            (coords[entry["Core"]], entry["Start"], entry["End"]))
+    hops = 0.0
+    for k, layer in enumerate(layers[:-1]):
+        dests = [c for c, _, _ in splits[layers[k + 1]["Name"]]]
+        if layer["Recurrent"]:
+            dests += [c for c, _, _ in splits[layer["Name"]]]
+        for (x, y), start, end in splits[layer["Name"]]:
+            spikes = end - start if rates is None else sum(rates[k][start:end])
+            for dx, dy in dests:
+                hops += spikes * (abs(x - dx) + abs(y - dy))
+    return hops
+
+
+# orderings that do not exist for the mesh (Peano) are left out
+def best_ordering(width, height, networks, m):
+    scores = {}
+    for name, order in orderings.items():
+        try:
+            ordering = order(width, height)
+        except ValueError:
+            continue
+        scores[name] = sum(ordering_hops(ordering, layers, m) for layers in networks)
+    return min(scores, key=scores.get), scores
+
+
+if __name__ == "__main__":
     def print_matrix(A):
         print('\n'.join([''.join(['{:4}'.format(item) for item in row])
                         for row in A]))
-    
-    a1 = matrix_diagonal(3, 3)
-    print_matrix(a1)
-
-    a2 = matrix_colMajor(3, 3)
-    print_matrix(a2)
 
+    # orderings.py [<exp> <snn.json>...]: hops of every ordering
+    if len(sys.argv) > 2:
+        from model_mapping import packing_layers
+        from model_reference import load_shapes
 
+        m = json.load(open(f"res/exp/{sys.argv[1]}/model.json"))
+        networks = [packing_layers(load_shapes(path)) for path in sys.argv[2:]]
+        best, scores = best_ordering(
+            m["NoC"]["Width"], m["NoC"]["Height"], networks, m)
+        for name, hops in scores.items():
+            print(f"{name}: {hops:,.0f} hops")
+        print(f"Best: {best}")
+    else:
+        for name, order in orderings.items():
+            print(f"{name}:")
+            print_matrix(order(5, 4) if name != "Peano" else order(5, 5))
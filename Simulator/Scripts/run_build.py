@@ -0,0 +1,258 @@
+import concurrent.futures
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import pandas
+from model_costs import *
+from model_metrics import *
+from model_generate_hw import save_hw, snn_networks
+from telemetry import SIM, report, run_sim, sweep_log
+
+DB_PATH = "res/exp/.build.json"
+
+MODELS = [
+    ("best", "shd-10"),
+    ("shd1", "shd-10"),
+    ("shd4", "shd-10"),
+    ("smnist3", "smnist-3"),
+    ("smnist4", "smnist-4"),
+    ("psmnist1", "psmnist-1"),
+    ("psmnist2", "psmnist-2"),
+    ("ssc2", "ssc-4"),
+    ("ssc3", "ssc-4")
+]
+
+TABLE_METRICS = ["accuracy", "total_energy", "sop_energy",
+                 "delay_per_inference", "inferences_per_second", "eat"]
+
+# files above this size are compared by size and mtime instead of content
+HASH_LIMIT = 64 * 2**20
+
+
+# An artifact with the files it is made from. The recipe is part of the
+# stamp, so changing how a node is built also makes it stale.
+class Node():
+    def __init__(self, name, outputs, inputs, action, recipe, sim=False):
+        self.name = name
+        self.outputs = outputs
+        self.inputs = inputs
+        self.action = action
+        self.recipe = recipe
+        self.sim = sim
+        self.deps = []
+
+
+class Build():
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self.db = json.load(open(db_path)) if os.path.isfile(db_path) else {}
+        self.nodes = {}
+        self.producers = {}
+        self.lock = threading.Lock()
+
+    def add(self, node):
+        self.nodes[node.name] = node
+        for output in node.outputs:
+            self.producers[output] = node
+
+    def link(self):
+        for node in self.nodes.values():
+            node.deps = sorted(set(self.producers[i].name for i in node.inputs
+                                   if i in self.producers))
+
+    def stamp(self, path):
+        stat = os.stat(path)
+        if stat.st_size > HASH_LIMIT:
+            return f"{stat.st_size}:{stat.st_mtime_ns}"
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+
+    # why node has to be rebuilt, None when it is up to date
+    def stale(self, node):
+        missing = [i for i in node.inputs if not os.path.exists(i)]
+        if missing:
+            raise FileNotFoundError(f"{node.name}: missing input {missing[0]}")
+        record = self.db.get(node.name)
+        if record is None:
+            return "never built"
+        if record["recipe"] != node.recipe:
+            return "recipe changed"
+        for output in node.outputs:
+            if not os.path.exists(output):
+                return f"{output} missing"
+        for i in node.inputs:
+            if record["inputs"].get(i) != self.stamp(i):
+                return f"{i} changed"
+        return None
+
+    def record(self, node):
+        with self.lock:
+            self.db[node.name] = {
+                "recipe": node.recipe,
+                "inputs": {i: self.stamp(i) for i in node.inputs}
+            }
+            json.dump(self.db, open(self.db_path, "w"), indent=4)
+
+    # Runs the stale nodes in dependency order, up to jobs at the same time
+    def run(self, jobs=1, dry_run=False, before_sim=None):
+        self.link()
+        done = {}
+        built, skipped, failed = [], [], []
+        pending = dict(self.nodes)
+        running = {}
+        sim_ready = [before_sim is None]
+
+        def ready(node):
+            return all(d in done for d in node.deps)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+            while pending or running:
+                for name in [n for n, node in pending.items() if ready(node)]:
+                    node = pending.pop(name)
+                    if any(done[d] == "failed" for d in node.deps):
+                        done[name] = "failed"
+                        failed.append((name, "dependency failed"))
+                        continue
+                    rebuilt_deps = [d for d in node.deps if done[d] == "built"]
+                    try:
+                        reason = self.stale(node) if not (dry_run and rebuilt_deps) else None
+                    except FileNotFoundError as e:
+                        if not (dry_run and rebuilt_deps):
+                            done[name] = "failed"
+                            failed.append((name, str(e)))
+                            continue
+                        reason = None
+                    if reason is None and dry_run and rebuilt_deps:
+                        reason = f"{rebuilt_deps[0]} rebuilt"
+                    if reason is None:
+                        done[name] = "skipped"
+                        skipped.append(name)
+                        continue
+                    print(f">> {name}: {reason}")
+                    if dry_run:
+                        done[name] = "built"
+                        built.append((name, reason))
+                        continue
+                    if node.sim and not sim_ready[0]:
+                        before_sim()
+                        sim_ready[0] = True
+                    running[pool.submit(node.action)] = (node, reason)
+
+                if not running:
+                    continue
+                finished, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    node, reason = running.pop(future)
+                    try:
+                        future.result()
+                        self.record(node)
+                        done[node.name] = "built"
+                        built.append((node.name, reason))
+                    except Exception as e:
+                        done[node.name] = "failed"
+                        failed.append((node.name, str(e)))
+        return built, skipped, failed
+
+
+def run_checked(command, log_path, tags):
+    record = run_sim(command, log_path, tags, echo=False)
+    if record["returncode"] != 0:
+        raise RuntimeError(record["output"].strip().splitlines()[-1]
+                           if record["output"].strip() else f"exit code {record['returncode']}")
+
+
+def table_rows(expName, models, dest):
+    c = Costs(f"res/exp/{expName}/model.json")
+    rows = []
+    for modelName in models:
+        m = Metrics(c, pandas.read_csv(
+            f"res/exp/{expName}/results/{modelName}/experiments.csv"))
+        rows.append([expName, modelName] + [float(getattr(m, metric)) for metric in TABLE_METRICS])
+    pandas.DataFrame(rows, columns=["exp", "model"] + TABLE_METRICS).to_csv(dest, index=False)
+
+
+def pipeline(expNames, models=MODELS, mapper="FirstFit1", max_samples=2147483647, log_path=None):
+    build = Build()
+    tables = []
+    for expName in expNames:
+        exp_dir = f"res/exp/{expName}"
+        model_path = f"{exp_dir}/model.json"
+        hw_path = f"{exp_dir}/hw.json"
+
+        hw_inputs = [model_path]
+        auto = json.load(open(model_path)).get("CoreOrdering") == "Auto"
+        if auto:
+            hw_inputs += sorted(glob.glob("res/snn/snn-*.json"))
+        build.add(Node(f"{expName}/hw", [hw_path], hw_inputs,
+                       lambda m=model_path, h=hw_path, a=auto: save_hw(
+                           m, h, Costs(m), snn_networks() if a else None),
+                       "save_hw"))
+
+        results = []
+        for dsName, dsFile in models:
+            snn_path = f"res/snn/snn-{dsName}.json"
+            mapping_path = f"{exp_dir}/mappings/{dsName}.json"
+            results_dir = f"{exp_dir}/results/{dsName}"
+            tags = {"exp": expName, "model": dsName}
+
+            command = [SIM, "mapping", "-s", snn_path, "-h", hw_path,
+                       "-m", mapper, "-o", mapping_path]
+            build.add(Node(f"{expName}/mapping/{dsName}", [mapping_path], [snn_path, hw_path],
+                           lambda c=command, t=tags: run_checked(c, log_path, t),
+                           " ".join(command[1:]), sim=True))
+
+            dataset_path = f"res/dataset/{dsFile}.zip"
+            command = [SIM, "dataset-sim", "-s", snn_path, "-h", hw_path, "-m", mapping_path,
+                       "-d", dataset_path, f"--max-samples={max_samples}", "-o", results_dir]
+            build.add(Node(f"{expName}/results/{dsName}", [f"{results_dir}/experiments.csv"],
+                           [snn_path, hw_path, mapping_path, dataset_path],
+                           lambda c=command, t=tags: run_checked(c, log_path, t),
+                           " ".join(command[1:]), sim=True))
+            results.append(f"{results_dir}/experiments.csv")
+
+        table_path = f"{exp_dir}/table.csv"
+        names = [dsName for dsName, _ in models]
+        build.add(Node(f"{expName}/table", [table_path], [model_path] + results,
+                       lambda e=expName, n=names, d=table_path: table_rows(e, n, d),
+                       ",".join(TABLE_METRICS)))
+        tables.append(table_path)
+
+    # tables.csv holds every exp with a table, not only the ones of this run
+    tables = sorted(set(tables) | set(glob.glob("res/exp/*/table.csv")))
+
+    def merge():
+        pandas.concat([pandas.read_csv(t) for t in tables]).sort_values(["exp", "model"]).to_csv(
+            "res/exp/tables.csv", index=False)
+    build.add(Node("tables", ["res/exp/tables.csv"], tables, merge, "merge exp tables"))
+    return build
+
+
+def all_experiments():
+    return sorted(os.path.basename(os.path.dirname(p)) for p in glob.glob("res/exp/*/model.json")
+                  if not os.path.basename(os.path.dirname(p)).startswith("template"))
+
+
+if __name__ == "__main__":
+    expNames = all_experiments() if len(sys.argv) < 2 or sys.argv[1] == "all" else sys.argv[1].split(",")
+    jobs = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    dry_run = len(sys.argv) > 3 and sys.argv[3] == "dry"
+
+    log_path = sweep_log("run_build")
+    build = pipeline(expNames, log_path=log_path)
+    built, skipped, failed = build.run(
+        jobs, dry_run, before_sim=lambda: subprocess.run(['dotnet', 'build', '--configuration', 'Release'], check=True))
+
+    print(f"{'Would rebuild' if dry_run else 'Rebuilt'} {len(built)}, skipped {len(skipped)} up to date, {len(failed)} failed")
+    for name, reason in built:
+        print(f"  {'would rebuild' if dry_run else 'built'} {name} ({reason})")
+    for name in skipped:
+        print(f"  skipped {name}")
+    for name, reason in failed:
+        print(f"  failed {name}: {reason}")
+    if os.path.isfile(log_path):
+        report([json.loads(line) for line in open(log_path)])
@@ -1,22 +1,23 @@
-from operator import mod
 import subprocess
 import sys
+from telemetry import SIM, read_log, report, run_sim, sweep_log
 
 def run_experiments(runs, models, max_samples=2147483647):
-    subprocess.run(['dotnet', 'build', '--configuration', 'Release'])
+    subprocess.run(['dotnet', 'build', '--configuration', 'Release'], check=True)
 
+    log_path = sweep_log("run_exp")
     for expName in runs:
         for dsName, dsFile in models:
-            command = f"bin\Release\\net6.0\SpikingDSE.exe dataset-sim"\
-                f" -s \"res/snn/snn-{dsName}.json\""\
-                f" -h \"res/exp/{expName}/hw.json\""\
-                f" -m \"res/exp/{expName}/mappings/{dsName}.json\""\
-                f" -d \"res/dataset/{dsFile}.zip\""\
-                f" --max-samples={max_samples}"\
-                f" -o \"res/exp/{expName}/results/{dsName}\""
-            print(f">> {command}")
-            process = subprocess.run(command)
-
+            command = [SIM, "dataset-sim",
+                       "-s", f"res/snn/snn-{dsName}.json",
+                       "-h", f"res/exp/{expName}/hw.json",
+                       "-m", f"res/exp/{expName}/mappings/{dsName}.json",
+                       "-d", f"res/dataset/{dsFile}.zip",
+                       f"--max-samples={max_samples}",
+                       "-o", f"res/exp/{expName}/results/{dsName}"]
+            print(f">> {' '.join(command)}")
+            run_sim(command, log_path, {"exp": expName, "model": dsName})
+    report(read_log(log_path))
 
 
 if __name__ == "__main__":
@@ -1,18 +1,21 @@
 import subprocess
 import sys
+from telemetry import SIM, read_log, report, run_sim, sweep_log
 
 def run_mappings(runs, models, mapper):
-    subprocess.run(['dotnet', 'build', '--configuration', 'Release'])
+    subprocess.run(['dotnet', 'build', '--configuration', 'Release'], check=True)
 
+    log_path = sweep_log("run_map")
     for expName in runs:
         for dsName in models:
-            command = f"bin\Release\\net6.0\SpikingDSE.exe mapping"\
-                f" -s \"res/snn/snn-{dsName}.json\""\
-                f" -h \"res/exp/{expName}/hw.json\""\
-                f" -m {mapper}"\
-                f" -o \"res/exp/{expName}/mappings/{dsName}.json"
-            print(f">> {command}")
-            process = subprocess.run(command)
+            command = [SIM, "mapping",
+                       "-s", f"res/snn/snn-{dsName}.json",
+                       "-h", f"res/exp/{expName}/hw.json",
+                       "-m", mapper,
+                       "-o", f"res/exp/{expName}/mappings/{dsName}.json"]
+            print(f">> {' '.join(command)}")
+            run_sim(command, log_path, {"exp": expName, "model": dsName, "mapper": mapper})
+    report(read_log(log_path))
 
 if __name__ == "__main__":
     runs = sys.argv[1].split(",")
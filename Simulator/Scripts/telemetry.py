@@ -0,0 +1,136 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+SIM = os.path.join("bin", "Release", "net6.0",
+                   "SpikingDSE.exe" if os.name == "nt" else "SpikingDSE")
+
+SAMPLE_RATE = re.compile(r"Sample rate: (\d+) samples/s")
+
+
+def sweep_log(name):
+    if not os.path.isdir("res/telemetry"):
+        os.makedirs("res/telemetry")
+    return f"res/telemetry/{name}-{datetime.now():%Y%m%d-%H%M%S}.jsonl"
+
+
+# I/O of a running process: /proc on Linux, psutil elsewhere when installed
+def io_counters(pid):
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError):
+        pass
+    if psutil is not None:
+        try:
+            io = psutil.Process(pid).io_counters()
+            return io.read_bytes, io.write_bytes
+        except (psutil.Error, AttributeError):
+            pass
+    return None
+
+
+# Runs a simulator command, echoing its output, and returns (and appends to
+# log_path) a record with wall and CPU time, peak RSS, I/O bytes and the
+# sample rates it reported
+def run_sim(args, log_path=None, tags=None, echo=True):
+    start = time.perf_counter()
+    started = datetime.now().isoformat(timespec="seconds")
+    process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               text=True, errors="replace")
+    sample_rates = []
+    io = None
+    peak_rss = None
+    lines = []
+    for line in process.stdout:
+        if echo:
+            print(line, end="", flush=True)
+        lines.append(line)
+        match = SAMPLE_RATE.search(line)
+        if match:
+            sample_rates.append(int(match.group(1)))
+        io = io_counters(process.pid) or io
+        if psutil is not None and not hasattr(os, "wait4"):
+            try:
+                info = psutil.Process(process.pid).memory_info()
+                peak_rss = max(peak_rss or 0, getattr(info, "peak_wset", info.rss))
+            except psutil.Error:
+                pass
+
+    # wait for the exit without reaping, so its final I/O can still be read
+    if hasattr(os, "waitid"):
+        os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+        io = io_counters(process.pid) or io
+
+    cpu_user = cpu_system = None
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        cpu_user, cpu_system = usage.ru_utime, usage.ru_stime
+        # ru_maxrss is in KiB on Linux and in bytes on macOS
+        peak_rss = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+        if io is None:
+            io = (usage.ru_inblock * 512, usage.ru_oublock * 512)
+    else:
+        process.wait()
+    wall = time.perf_counter() - start
+
+    record = {
+        "tags": tags or {},
+        "command": args,
+        "start": started,
+        "returncode": process.returncode,
+        "wall": wall,
+        "cpu_user": cpu_user,
+        "cpu_system": cpu_system,
+        "peak_rss": peak_rss,
+        "read_bytes": io[0] if io else None,
+        "write_bytes": io[1] if io else None,
+        "sample_rate": statistics.mean(sample_rates) if sample_rates else None,
+        "sample_rates": sample_rates
+    }
+    if log_path is not None:
+        with open(log_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    record["output"] = "".join(lines)
+    return record
+
+
+def read_log(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def report(records, nr_slowest=10):
+    total = sum(r["wall"] for r in records)
+    cpu = sum((r["cpu_user"] or 0) + (r["cpu_system"] or 0) for r in records)
+    failed = [r for r in records if r["returncode"] != 0]
+    print(f"Runs: {len(records)} ({len(failed)} failed)")
+    print(f"Wall time: {total:,.0f} s, CPU time: {cpu:,.0f} s")
+    print(f"Slowest {min(nr_slowest, len(records))}:")
+    print(f"  {'wall (s)':>10} {'share':>6} {'cpu (s)':>10} {'rss (MB)':>9} {'samples/s':>10}  tags")
+    for r in sorted(records, key=lambda r: r["wall"], reverse=True)[:nr_slowest]:
+        cpu = (r["cpu_user"] or 0) + (r["cpu_system"] or 0)
+        rss = f"{r['peak_rss']/2**20:9.0f}" if r["peak_rss"] else f"{'?':>9}"
+        rate = f"{r['sample_rate']:10.1f}" if r["sample_rate"] else f"{'?':>10}"
+        tags = ",".join(f"{k}={v}" for k, v in r["tags"].items()) or " ".join(r["command"][:2])
+        print(f"  {r['wall']:10.1f} {r['wall']/total*100:5.1f}% {cpu:10.1f} {rss} {rate}  {tags}")
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1].split(",")
+    nr_slowest = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    records = [r for path in paths for r in read_log(path)]
+    report(records, nr_slowest)